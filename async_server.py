@@ -0,0 +1,328 @@
+import json
+import time
+import signal
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+import metrics
+from batch_scorer import score_batch
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+# Pool futures started on behalf of the request being handled, see AsyncHTTPServer._dispatch
+_request_work = contextvars.ContextVar('request_work', default=None)
+
+
+def _track_work(future):
+    work = _request_work.get()
+    if work is not None:
+        work.append(future)
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    @property
+    def mimetype(self):
+        return self.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    def form(self):
+        if self.mimetype != 'application/x-www-form-urlencoded':
+            return {}
+        return dict(parse_qsl(self.body.decode('utf-8'), keep_blank_values=True))
+
+
+def json_response(data, status=200):
+    return status, 'application/json', json.dumps(data).encode()
+
+
+def html_response(html, status=200):
+    return status, 'text/html; charset=utf-8', html.encode()
+
+
+class AsyncBatchScorer:
+    """
+    asyncio counterpart of batch_scorer.MicroBatchScorer: requests awaiting
+    score() are collected on the event loop and each micro-batch is scored
+    with one score_records(records) call on the server's executor, so the
+    loop never blocks on DLHA and at most `workers` batches run at once.
+    """
+
+    def __init__(self, score_records, executor, max_batch_size=64, max_wait_ms=5):
+        self.score_records = score_records
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+
+    async def score(self, record):
+        """Score one record. Returns (label, confidence)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((record, future, time.perf_counter() if metrics.ENABLED else None, _request_work.get()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Records whose request already timed out are not scored
+        batch = [item for item in self._pending if not item[1].done()]
+        self._pending = []
+        if not batch:
+            return
+        self.batches += 1
+        if metrics.ENABLED:
+            now = time.perf_counter()
+            wait = metrics.QUEUE_WAIT_SECONDS.labels('async_batch')
+            for _, _, queued, _ in batch:
+                if queued is not None:
+                    wait.observe(now - queued)
+        records = [record for record, _, _, _ in batch]
+        work = self.executor.submit(score_batch, self.score_records, records)
+        # Every request in the batch stays in flight until the batch is scored
+        for _, _, _, request_work in batch:
+            if request_work is not None:
+                request_work.append(work)
+        done = asyncio.wrap_future(work)
+        done.add_done_callback(lambda task: self._resolve(batch, task))
+
+    @staticmethod
+    def _resolve(batch, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        results = task.result() if error is None else [error] * len(batch)
+        for (_, future, _, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class AsyncHTTPServer:
+    """
+    Small HTTP/1.1 server on asyncio streams for the prediction API.
+
+    Handlers are coroutines taking a Request and returning (status,
+    content_type, body bytes). Blocking work goes to a ThreadPoolExecutor
+    of `workers` threads via run_blocking(). Admission is bounded: beyond
+    max_pending requests in flight new ones get 503 straight away instead
+    of queueing, and a request not answered within request_timeout
+    seconds gets 504, which keeps tail latency predictable under
+    overload. A timed-out request's queued pool work is cancelled, and
+    the request counts as in flight until any of its work already running
+    has finished, so max_pending also bounds the work on the pool. run()
+    stops accepting on SIGINT/SIGTERM and gives in-flight requests
+    shutdown_timeout seconds to finish.
+    """
+
+    def __init__(self, workers=4, max_pending=256, request_timeout=10.0, shutdown_timeout=10.0,
+                 keepalive_timeout=5.0, max_body=64 * 1024 * 1024):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='dlha-worker')
+        self.routes = {}
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.started = None
+        self._latencies = np.zeros(4096)
+        self._latency_count = 0
+        self._server = None
+        self._closing = None
+        self._idle = None
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    async def run_blocking(self, function, *args):
+        """Run a blocking call on the worker pool."""
+        work = self.executor.submit(function, *args)
+        _track_work(work)
+        return await asyncio.wrap_future(work)
+
+    def stats(self):
+        count = min(self._latency_count, len(self._latencies))
+        latencies = self._latencies[:count]
+        return {
+            'uptime_s': round(time.time() - self.started, 3) if self.started else 0.0,
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'max_pending': self.max_pending,
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            # Over the most recent requests
+            'latency_ms': {'p50': round(float(np.percentile(latencies, 50)) * 1000, 3) if count else None,
+                           'p99': round(float(np.percentile(latencies, 99)) * 1000, 3) if count else None}
+        }
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            return None, 411
+        length = int(headers.get('content-length', 0))
+        if length > self.max_body:
+            return None, 413
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = target.partition('?')
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        return (Request(method, path, dict(parse_qsl(query)), headers, body), keep_alive), None
+
+    async def _dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            allowed = any(path == request.path for _, path in self.routes)
+            return json_response({"message": "Method not allowed" if allowed else "Not found",
+                                  "status": "error"}, 405 if allowed else 404)
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            if metrics.ENABLED:
+                metrics.DROPS.labels('rejected').inc()
+            return json_response({"message": "Server busy, retry later", "status": "error"}, 503)
+        self.in_flight += 1
+        start = time.perf_counter()
+        # The handler task inherits this context, so the pool work it starts is collected in `work`
+        work = []
+        token = _request_work.set(work)
+        try:
+            task = asyncio.ensure_future(handler(request))
+        finally:
+            _request_work.reset(token)
+        try:
+            return await asyncio.wait_for(task, self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if metrics.ENABLED:
+                metrics.DROPS.labels('timeout').inc()
+            return json_response({"message": "Request timed out", "status": "error"}, 504)
+        except Exception as e:
+            self.errors += 1
+            return json_response({"message": "Error handling request", "error": str(e), "status": "error"}, 500)
+        finally:
+            self._latencies[self._latency_count % len(self._latencies)] = time.perf_counter() - start
+            self._latency_count += 1
+            # Cancelling the handler drops pool work that has not started, but work already
+            # running cannot be stopped: the request keeps its slot until that has finished
+            running = [future for future in work if not future.done()]
+            if running:
+                waiter = asyncio.ensure_future(asyncio.wait([asyncio.wrap_future(future) for future in running]))
+                waiter.add_done_callback(lambda _: self._release())
+            else:
+                self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        if self._closing.is_set() and not self.in_flight:
+            self._idle.set()
+
+    async def _handle(self, reader, writer):
+        try:
+            while not self._closing.is_set():
+                try:
+                    parsed, error = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    parsed, error = None, 400
+                if parsed is None:
+                    status, content_type, body = json_response({"message": STATUS_TEXT[error], "status": "error"}, error)
+                    keep_alive = False
+                else:
+                    request, keep_alive = parsed
+                    self.requests += 1
+                    status, content_type, body = await self._dispatch(request)
+                    keep_alive = keep_alive and not self._closing.is_set()
+                writer.write(f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                             f'Content-Type: {content_type}\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             'Access-Control-Allow-Origin: *\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='0.0.0.0', port=8080):
+        """Serve until shutdown() is called, then drain in-flight requests."""
+        self._closing = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=1024)
+        self.started = time.time()
+        print(f"Async server listening on {host}:{port} with {self.workers} workers")
+        await self._closing.wait()
+
+        self._server.close()
+        if self.in_flight:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                print(f"Shutdown timeout: {self.in_flight} requests still in flight")
+        self.executor.shutdown(wait=False)
+        print("Async server stopped")
+
+    def shutdown(self):
+        """Stop accepting connections and finish the requests in flight. Call from the event loop."""
+        if self._closing is not None:
+            self._closing.set()
+            if not self.in_flight:
+                self._idle.set()
+
+    def run(self, host='0.0.0.0', port=8080):
+        """Blocking entry point with graceful shutdown on SIGINT/SIGTERM."""
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, self.shutdown)
+                except (NotImplementedError, RuntimeError):
+                    # Windows event loops have no signal handlers; Ctrl+C ends asyncio.run instead
+                    pass
+            await self.serve(host, port)
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            self.executor.shutdown(wait=True)
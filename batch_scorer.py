@@ -0,0 +1,112 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future
+
+import metrics
+
+
+def score_batch(score_records, records):
+    """
+    One (label, confidence) or exception per record. The batch is scored in
+    one score_records call; if that fails the records are retried one at a
+    time, so a malformed record only fails its own request.
+    """
+    try:
+        labels, confidence = score_records(records)
+        return [(label, float(conf)) for label, conf in zip(labels, confidence)]
+    except Exception as e:
+        if len(records) == 1:
+            return [e]
+    results = []
+    for record in records:
+        try:
+            labels, confidence = score_records([record])
+            results.append((labels[0], float(confidence[0])))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class MicroBatchScorer:
+    """
+    Collects concurrent scoring requests into micro-batches and scores each
+    batch with one DLHA.predict_with_confidence call. A batch is flushed when
+    it reaches max_batch_size records or when its oldest record has waited
+    max_wait_ms, whichever comes first. A record that makes its batch fail
+    fails only its own future (see score_batch).
+    """
+
+    def __init__(self, model, feature_encoder, max_batch_size=64, max_wait_ms=5):
+        self.model = model
+        self.feature_encoder = feature_encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='micro-batch-scorer', daemon=True)
+        self._worker.start()
+
+    def submit(self, record):
+        """Queue one record (dict of feature -> value) and return a Future of its result."""
+        if self._stopped.is_set():
+            raise RuntimeError("Scorer has been stopped")
+        future = Future()
+        self._queue.put((record, future, time.perf_counter() if metrics.ENABLED else None))
+        return future
+
+    def score(self, record, timeout=None):
+        """Score one record and block until its batch is done. Returns (label, confidence)."""
+        return self.submit(record).result(timeout=timeout)
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            futures = [future for _, future, _ in batch]
+            if metrics.ENABLED:
+                now = time.perf_counter()
+                wait = metrics.QUEUE_WAIT_SECONDS.labels('microbatch')
+                for _, _, queued in batch:
+                    if queued is not None:
+                        wait.observe(now - queued)
+            results = score_batch(self.score_records, [record for record, _, _ in batch])
+            for future, result in zip(futures, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def score_records(self, records):
+        """Encode and score a list of records in one vectorized pass."""
+        X = metrics.time_stage('encode', self.feature_encoder.encode_records, records)
+        scored = self.model.predict_with_confidence(X)
+        if metrics.ENABLED:
+            metrics.PREDICTIONS.inc(len(records))
+        return scored['labels'], scored['confidence']
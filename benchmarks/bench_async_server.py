@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import requests
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from test_request import run_load_test, print_load_test
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ, DLHA_SERVER=mode, DLHA_PORT=str(port), DLHA_ASYNC_WORKERS=str(workers))
+    server = subprocess.Popen([sys.executable, os.path.join(project_dir, 'test_model.py')], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://localhost:{port}/health', timeout=1).status_code == 200:
+                return server
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    sys.exit(f"{mode} server did not come up on port {port}")
+
+
+def stop_server(server):
+    # The Flask reloader runs the app in a child process, so signal the whole group where we can
+    if hasattr(os, 'killpg'):
+        os.killpg(server.pid, signal.SIGTERM)
+    else:
+        server.terminate()
+    try:
+        server.wait(15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict throughput and p99: Flask dev server vs asyncio server")
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8190)
+    args = parser.parse_args()
+
+    for offset, mode in enumerate(('flask', 'async')):
+        port = args.port + offset
+        server = start_server(mode, port, args.workers)
+        try:
+            for clients in args.clients:
+                print_load_test(run_load_test(f'http://localhost:{port}/predict', clients, args.duration), f"{mode:6s} ")
+        finally:
+            stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from capture_pipeline import CapturePipeline, analyze_frames
+from raw_packets import PcapFileReader
+from rule_engine import RuleEngine
+from synthetic_traffic import generate_headers, write_pcap
+
+
+def load_frames(path, count):
+    with PcapFileReader(path) as reader:
+        frames = list(reader)
+    while len(frames) < count:
+        frames.extend(frames[:count - len(frames)])
+    return frames[:count]
+
+
+def run_inline(frames):
+    engine = RuleEngine()
+    start = time.perf_counter()
+    results = analyze_frames(engine, frames, 1)
+    elapsed = time.perf_counter() - start
+    print(f"inline      {len(frames) / elapsed:10,.0f} frames/s  ({len(results):,} results)")
+
+
+def run_pipeline(frames, workers, ring_size, task_queue_size, batch_size, rate):
+    pipeline = CapturePipeline(lambda *result: None, workers=workers, ring_size=ring_size,
+                               task_queue_size=task_queue_size, batch_size=batch_size).start()
+    # Let the worker processes come up before timing
+    time.sleep(2)
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    for i, (ts, frame) in enumerate(frames):
+        if interval:
+            while time.perf_counter() - start < i * interval:
+                pass
+        pipeline.feed(ts, frame)
+    capture_time = time.perf_counter() - start
+    peak = pipeline.stats()
+    pipeline.stop()
+    elapsed = time.perf_counter() - start
+    stats = pipeline.stats()
+    print(f"{workers} workers   {stats['analysis']['frames'] / elapsed:10,.0f} frames/s analysed"
+          f" | capture {len(frames) / capture_time:10,.0f} frames/s"
+          f" | ring dropped {stats['capture']['dropped']:,}"
+          f" | depth at end of capture: ring {peak['ring']['depth']:,}, tasks {peak['dispatch']['queue_depth']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture pipeline throughput, queue depth and drops")
+    parser.add_argument('--pcap', help="pcap file to replay; a synthetic capture is generated when omitted")
+    parser.add_argument('--frames', type=int, default=200000)
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated worker counts")
+    parser.add_argument('--ring-size', type=int, default=65536)
+    parser.add_argument('--task-queue-size', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--rate', type=float, default=0, help="Offered frames/s (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    path = args.pcap
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.pcap')
+        write_pcap(generate_headers(20000), path)
+    frames = load_frames(path, args.frames)
+
+    run_inline(frames)
+    for workers in [int(x) for x in args.workers.split(',')]:
+        run_pipeline(frames, workers, args.ring_size, args.task_queue_size, args.batch_size, args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from data_preparation import RAW_TEST_PATH, RAW_TRAIN_PATH, load_prepared_dataset, process_raw_dataset
+
+
+def timed(function, repeat=1):
+    """Median wall time in ms over `repeat` calls, and the last result."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def touch(tables):
+    # Force every column into memory, as training does
+    return sum(float(np.asarray(column, dtype=float).sum()) for column in tables[0].drop(columns='label').values.T)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset load times: CSV parsing vs cold and warm binary cache")
+    parser.add_argument('--train', default=RAW_TRAIN_PATH)
+    parser.add_argument('--test', default=RAW_TEST_PATH)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='dlha-cache-')
+    load = lambda **kwargs: load_prepared_dataset(args.train, args.test, cache_dir=cache_dir, **kwargs)
+
+    rows = []
+    if os.path.exists('data/processed_train.csv'):
+        ms, _ = timed(lambda: (pd.read_csv('data/processed_train.csv'), pd.read_csv('data/processed_test.csv')))
+        rows.append(('processed CSVs (read_csv)', ms))
+    ms, reference = timed(lambda: process_raw_dataset(args.train, args.test))
+    rows.append(('raw parse + encode', ms))
+    ms, _ = timed(lambda: load(rebuild=True))
+    rows.append(('cold cache (parse, encode, write)', ms))
+    ms, cached = timed(lambda: load(), args.repeat)
+    rows.append(('warm cache, mmap', ms))
+    ms, _ = timed(lambda: touch(load()), args.repeat)
+    rows.append(('warm cache, mmap + read all columns', ms))
+    ms, _ = timed(lambda: load(mmap=False), args.repeat)
+    rows.append(('warm cache, no mmap', ms))
+
+    for expected, actual in zip(reference[:2], cached[:2]):
+        assert list(expected.columns) == list(actual.columns)
+        for column in expected.columns:
+            assert np.array_equal(np.asarray(expected[column]), np.asarray(actual[column])), column
+    size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(cache_dir) for f in files)
+
+    print(f"\n{len(cached[0]):,} train + {len(cached[1]):,} test rows, cache {size / 1e6:.1f} MB, matches raw preparation")
+    print(f"{'load path':<40}{'ms':>10}")
+    for name, ms in rows:
+        print(f"{name:<40}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
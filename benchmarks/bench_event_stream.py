@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from scapy.all import PcapReader
+import dlha_main
+from dlha_main import app, socketio, detect_attack
+from synthetic_traffic import generate_headers, write_pcap
+
+
+def legacy_process_packet(packet):
+    """The per-packet emit this benchmark compares against."""
+    attack_type = detect_attack(packet)
+    packet_info = {
+        'status': "Attack" if attack_type else "Normal",
+        'packet_summary': str(packet.summary()),
+        'source_ip': packet['IP'].src if packet.haslayer('IP') else "Unknown",
+        'dest_ip': packet['IP'].dst if packet.haslayer('IP') else "Unknown",
+        'attack_type': attack_type,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    socketio.emit('packet_info', packet_info)
+
+
+def measure(name, packets, process, client, before=None, after=None):
+    client.get_received()
+    if before:
+        before()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for packet in packets:
+        process(packet)
+    if after:
+        after()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    received = client.get_received()
+    sent_bytes = sum(len(json.dumps(message['args'])) for message in received)
+    print(f"{name:10s} {len(packets):,} packets in {wall:.2f}s | {len(received):8,} messages"
+          f" | {sent_bytes / 1e6:8.2f} MB ({sent_bytes / wall / 1e6:7.2f} MB/s)"
+          f" | CPU {cpu:.2f}s ({cpu / len(packets) * 1e6:.1f} us/packet)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-packet SocketIO emit vs coalesced traffic updates")
+    parser.add_argument('--pcap', help="pcap file to replay; a synthetic capture is generated when omitted")
+    parser.add_argument('--packets', type=int, default=20000)
+    parser.add_argument('--tick', type=float, default=0.5)
+    args = parser.parse_args()
+
+    path = args.pcap
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.pcap')
+        write_pcap(generate_headers(args.packets), path)
+    with PcapReader(path) as reader:
+        packets = [packet for _, packet in zip(range(args.packets), reader)]
+
+    client = socketio.test_client(app)
+    stream = dlha_main.event_stream
+    stream.tick = args.tick
+    measure('per-packet', packets, legacy_process_packet, client)
+    measure('coalesced', packets, dlha_main.process_packet, client, before=stream.start, after=stream.stop)
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
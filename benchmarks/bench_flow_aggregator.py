@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from flow_aggregator import FlowAggregator, PROTO_TCP, SYN
+from synthetic_traffic import generate_headers, write_pcap
+
+
+def memory_per_flow(n_flows):
+    """Bytes allocated per open flow tracked by the aggregator."""
+    aggregator = FlowAggregator(idle_timeout=1e9)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(n_flows):
+        aggregator.add_packet(1.0, f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}', '192.168.1.1',
+                              PROTO_TCP, 1024 + i % 60000, 80, 0, SYN)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n_flows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FlowAggregator packet throughput and memory per flow")
+    parser.add_argument('--packets', type=int, default=1000000)
+    parser.add_argument('--flows', type=int, default=100000, help="Open flows for the memory measurement")
+    parser.add_argument('--write-pcap', help="Also write the synthetic traffic to this pcap file (needs scapy)")
+    args = parser.parse_args()
+
+    headers = generate_headers(args.packets)
+    if args.write_pcap:
+        write_pcap(headers, args.write_pcap)
+        print(f"Wrote {len(headers):,} packets to {args.write_pcap}")
+
+    aggregator = FlowAggregator()
+    add_packet = aggregator.add_packet
+    start = time.perf_counter()
+    for header in headers:
+        add_packet(*header)
+    aggregator.flush()
+    elapsed = time.perf_counter() - start
+    connections, rows = aggregator.drain()
+
+    print(f"{len(headers):,} packets -> {len(rows):,} connections in {elapsed:.2f}s")
+    print(f"Packets/sec: {len(headers) / elapsed:,.0f}")
+    print(f"Flows/sec:   {len(rows) / elapsed:,.0f}")
+    print(f"Memory per tracked flow: {memory_per_flow(args.flows):.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
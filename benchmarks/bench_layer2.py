@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.metrics import recall_score
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, LAYER2_BACKENDS, load_and_prepare_data
+
+
+def single_row_latencies(model, X, n_rows):
+    """Latency in milliseconds of predict on one-row frames."""
+    latencies = []
+    for i in range(min(n_rows, len(X))):
+        row = X.iloc[i:i + 1]
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DLHA layer 2 backends")
+    parser.add_argument('--backends', nargs='+', default=list(LAYER2_BACKENDS), choices=LAYER2_BACKENDS)
+    parser.add_argument('--train-rows', type=int, default=0,
+                        help="Rows of processed_train.csv used to fit the model (0 = all)")
+    parser.add_argument('--latency-rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        return
+    if args.train_rows:
+        X_train, y_train = X_train.iloc[:args.train_rows], y_train.iloc[:args.train_rows]
+    classes = sorted(y_test.unique())
+
+    results = []
+    for backend in args.backends:
+        print(f"Training DLHA with layer 2 backend '{backend}' on {len(X_train)} rows...")
+        model = DLHA(layer2_backend=backend)
+        start = time.perf_counter()
+        model.train(X_train, y_train)
+        train_time = time.perf_counter() - start
+
+        predictions = model.predict(X_test)
+        recalls = recall_score(y_test, predictions, labels=classes, average=None, zero_division=0)
+        latencies = single_row_latencies(model, X_test, args.latency_rows)
+        results.append((backend, train_time, np.percentile(latencies, 50), np.percentile(latencies, 99), recalls))
+
+    header = f"{'backend':<12}{'train s':>10}{'p50 ms':>9}{'p99 ms':>9}" + ''.join(f"{c:>9}" for c in classes)
+    print("\nRecall per class on the test set")
+    print(header)
+    for backend, train_time, p50, p99, recalls in results:
+        print(f"{backend:<12}{train_time:>10.2f}{p50:>9.3f}{p99:>9.3f}" + ''.join(f"{r:>9.3f}" for r in recalls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from live_stats import LiveStats
+
+
+def write(stats, count, stop=None):
+    record = stats.record
+    for i in range(count):
+        if stop is not None and stop.is_set():
+            break
+        record('10.0.0.1', '10.0.0.2', 'Normal' if i % 10 else 'Alert', 0.9, None if i % 10 else 'Port scan')
+
+
+def snapshot_cost(stats, repeat=200):
+    stats.snapshot_ttl = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        stats.snapshot()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LiveStats record throughput and snapshot cost")
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    stats = LiveStats()
+    start = time.perf_counter()
+    write(stats, args.records)
+    elapsed = time.perf_counter() - start
+    print(f"record(): {args.records / elapsed:,.0f} packets/s single writer")
+
+    # Snapshot cost must not grow with traffic volume
+    for volume in (10000, args.records):
+        fresh = LiveStats()
+        write(fresh, volume)
+        print(f"snapshot() after {volume:,} packets: {snapshot_cost(fresh):.1f} us")
+
+    # Writers with a reader polling snapshots as fast as it can
+    stats = LiveStats(snapshot_ttl=0)
+    stop = threading.Event()
+    reads = [0]
+
+    def reader():
+        while not stop.is_set():
+            stats.snapshot()
+            reads[0] += 1
+
+    reader_thread = threading.Thread(target=reader)
+    writers = [threading.Thread(target=write, args=(stats, args.records // args.writers)) for _ in range(args.writers)]
+    start = time.perf_counter()
+    reader_thread.start()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader_thread.join()
+    total = stats.snapshot()['packet_count']
+    print(f"{args.writers} writers + polling reader: {total / elapsed:,.0f} packets/s, {reads[0] / elapsed:,.0f} snapshots/s,"
+          f" counted {total:,} of {args.records // args.writers * args.writers:,}")
+
+
+if __name__ == "__main__":
+    main()
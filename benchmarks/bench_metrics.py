@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from common import load_raw_records, train_benchmark_model
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+import metrics
+from batch_scorer import MicroBatchScorer
+from capture_pipeline import analyze_frames
+from feature_encoding import FeatureEncoder
+from raw_packets import PcapFileReader
+from rule_engine import RuleEngine
+from synthetic_traffic import generate_headers, write_pcap
+
+
+def elapsed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def compare(name, unit_count, unit, repeats, function):
+    # Alternate on/off runs so drift (CPU frequency, caches) affects both equally; the fastest run of each is kept
+    timings = {True: float('inf'), False: float('inf')}
+    for _ in range(repeats):
+        for enabled in (False, True):
+            metrics.set_enabled(enabled)
+            timings[enabled] = min(timings[enabled], elapsed(function))
+    metrics.set_enabled(True)
+    off, on = timings[False] / unit_count * 1e6, timings[True] / unit_count * 1e6
+    print(f"{name:<28}{off:>12.2f}{on:>12.2f}{on - off:>12.2f}{(on - off) / off:>10.1%}   us/{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of the per-stage latency instrumentation, on vs DLHA_METRICS=0")
+    parser.add_argument('--records', type=int, default=4096)
+    parser.add_argument('--frames', type=int, default=50000)
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--train-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    model, encoders = train_benchmark_model(args.train_rows)
+    scorer = MicroBatchScorer(model, FeatureEncoder.from_label_encoders(encoders))
+    records = load_raw_records(limit=args.records)
+
+    path = os.path.join(tempfile.mkdtemp(), 'synthetic.pcap')
+    write_pcap(generate_headers(args.frames), path)
+    with PcapFileReader(path) as reader:
+        frames = list(reader)
+    engine = RuleEngine()
+
+    print(f"{'path':<28}{'off':>12}{'on':>12}{'added':>12}{'overhead':>10}")
+    for batch_size in (1, 64):
+        batches = [records[i:i + batch_size] for i in range(0, min(len(records), batch_size * 256), batch_size)]
+        compare(f"score_records, batch {batch_size}", len(batches), 'batch', args.repeats,
+                lambda: [scorer.score_records(batch) for batch in batches])
+    compare("decode + rules per frame", len(frames), 'frame', args.repeats,
+            lambda: analyze_frames(engine, frames, 1, timed=metrics.ENABLED))
+    scorer.stop()
+
+    render = min(elapsed(metrics.render) for _ in range(args.repeats))
+    print(f"\n/metrics render: {render * 1000:.2f} ms for {len(metrics.render()):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
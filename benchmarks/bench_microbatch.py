@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+from common import load_raw_records, train_benchmark_model
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from batch_scorer import MicroBatchScorer
+from feature_encoding import FeatureEncoder
+
+
+def per_request_score(model, encoders, record):
+    """The /predict scoring path before micro-batching: one DataFrame per record."""
+    test_data = pd.DataFrame([record])
+    for feature in ['protocol_type', 'service', 'flag']:
+        known_labels = set(encoders[feature].classes_)
+        if test_data[feature].iloc[0] not in known_labels:
+            test_data[feature] = encoders[feature].classes_[0]
+        test_data[feature] = encoders[feature].transform(test_data[feature])
+    scored = model.predict_with_confidence(test_data.astype(float))
+    return scored['labels'][0], float(scored['confidence'][0])
+
+
+def load_test(score, records, clients, duration):
+    """Run `clients` threads calling score() in a loop; return latencies (ms) and elapsed seconds."""
+    latencies = [[] for _ in range(clients)]
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        n = i
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            score(records[n % len(records)])
+            latencies[i].append((time.perf_counter() - start) * 1000)
+            n += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.concatenate([np.array(l) for l in latencies]), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request vs micro-batched /predict scoring under load")
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--train-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    model, encoders = train_benchmark_model(args.train_rows)
+    records = load_raw_records()
+    scorer = MicroBatchScorer(model, FeatureEncoder.from_label_encoders(encoders),
+                              max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    paths = [
+        ('per-request', lambda record: per_request_score(model, encoders, record)),
+        ('micro-batch', scorer.score),
+    ]
+    print(f"{args.clients} concurrent clients, {args.duration:.0f}s per path, "
+          f"max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms")
+    print(f"{'path':<14}{'requests':>10}{'req/sec':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, score in paths:
+        latencies, elapsed = load_test(score, records, args.clients, args.duration)
+        print(f"{name:<14}{len(latencies):>10}{len(latencies) / elapsed:>10,.0f}"
+              f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+    scorer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, LAYER1_CLASSES, LAYER2_CLASSES, load_and_prepare_data
+from model_bundle import load_bundle, load_pickled_model, save_bundle
+
+
+def memory_mb():
+    """Rss, Pss and private memory of this process in MB (Linux /proc only)."""
+    values = {'Rss': float('nan'), 'Pss': float('nan'), 'Private': float('nan')}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split()[-1] == 'kB'}
+    except OSError:
+        return values
+    values['Rss'] = fields.get('Rss', 0) / 1024
+    values['Pss'] = fields.get('Pss', 0) / 1024
+    values['Private'] = (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024
+    return values
+
+
+def synthetic_training_set(classes, rows=3000, features=12, seed=0):
+    """Overlapping Gaussian blobs, one per class, so every layer sees uncertain rows."""
+    rng = np.random.default_rng(seed)
+    labels = rng.choice(classes, size=rows)
+    centers = {label: rng.normal(scale=1.5, size=features) for label in classes}
+    X = np.stack([centers[label] for label in labels]) + rng.normal(size=(rows, features))
+    return pd.DataFrame(X, columns=[f'f{i}' for i in range(features)]), pd.Series(labels)
+
+
+def check_equivalence(layer2_classes):
+    """Bundle vs sklearn layer probabilities and labels for a DLHA whose layer 2 has the given classes."""
+    X, y = synthetic_training_set(LAYER1_CLASSES + layer2_classes)
+    with tempfile.TemporaryDirectory() as directory:
+        previous = os.getcwd()
+        # train saves model/dlha_model.pkl relative to the working directory
+        os.chdir(directory)
+        try:
+            model = DLHA()
+            model.train(X, y)
+            save_bundle(model, None, 'bundle')
+            bundle = load_bundle('bundle', mmap=False)
+        finally:
+            os.chdir(previous)
+    X_processed = model.preprocess_data(X)
+    layer2_error = np.abs(bundle.layer2_classifier.predict_proba(X_processed) -
+                          model.layer2_classifier.predict_proba(X_processed)).max()
+    layer1_error = np.abs(bundle.layer1_classifier.predict_proba(X_processed) -
+                          model.layer1_classifier.predict_proba(X_processed)).max()
+    same_labels = np.mean(bundle.predict(X) == model.predict(X))
+    print(f"layer 2 {'/'.join(layer2_classes):<16} max |dp| layer1 {layer1_error:.2e}, layer2 {layer2_error:.2e}, "
+          f"labels identical {same_labels:.2%}")
+    return layer2_error < 1e-6 and layer1_error < 1e-6 and same_labels == 1.0
+
+
+def worker(kind, path, X, barrier, results):
+    before = memory_mb()['Rss']
+    start = time.perf_counter()
+    model = load_pickled_model(path) if kind == 'pickle' else load_bundle(path)
+    load_time = time.perf_counter() - start
+    # Score once so every parameter page has been touched
+    model.predict(X)
+    barrier.wait()  # all workers alive before memory is read, so Pss reflects sharing
+    memory = memory_mb()
+    results.put((kind, load_time, memory['Rss'] - before, memory['Pss'], memory['Private']))
+    barrier.wait()
+
+
+def run(kind, path, X, workers):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(kind, path, X, barrier, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in range(workers)]
+    for p in processes:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time and per-process memory: pickle vs model bundle")
+    parser.add_argument('--model', default='model/dlha_model.pkl')
+    parser.add_argument('--encoders', default='model/label_encoders.pkl')
+    parser.add_argument('--bundle', default='model/dlha_bundle')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print("Bundle vs sklearn on synthetic data")
+    equivalent = [check_equivalence(classes) for classes in (LAYER2_CLASSES, ['Normal', 'R2L'])]
+    if not all(equivalent):
+        sys.exit("Bundle predictions differ from the sklearn model")
+    print()
+
+    if not os.path.exists(os.path.join(args.bundle, 'manifest.json')):
+        import joblib
+        from feature_encoding import FeatureEncoder
+        encoders = FeatureEncoder.from_label_encoders(joblib.load(args.encoders))
+        save_bundle(load_pickled_model(args.model), encoders, args.bundle)
+
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    X = X_test.to_numpy()[:1000]
+
+    print(f"{args.workers} worker processes per format")
+    print(f"{'format':<8}{'load ms':>10}{'RSS +MB':>10}{'PSS MB':>10}{'private MB':>12}")
+    for kind, path in [('pickle', args.model), ('bundle', args.bundle)]:
+        rows = run(kind, path, X, args.workers)
+        load_ms, rss, pss, private = (np.mean([row[i] for row in rows]) for i in range(1, 5))
+        print(f"{kind:<8}{load_ms * 1000:>10.1f}{rss:>10.1f}{pss:>10.1f}{private:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.metrics import classification_report, confusion_matrix
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, load_and_prepare_data
+from parallel_eval import parallel_predict_with_confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of process-pool DLHA evaluation")
+    parser.add_argument('--replicas', type=int, default=10, help="Copies of the test set to score")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--train-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        return
+    if args.train_rows:
+        X_train, y_train = X_train.iloc[:args.train_rows], y_train.iloc[:args.train_rows]
+    model = DLHA()
+    model.train(X_train, y_train)
+
+    X = np.tile(X_test.to_numpy(dtype=np.float64), (args.replicas, 1))
+    y = np.tile(y_test.to_numpy(), args.replicas)
+
+    start = time.perf_counter()
+    serial = model.predict_with_confidence(X)['labels']
+    serial_time = time.perf_counter() - start
+
+    worker_counts = sorted({1, 2, 4, 8, 16, args.max_workers} & set(range(1, args.max_workers + 1)))
+    print(f"{len(X):,} rows ({args.replicas}x test set), serial predict {serial_time:.2f}s")
+    print(f"{'workers':>8}{'seconds':>10}{'rows/sec':>12}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        labels, confidence = parallel_predict_with_confidence(model, X, workers=workers, shard_size=args.shard_size)
+        elapsed = time.perf_counter() - start
+        assert (labels == serial).all(), "parallel predictions differ from serial"
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{workers:>8}{elapsed:>10.2f}{len(X) / elapsed:>12,.0f}{speedup:>9.2f}{speedup / workers:>11.0%}")
+
+    print("\nClassification Report (merged shards):")
+    print(classification_report(y, labels, zero_division=0))
+    print("Confusion Matrix:")
+    print(confusion_matrix(y, labels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from payload_scanner import PayloadScanner
+
+
+def make_signatures(n, rng):
+    base = ['sudo', 'buffer overflow']
+    words = ['/bin/sh', 'passwd', 'cmd.exe', 'union select', '../..', 'wget http', 'chmod 777', 'nc -e']
+    signatures = base + words
+    while len(signatures) < n:
+        length = rng.randint(6, 16)
+        signatures.append(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789/._-') for _ in range(length)))
+    return signatures[:n]
+
+
+def make_payloads(n, rng, signatures):
+    """HTTP-like payloads, roughly one in twenty carrying a signature in mixed case."""
+    payloads = []
+    for _ in range(n):
+        body = bytes(rng.getrandbits(8) for _ in range(rng.randint(200, 1400)))
+        payload = b'POST /index.php HTTP/1.1\r\nHost: example\r\n\r\n' + body
+        if rng.random() < 0.05:
+            signature = rng.choice(signatures).upper().encode()
+            position = rng.randint(0, len(payload))
+            payload = payload[:position] + signature + payload[position:]
+        payloads.append(payload)
+    return payloads
+
+
+def scan_naive(signatures, payloads):
+    """The old detect_attack approach: decode, lower-case, one `in` per signature."""
+    hits = 0
+    for payload in payloads:
+        text = payload.decode('utf-8', errors='ignore').lower()
+        if any(signature in text for signature in signatures):
+            hits += 1
+    return hits
+
+
+def scan_automaton(scanner, payloads):
+    hits = 0
+    for payload in payloads:
+        if scanner.search(memoryview(payload)):
+            hits += 1
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-pattern payload scanning throughput")
+    parser.add_argument('--payloads', type=int, default=5000)
+    parser.add_argument('--signatures', default='10,1000,10000', help="Comma-separated signature counts")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    all_signatures = make_signatures(max(int(x) for x in args.signatures.split(',')), rng)
+    payloads = make_payloads(args.payloads, rng, all_signatures[:10])
+    total_mb = sum(len(p) for p in payloads) / 1e6
+
+    for n in [int(x) for x in args.signatures.split(',')]:
+        signatures = all_signatures[:n]
+        start = time.perf_counter()
+        scanner = PayloadScanner(signatures)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        automaton_hits = scan_automaton(scanner, payloads)
+        automaton_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive_hits = scan_naive(signatures, payloads)
+        naive_time = time.perf_counter() - start
+
+        print(f"{n:6d} signatures | build {build_time * 1000:8.1f} ms"
+              f" | scanner {len(payloads) / automaton_time:10,.0f} payloads/s {total_mb / automaton_time:8.1f} MB/s"
+              f" | naive {len(payloads) / naive_time:10,.0f} payloads/s {total_mb / naive_time:8.1f} MB/s"
+              f" | hits {automaton_hits}/{naive_hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, load_and_prepare_data
+
+
+def legacy_predict(model, X):
+    """Row-by-row combination loop DLHA.predict used before the masked version."""
+    X_processed = model.preprocess_data(X)
+    layer1_pred = model.layer1_classifier.predict_proba(X_processed)
+    layer2_pred = model.layer2_classifier.predict_proba(X_processed)
+    final_predictions = []
+    for l1_prob, l2_prob in zip(layer1_pred, layer2_pred):
+        if max(l1_prob) > model.confidence_threshold:
+            final_predictions.append('DoS' if l1_prob[0] > l1_prob[1] else 'Probe')
+        else:
+            final_predictions.append(model.layer2_classifier.classes_[np.argmax(l2_prob)])
+    return np.array(final_predictions)
+
+
+def time_rows_per_second(fn, X, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DLHA.predict throughput before/after vectorization")
+    parser.add_argument('--train-rows', type=int, default=20000,
+                        help="Rows of processed_train.csv used to fit the model (0 = all)")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        return
+    if args.train_rows:
+        X_train, y_train = X_train.iloc[:args.train_rows], y_train.iloc[:args.train_rows]
+
+    print(f"Training DLHA on {len(X_train)} rows...")
+    model = DLHA()
+    model.train(X_train, y_train)
+
+    legacy = legacy_predict(model, X_test)
+    current = model.predict(X_test)
+    print(f"Predictions identical: {np.mean(legacy == current) * 100:.2f}% of {len(X_test)} rows")
+
+    legacy_rps, legacy_time = time_rows_per_second(lambda X: legacy_predict(model, X), X_test, args.repeats)
+    current_rps, current_time = time_rows_per_second(model.predict, X_test, args.repeats)
+
+    print(f"\n{'path':<12}{'seconds':>10}{'rows/sec':>14}")
+    print(f"{'legacy':<12}{legacy_time:>10.3f}{legacy_rps:>14,.0f}")
+    print(f"{'vectorized':<12}{current_time:>10.3f}{current_rps:>14,.0f}")
+    print(f"\nSpeedup: {current_rps / legacy_rps:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from common import load_raw_records, train_benchmark_model
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from feature_encoding import FeatureEncoder
+from prediction_cache import CachedModel, PredictionCache
+
+
+def replay_order(n_records, length, duplicate_rate, zipf, seed=0):
+    """
+    Indexes of a replayed request stream: with probability duplicate_rate
+    a request repeats an already seen record, picked Zipf-distributed by
+    how recently it was first seen (scanners and health checks repeat the
+    same few flows); otherwise it is the next new record.
+    """
+    rng = np.random.default_rng(seed)
+    order = np.empty(length, dtype=np.int64)
+    seen = 0
+    for i in range(length):
+        if seen and (seen >= n_records or rng.random() < duplicate_rate):
+            rank = min(int(rng.zipf(zipf)), seen)
+            order[i] = seen - rank
+        else:
+            order[i] = seen
+            seen += 1
+    return order
+
+
+def run_batches(model, X, batch_size):
+    start = time.perf_counter()
+    labels = [model.predict_with_confidence(X[i:i + batch_size])['labels'] for i in range(0, len(X), batch_size)]
+    return np.concatenate(labels), time.perf_counter() - start
+
+
+def run_single(model, X):
+    latencies = np.empty(len(X))
+    labels = np.empty(len(X), dtype=object)
+    for i in range(len(X)):
+        start = time.perf_counter()
+        labels[i] = model.predict_with_confidence(X[i:i + 1])['labels'][0]
+        latencies[i] = time.perf_counter() - start
+    return labels.astype(str), latencies * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DLHA scoring with and without the prediction cache on replayed KDDTest+")
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.6)
+    parser.add_argument('--zipf', type=float, default=1.3, help="Zipf exponent of which seen record repeats")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--single', type=int, default=5000, help="Requests scored one at a time")
+    parser.add_argument('--cache-size', type=int, default=10000)
+    parser.add_argument('--decimals', type=int, default=None)
+    parser.add_argument('--train-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    model, encoders = train_benchmark_model(args.train_rows)
+    records = load_raw_records()
+    X_records = FeatureEncoder.from_label_encoders(encoders).encode_records(records)
+    X = X_records[replay_order(len(X_records), args.requests, args.duplicate_rate, args.zipf)]
+    distinct = len(np.unique(X, axis=0))
+    print(f"{len(X):,} requests over {distinct:,} distinct vectors ({1 - distinct / len(X):.0%} repeats), "
+          f"cache size {args.cache_size:,}")
+
+    baseline_labels, baseline_s = run_batches(model, X, args.batch_size)
+    cache = PredictionCache(args.cache_size, ttl=None, decimals=args.decimals)
+    cached_labels, cached_s = run_batches(CachedModel(model, cache), X, args.batch_size)
+    stats = cache.stats()
+    print(f"\nBatches of {args.batch_size}")
+    print(f"{'path':<12}{'rows/s':>12}{'hit rate':>10}{'evictions':>11}")
+    print(f"{'uncached':<12}{len(X) / baseline_s:>12,.0f}{'-':>10}{'-':>11}")
+    print(f"{'cached':<12}{len(X) / cached_s:>12,.0f}{stats['hit_rate']:>10.1%}{stats['evictions']:>11,}")
+    print(f"Labels identical: {np.array_equal(baseline_labels, cached_labels)}")
+
+    X_single = X[:args.single]
+    baseline_labels, baseline_ms = run_single(model, X_single)
+    cache = PredictionCache(args.cache_size, ttl=None, decimals=args.decimals)
+    cached_labels, cached_ms = run_single(CachedModel(model, cache), X_single)
+    print(f"\nSingle records ({len(X_single):,} requests)")
+    print(f"{'path':<12}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'hit rate':>10}")
+    print(f"{'uncached':<12}{baseline_ms.mean():>10.3f}{np.percentile(baseline_ms, 50):>9.3f}"
+          f"{np.percentile(baseline_ms, 99):>9.3f}{'-':>10}")
+    print(f"{'cached':<12}{cached_ms.mean():>10.3f}{np.percentile(cached_ms, 50):>9.3f}"
+          f"{np.percentile(cached_ms, 99):>9.3f}{cache.stats()['hit_rate']:>10.1%}")
+    print(f"Labels identical: {np.array_equal(baseline_labels, cached_labels)}")
+
+
+if __name__ == "__main__":
+    main()
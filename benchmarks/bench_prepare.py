@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import pandas as pd
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from data_preparation import ATTACK_MAPPING, COLUMNS, RAW_TEST_PATH, RAW_TRAIN_PATH, load_prepared_dataset
+from feature_encoding import FeatureEncoder
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def legacy_prepare(train_path, test_path, out_dir):
+    """prepare_dataset before chunking: whole files in memory, a Python lambda per label, CSV output."""
+    train_data = pd.read_csv(train_path, names=COLUMNS).drop('difficulty', axis=1)
+    test_data = pd.read_csv(test_path, names=COLUMNS).drop('difficulty', axis=1)
+    train_data['label'] = train_data['label'].map(lambda x: ATTACK_MAPPING.get(x.lower(), 'Normal'))
+    test_data['label'] = test_data['label'].map(lambda x: ATTACK_MAPPING.get(x.lower(), 'Normal'))
+    feature_encoder = FeatureEncoder.fit(train_data)
+    train_data = feature_encoder.encode_categoricals(train_data)
+    test_data = feature_encoder.encode_categoricals(test_data)
+    train_data.to_csv(os.path.join(out_dir, 'processed_train.csv'), index=False)
+    test_data.to_csv(os.path.join(out_dir, 'processed_test.csv'), index=False)
+    return len(train_data) + len(test_data)
+
+
+def chunked_prepare(train_path, test_path, out_dir, workers, chunk_bytes):
+    train_data, test_data, _ = load_prepared_dataset(train_path, test_path, cache_dir=out_dir, rebuild=True,
+                                                     workers=workers, chunk_bytes=chunk_bytes)
+    return len(train_data) + len(test_data)
+
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_one(args):
+    out_dir = tempfile.mkdtemp(prefix='dlha-prepare-')
+    try:
+        start = time.perf_counter()
+        if args.run == 'legacy':
+            rows = legacy_prepare(args.train, args.test, out_dir)
+        else:
+            rows = chunked_prepare(args.train, args.test, out_dir, args.workers[0], args.chunk_mb * 1024 * 1024)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    print(json.dumps({'rows': rows, 'seconds': elapsed,
+                      'peak_mb': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                      'worker_peak_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None}))
+
+
+def enlarge(path, copies, out_dir):
+    """The raw file repeated `copies` times, standing in for a larger flow log."""
+    target = os.path.join(out_dir, f'x{copies}_' + os.path.basename(path))
+    with open(target, 'wb') as out:
+        for _ in range(copies):
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raw data preparation: in-memory prepare_dataset vs chunked parallel pipeline")
+    parser.add_argument('--train', default=RAW_TRAIN_PATH)
+    parser.add_argument('--test', default=RAW_TEST_PATH)
+    parser.add_argument('--copies', type=int, default=8, help="Repeat the raw train file this many times")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count()])
+    parser.add_argument('--chunk-mb', type=int, default=16)
+    parser.add_argument('--run', choices=['legacy', 'chunked'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix='dlha-raw-')
+    try:
+        train = enlarge(args.train, args.copies, tmp_dir) if args.copies > 1 else args.train
+        print(f"Input: {os.path.getsize(train) / 1e6:,.0f} MB train + {os.path.getsize(args.test) / 1e6:,.1f} MB test")
+        runs = [('in-memory prepare_dataset', ['--run', 'legacy'])]
+        for workers in dict.fromkeys(args.workers):
+            runs.append((f'chunked, {workers} worker(s)', ['--run', 'chunked', '--workers', str(workers)]))
+        print(f"{'path':<28}{'rows':>12}{'rows/s':>12}{'peak MB':>10}{'worker MB':>11}")
+        for name, extra in runs:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--train', train, '--test', args.test,
+                                     '--chunk-mb', str(args.chunk_mb)] + extra,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            workers_mb = f"{result['worker_peak_mb']:.0f}" if result['worker_peak_mb'] else '-'
+            peak_mb = f"{result['peak_mb']:.0f}" if result['peak_mb'] is not None else 'n/a'
+            print(f"{name:<28}{result['rows']:>12,}{result['rows'] / result['seconds']:>12,.0f}"
+                  f"{peak_mb:>10}{workers_mb:>11}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
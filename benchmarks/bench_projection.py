@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, FusedProjection, load_and_prepare_data
+
+
+def latency_us(fn, rows, repeats):
+    """Median per-call latency in microseconds over single rows."""
+    timings = []
+    for _ in range(repeats):
+        for row in rows:
+            start = time.perf_counter()
+            fn(row)
+            timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sklearn scaler+PCA vs fused affine projection")
+    parser.add_argument('--rows', type=int, default=1000, help="Single rows timed per path")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        return
+    model = DLHA()
+    model.fit_preprocessing(X_train)
+    frame_rows = [X_test.iloc[i:i + 1] for i in range(min(args.rows, len(X_test)))]
+    array_rows = [row.to_numpy() for row in frame_rows]
+    fused64 = FusedProjection(model.scaler, model.pca, np.float64)
+    fused32 = FusedProjection(model.scaler, model.pca, np.float32)
+
+    reference = model.pca.transform(model.scaler.transform(X_test))
+    print(f"Max abs difference float64: {np.abs(fused64.transform(X_test) - reference).max():.2e}")
+    print(f"Max abs difference float32: {np.abs(fused32.transform(X_test) - reference).max():.2e}")
+
+    paths = [
+        ('sklearn', lambda row: model.pca.transform(model.scaler.transform(row)), frame_rows),
+        ('fused f64', fused64.transform, array_rows),
+        ('fused f32', fused32.transform, array_rows),
+    ]
+    print(f"\n{'path':<12}{'median us/row':>15}")
+    for name, fn, rows in paths:
+        print(f"{name:<12}{latency_us(fn, rows, args.repeats):>15.1f}")
+
+    start = time.perf_counter()
+    model.pca.transform(model.scaler.transform(X_test))
+    sklearn_batch = time.perf_counter() - start
+    start = time.perf_counter()
+    fused64.transform(X_test)
+    fused_batch = time.perf_counter() - start
+    print(f"\nFull test set: sklearn {sklearn_batch * 1000:.1f} ms, fused {fused_batch * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import multiprocessing
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from live_stats import LiveStats
+from status_stream import StatusStream
+
+PAGE = "<html><body>" + "<p>Network Monitor Status</p>" * 60 + "</body></html>"
+
+
+def generate_traffic(stats, rate):
+    interval = 1.0 / rate
+    i = 0
+    while True:
+        stats.record(f'10.0.0.{i % 50}', '192.168.1.1', 'Normal' if i % 20 else 'Alert', 0.9,
+                     None if i % 20 else 'Potential port scan detected')
+        i += 1
+        time.sleep(interval)
+
+
+def serve(mode, port, rate, conn):
+    """Server process: live stats fed at `rate` packets/s, served by SSE or by the Flask dev server."""
+    stats = LiveStats()
+    threading.Thread(target=generate_traffic, args=(stats, rate), daemon=True).start()
+    if mode == 'sse':
+        StatusStream(stats.snapshot).start('127.0.0.1', port)
+    else:
+        import logging
+        from flask import Flask, jsonify
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app = Flask(__name__)
+        app.add_url_rule('/', 'index', lambda: PAGE)
+        app.add_url_rule('/get_status', 'get_status', lambda: jsonify(stats.snapshot()))
+        threading.Thread(target=app.run, kwargs={'host': '127.0.0.1', 'port': port, 'threaded': True},
+                         daemon=True).start()
+    conn.recv()
+    start = time.process_time()
+    conn.recv()
+    conn.send(time.process_time() - start)
+
+
+async def sse_client(port, counters, stop):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /status/stream HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    await writer.drain()
+    while not stop.is_set():
+        try:
+            chunk = await asyncio.wait_for(reader.read(65536), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        if not chunk:
+            break
+        counters['bytes'] += len(chunk)
+        counters['events'] += chunk.count(b'\n\n')
+    writer.close()
+
+
+async def http_get(port, path, counters):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.0\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    counters['bytes'] += len(data)
+    counters['events'] += 1
+
+
+async def polling_client(port, counters, stop):
+    # The old page: a full reload and a /get_status fetch every second
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(http_get(port, '/', counters), http_get(port, '/get_status', counters))
+        except (ConnectionError, OSError):
+            counters['errors'] += 1
+        await asyncio.sleep(max(0.0, 1.0 - (time.perf_counter() - started)))
+
+
+async def run_clients(mode, port, subscribers, duration):
+    counters = {'bytes': 0, 'events': 0, 'errors': 0}
+    stop = asyncio.Event()
+    client = sse_client if mode == 'sse' else polling_client
+    tasks = [asyncio.create_task(client(port, counters, stop)) for _ in range(subscribers)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return counters
+
+
+def measure(mode, port, subscribers, duration, rate):
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    server = context.Process(target=serve, args=(mode, port, rate, child), daemon=True)
+    server.start()
+    time.sleep(3)
+    parent.send('start')
+    counters = asyncio.run(run_clients(mode, port, subscribers, duration))
+    parent.send('stop')
+    cpu = parent.recv()
+    server.terminate()
+    print(f"{mode:8s} {subscribers} clients for {duration:.0f}s | server CPU {cpu:.2f}s ({cpu / duration * 100:.0f}% of a core)"
+          f" | {counters['events'] / duration:,.0f} messages/s | {counters['bytes'] / duration / 1e3:,.1f} kB/s"
+          f" | errors {counters['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE status stream vs 1 Hz reload + poll, many subscribers")
+    parser.add_argument('--subscribers', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=2000, help="Simulated packets/s recorded into the stats")
+    parser.add_argument('--port', type=int, default=5091)
+    args = parser.parse_args()
+
+    measure('sse', args.port, args.subscribers, args.duration, args.rate)
+    measure('polling', args.port + 1, args.subscribers, args.duration, args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, iter_training_chunks
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float('nan')
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(path, factor, chunksize):
+    """Train once on `factor` replicas of the dataset and print a JSON result line."""
+    rows = 0
+
+    def make_chunks():
+        nonlocal rows
+        rows = 0
+        for _ in range(factor):
+            for X, y in iter_training_chunks(path, chunksize):
+                rows += len(X)
+                yield X, y
+
+    model = DLHA(layer2_backend='rff')
+    start = time.perf_counter()
+    model.train_streaming(make_chunks)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'factor': factor, 'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and peak RSS of DLHA.train_streaming")
+    parser.add_argument('--path', default='data/processed_train.csv')
+    parser.add_argument('--factors', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.path, args.worker, args.chunksize)
+        return
+
+    # Each replication factor runs in a fresh process so peak RSS is not shared
+    print(f"{'factor':>7}{'rows':>14}{'seconds':>10}{'rows/sec':>12}{'peak RSS MB':>13}")
+    for factor in args.factors:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--path', args.path,
+             '--chunksize', str(args.chunksize), '--worker', str(factor)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{factor:>6}x{result['rows']:>14,}{result['seconds']:>10.1f}"
+              f"{result['rows'] / result['seconds']:>12,.0f}{result['peak_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+import joblib
+import pandas as pd
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from dlha_implementation import DLHA, load_and_prepare_data
+from feature_encoding import FEATURE_COLUMNS
+
+
+def load_raw_records(path='data/KDDTest+.txt', limit=None):
+    """Raw KDD rows as dicts with string categoricals, like the /predict form posts."""
+    data = pd.read_csv(path, names=FEATURE_COLUMNS + ['label', 'difficulty'], nrows=limit)
+    return data[FEATURE_COLUMNS].to_dict(orient='records')
+
+
+def train_benchmark_model(train_rows=20000, layer2_backend='svc'):
+    """Fit a DLHA on the processed training set and load the matching label encoders."""
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        sys.exit("Processed datasets not found, run data_preparation.py first")
+    if train_rows:
+        X_train, y_train = X_train.iloc[:train_rows], y_train.iloc[:train_rows]
+    model = DLHA(layer2_backend=layer2_backend)
+    model.train(X_train, y_train)
+    encoders = joblib.load('model/label_encoders.pkl')
+    return model, encoders
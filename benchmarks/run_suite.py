@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+from importlib import metadata
+import numpy as np
+
+# Add project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from dlha_implementation import DLHA, load_and_prepare_data
+from raw_packets import PcapFileReader, parse_frame
+from synthetic_traffic import generate_headers, write_pcap
+
+SUITE_VERSION = 1
+GROUPS = ('train', 'predict', 'preprocess', 'packets', 'http')
+DEFAULT_OUTPUT_DIR = os.path.join('results', 'benchmarks')
+PACKAGES = ('numpy', 'pandas', 'scipy', 'scikit-learn', 'joblib', 'scapy', 'flask')
+# Environment fields that make two result files incomparable when they differ
+COMPARABLE_FIELDS = ('python', 'machine', 'cpu_count', 'packages')
+
+
+def entry(value, unit, better, samples=None, **params):
+    """One benchmark result: the headline value, its unit and which direction is better."""
+    result = {'value': round(float(value), 6), 'unit': unit, 'better': better}
+    if samples is not None:
+        result['samples'] = [round(float(sample), 6) for sample in samples]
+    if params:
+        result['params'] = params
+    return result
+
+
+def skipped(reason):
+    return {'skipped': reason}
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_dir, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        if not commit:
+            return None
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=project_dir,
+                               capture_output=True, text=True, timeout=60).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return {'commit': commit, 'dirty': bool(dirty)}
+
+
+def environment(dataset):
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    settings = {name: value for name, value in os.environ.items()
+                if name.startswith('DLHA_') or name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')}
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': packages,
+        'git': git_revision(),
+        'dataset': dataset,
+        'settings': settings
+    }
+
+
+def repeat_timed(function, repeats):
+    """
+    Seconds for each of `repeats` calls, after one untimed warm-up call.
+    Headline values use the fastest call: on a shared machine it is the
+    most reproducible figure, slower calls mostly measure interference.
+    """
+    function()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def per_call_latencies(function, items):
+    latencies = np.empty(len(items))
+    for i, item in enumerate(items):
+        start = time.perf_counter()
+        function(item)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def train_in(directory, X, y):
+    """DLHA.train on X, y. train saves model/dlha_model.pkl, so it runs from directory to leave the real model alone."""
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        model = DLHA()
+        model.train(X, y)
+    finally:
+        os.chdir(previous)
+    return model
+
+
+def bench_train(X_train, y_train, sizes, repeats, scratch):
+    results = {}
+    for size in sizes:
+        name = f'train.rows_{size}.seconds'
+        if size > len(X_train):
+            results[name] = skipped(f"only {len(X_train)} training rows")
+            continue
+        X, y = X_train.iloc[:size], y_train.iloc[:size]
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            train_in(scratch, X, y)
+            samples.append(time.perf_counter() - start)
+        results[name] = entry(min(samples), 's', 'lower', samples, rows=size)
+        print(f"  train {size:>8,} rows   {min(samples):10.3f} s")
+    return results
+
+
+def bench_predict(model, X, single_rows, repeats):
+    rows = [X[i:i + 1] for i in range(min(single_rows, len(X)))]
+    latencies = per_call_latencies(model.predict_with_confidence, rows) * 1000
+    samples = [len(X) / seconds for seconds in repeat_timed(lambda: model.predict_with_confidence(X), repeats)]
+    print(f"  predict single row   p50 {np.percentile(latencies, 50):.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms")
+    print(f"  predict batch        {max(samples):12,.0f} rows/s")
+    return {
+        'predict.single_row.p50_ms': entry(np.percentile(latencies, 50), 'ms', 'lower', rows=len(rows)),
+        'predict.single_row.p99_ms': entry(np.percentile(latencies, 99), 'ms', 'lower', rows=len(rows)),
+        'predict.batch.rows_per_s': entry(max(samples), 'rows/s', 'higher', samples, rows=len(X))
+    }
+
+
+def bench_preprocess(model, X, single_rows, repeats):
+    rows = [X[i:i + 1] for i in range(min(single_rows, len(X)))]
+    latencies = per_call_latencies(model.preprocess_data, rows) * 1e6
+    samples = [len(X) / seconds for seconds in repeat_timed(lambda: model.preprocess_data(X), repeats)]
+    print(f"  preprocess single row p50 {np.percentile(latencies, 50):.1f} us")
+    print(f"  preprocess batch     {max(samples):12,.0f} rows/s")
+    return {
+        'preprocess.single_row.p50_us': entry(np.percentile(latencies, 50), 'us', 'lower', rows=len(rows)),
+        'preprocess.batch.rows_per_s': entry(max(samples), 'rows/s', 'higher', samples, rows=len(X))
+    }
+
+
+def packets_per_second(function, items, repeats):
+    samples = [len(items) / seconds for seconds in repeat_timed(lambda: [function(item) for item in items], repeats)]
+    return entry(max(samples), 'packets/s', 'higher', samples, packets=len(items))
+
+
+def bench_packets(packet_count, repeats, scratch):
+    from scapy.all import Ether
+    import dlha_main
+
+    path = os.path.join(scratch, 'synthetic.pcap')
+    write_pcap(generate_headers(packet_count), path)
+    with PcapFileReader(path) as reader:
+        frames = list(reader)
+    headers = [parse_frame(frame, ts) for ts, frame in frames]
+    # sniff hands detect_attack packets that are already dissected, so dissection is not timed
+    packets = [Ether(frame) for _, frame in frames]
+
+    results = {
+        'packets.dlha_main.detect_attack.packets_per_s':
+            packets_per_second(dlha_main.detect_attack, packets, repeats),
+        'packets.dlha_main.detect_attack_header.packets_per_s':
+            packets_per_second(dlha_main.detect_attack_header, headers, repeats)
+    }
+    name = 'packets.network_monitor.analyze_packet.packets_per_s'
+    try:
+        import network_monitor
+    except Exception as e:
+        # The monitor is Windows-only (winreg, pyshark), so this is expected elsewhere
+        results[name] = skipped(f"network_monitor not importable: {str(e)}")
+    else:
+        features = [{'src': header.src, 'dst': header.dst, 'proto': header.proto, 'len': header.length,
+                     'ttl': header.ttl, 'timestamp': header.ts} for header in headers if header.version == 4]
+        results[name] = packets_per_second(network_monitor.analyze_packet, features, repeats)
+    for key, result in results.items():
+        label = key.split('.', 1)[1].rsplit('.', 1)[0]
+        if 'value' in result:
+            print(f"  {label:<38}{result['value']:12,.0f} packets/s")
+        else:
+            print(f"  {label:<38}skipped: {result['skipped']}")
+    return results
+
+
+def bench_http(modes, clients, duration, port):
+    from bench_async_server import start_server, stop_server
+    from test_request import run_load_test
+
+    results = {}
+    for offset, mode in enumerate(modes):
+        try:
+            server = start_server(mode, port + offset, 4)
+        except SystemExit as e:
+            results[f'http.{mode}.requests_per_s'] = skipped(str(e))
+            continue
+        try:
+            load = run_load_test(f'http://localhost:{port + offset}/predict', clients, duration)
+        finally:
+            stop_server(server)
+        if load is None:
+            results[f'http.{mode}.requests_per_s'] = skipped("test data not found")
+            continue
+        params = {'clients': clients, 'duration_s': duration, 'statuses': load['statuses']}
+        results[f'http.{mode}.requests_per_s'] = entry(load['throughput_per_s'], 'requests/s', 'higher', **params)
+        results[f'http.{mode}.p50_ms'] = entry(load['latency_ms']['p50'], 'ms', 'lower', **params)
+        results[f'http.{mode}.p99_ms'] = entry(load['latency_ms']['p99'], 'ms', 'lower', **params)
+        print(f"  /predict {mode:<6} {clients} clients  {load['throughput_per_s']:10,.1f} req/s, "
+              f"p99 {load['latency_ms']['p99']} ms")
+    return results
+
+
+def run_suite(args):
+    X_train, X_test, y_train, y_test = load_and_prepare_data()
+    if X_train is None:
+        sys.exit("Processed datasets not found, run data_preparation.py first")
+    dataset = {'train_rows': len(X_train), 'test_rows': len(X_test)}
+    groups = args.only or GROUPS
+    results = {}
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='dlha-bench-') as scratch:
+        if 'train' in groups:
+            print("DLHA.train")
+            results.update(bench_train(X_train, y_train, args.train_sizes, args.train_repeats, scratch))
+        if 'predict' in groups or 'preprocess' in groups:
+            model = train_in(scratch, X_train.iloc[:args.model_rows], y_train.iloc[:args.model_rows])
+            # Encoded rows as the API builds them
+            X = X_test.to_numpy(dtype=np.float64)[:args.batch_rows]
+            if 'predict' in groups:
+                print("DLHA.predict_with_confidence")
+                results.update(bench_predict(model, X, args.single_rows, args.repeats))
+            if 'preprocess' in groups:
+                print("DLHA.preprocess_data")
+                results.update(bench_preprocess(model, X, args.single_rows, args.repeats))
+        if 'packets' in groups:
+            print("Packet analysis")
+            results.update(bench_packets(args.packets, args.repeats, scratch))
+    if 'http' in groups:
+        print("/predict over HTTP")
+        results.update(bench_http(args.http_modes, args.http_clients, args.http_duration, args.port))
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'compare')}
+    return {
+        'suite_version': SUITE_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'environment': environment(dataset),
+        'config': config,
+        'results': results
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Per-benchmark change from baseline to current. A result regresses when
+    it moved in its worse direction by more than threshold (a fraction).
+    Returns (rows, regressions, environment differences).
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old = baseline['results'].get(name, {})
+        new = current['results'].get(name, {})
+        if 'value' not in old or 'value' not in new:
+            status = 'new' if 'value' in new else 'missing' if 'value' in old else 'skipped'
+            rows.append((name, old.get('value'), new.get('value'), None, status))
+            continue
+        change = (new['value'] - old['value']) / old['value'] if old['value'] else 0.0
+        worse = change > threshold if new['better'] == 'lower' else change < -threshold
+        better = change < -threshold if new['better'] == 'lower' else change > threshold
+        status = 'REGRESSION' if worse else 'improved' if better else 'ok'
+        if worse:
+            regressions.append(name)
+        rows.append((name, old['value'], new['value'], change, status))
+
+    differences = {field: (baseline['environment'].get(field), current['environment'].get(field))
+                   for field in COMPARABLE_FIELDS
+                   if baseline['environment'].get(field) != current['environment'].get(field)}
+    return rows, regressions, differences
+
+
+def print_comparison(rows, regressions, differences, threshold):
+    print(f"\n{'benchmark':<56}{'baseline':>14}{'current':>14}{'change':>10}  status")
+    for name, old, new, change, status in rows:
+        old_text = f"{old:,.3f}" if old is not None else '-'
+        new_text = f"{new:,.3f}" if new is not None else '-'
+        change_text = f"{change:+.1%}" if change is not None else '-'
+        print(f"{name:<56}{old_text:>14}{new_text:>14}{change_text:>10}  {status}")
+    for field, (old, new) in differences.items():
+        print(f"Warning: environment {field} differs (baseline {old}, current {new}); timings may not be comparable")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\nNo regressions beyond {threshold:.0%}")
+
+
+def load_results(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('suite_version') != SUITE_VERSION:
+        sys.exit(f"{path} was written by suite version {results.get('suite_version')}, expected {SUITE_VERSION}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="DLHA benchmark suite: runs every benchmark group, writes the results as JSON with "
+                    "environment metadata and optionally flags regressions against a saved baseline")
+    parser.add_argument('--output', help="Results file (default results/benchmarks/bench-<timestamp>.json)")
+    parser.add_argument('--baseline', help="Compare this run against a saved results file; exit 1 on regression")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Only compare two saved results files, without running anything")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative change in the worse direction that counts as a regression")
+    parser.add_argument('--only', nargs='+', choices=GROUPS, help="Benchmark groups to run (default all)")
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes and shorter runs, for a smoke test")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--train-sizes', type=int, nargs='+', default=[5000, 20000, 50000])
+    parser.add_argument('--train-repeats', type=int, default=3)
+    parser.add_argument('--model-rows', type=int, default=20000, help="Training rows of the model used for predict")
+    parser.add_argument('--batch-rows', type=int, default=10000, help="Rows per batch in the throughput runs")
+    parser.add_argument('--single-rows', type=int, default=2000, help="Rows timed one at a time for latency")
+    parser.add_argument('--packets', type=int, default=50000)
+    parser.add_argument('--http-modes', nargs='+', default=['async', 'flask'], choices=['async', 'flask'])
+    parser.add_argument('--http-clients', type=int, default=32)
+    parser.add_argument('--http-duration', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=8290)
+    args = parser.parse_args()
+
+    if args.compare:
+        rows, regressions, differences = compare_results(load_results(args.compare[0]),
+                                                         load_results(args.compare[1]), args.threshold)
+        print_comparison(rows, regressions, differences, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    if args.quick:
+        args.repeats = min(args.repeats, 3)
+        args.train_sizes = [size // 10 for size in args.train_sizes]
+        args.train_repeats = 1
+        args.model_rows = args.model_rows // 4
+        args.single_rows = args.single_rows // 4
+        args.packets = args.packets // 5
+        args.http_duration = min(args.http_duration, 2.0)
+
+    results = run_suite(args)
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"bench-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        rows, regressions, differences = compare_results(load_results(args.baseline), results, args.threshold)
+        print_comparison(rows, regressions, differences, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import random
+
+from flow_aggregator import PROTO_TCP, PROTO_UDP, PROTO_ICMP, SYN, ACK, FIN, RST
+
+PSH = 0x08
+
+
+def generate_headers(n_packets=100000, seed=0, start_ts=1700000000.0, packets_per_second=20000):
+    """
+    Synthetic decoded packet headers in the tuple format of
+    flow_aggregator.headers_from_scapy: a mix of complete TCP sessions,
+    SYN flood, port scan, UDP DNS and ICMP echo traffic, in time order.
+    """
+    rng = random.Random(seed)
+    headers = []
+    ts = start_ts
+    step = 1.0 / packets_per_second
+    clients = [f'10.0.{i // 250}.{i % 250 + 1}' for i in range(500)]
+    servers = [f'192.168.1.{i}' for i in range(1, 21)]
+    payload = b'GET / HTTP/1.1\r\nHost: example\r\n\r\n'
+
+    def emit(src, dst, proto, sport, dport, length, flags=0, icmp_type=None):
+        nonlocal ts
+        ts += step * rng.uniform(0.5, 1.5)
+        headers.append((ts, src, dst, proto, sport, dport, length, flags, icmp_type, False))
+
+    while len(headers) < n_packets:
+        kind = rng.random()
+        client, server = rng.choice(clients), rng.choice(servers)
+        sport = rng.randint(1024, 65535)
+        if kind < 0.45:
+            dport = rng.choice([80, 443, 22, 21, 25])
+            emit(client, server, PROTO_TCP, sport, dport, 0, SYN)
+            emit(server, client, PROTO_TCP, dport, sport, 0, SYN | ACK)
+            emit(client, server, PROTO_TCP, sport, dport, 0, ACK)
+            emit(client, server, PROTO_TCP, sport, dport, len(payload), PSH | ACK)
+            emit(server, client, PROTO_TCP, dport, sport, rng.randint(200, 1400), PSH | ACK)
+            emit(client, server, PROTO_TCP, sport, dport, 0, FIN | ACK)
+            emit(server, client, PROTO_TCP, dport, sport, 0, FIN | ACK)
+        elif kind < 0.65:
+            # SYN flood burst against one web server
+            for _ in range(rng.randint(5, 20)):
+                emit(rng.choice(clients), server, PROTO_TCP, rng.randint(1024, 65535), 80, 0, SYN)
+        elif kind < 0.75:
+            # Port scan answered with RST
+            for port in rng.sample(range(1, 1024), rng.randint(3, 10)):
+                emit(client, server, PROTO_TCP, sport, port, 0, SYN)
+                emit(server, client, PROTO_TCP, port, sport, 0, RST | ACK)
+        elif kind < 0.9:
+            emit(client, server, PROTO_UDP, sport, 53, rng.randint(30, 60))
+            emit(server, client, PROTO_UDP, 53, sport, rng.randint(60, 512))
+        else:
+            size = rng.choice([56, 56, 56, 1480])
+            emit(client, server, PROTO_ICMP, 0, 0, size, icmp_type=8)
+            emit(server, client, PROTO_ICMP, 0, 0, size, icmp_type=0)
+    return headers[:n_packets]
+
+
+def write_pcap(headers, path):
+    """Write headers as a pcap file with scapy, filling payloads with zero bytes."""
+    from scapy.all import Ether, IP, TCP, UDP, ICMP, Raw, PcapWriter
+
+    writer = PcapWriter(path, sync=False)
+    for ts, src, dst, proto, sport, dport, length, flags, icmp_type, _ in headers:
+        if proto == PROTO_TCP:
+            layer = TCP(sport=sport, dport=dport, flags=flags)
+        elif proto == PROTO_UDP:
+            layer = UDP(sport=sport, dport=dport)
+        else:
+            layer = ICMP(type=icmp_type)
+        packet = Ether() / IP(src=src, dst=dst) / layer
+        if length:
+            packet = packet / Raw(b'\x00' * length)
+        packet.time = ts
+        writer.write(packet)
+    writer.close()
@@ -0,0 +1,203 @@
+import os
+import csv
+import json
+import codecs
+import datetime
+from itertools import islice
+import numpy as np
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from data_preparation import ATTACK_MAPPING
+
+CATEGORIES = ['DoS', 'Normal', 'Probe', 'R2L', 'U2R']
+
+# Longest JSON array element iter_json_array_records buffers, in characters; a KDD record is about 1 kB
+MAX_ELEMENT_SIZE = 1 << 20
+
+
+def map_label(label):
+    """Map a raw attack name (or an already mapped category) to its main category."""
+    if label in CATEGORIES:
+        return label
+    return ATTACK_MAPPING.get(str(label).lower(), 'Normal')
+
+
+def iter_ndjson_records(stream):
+    """Yield one record per non-empty line of an NDJSON byte stream."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array_records(stream, read_size=65536, max_element_size=MAX_ELEMENT_SIZE):
+    """
+    Yield the elements of a JSON array from a byte stream without loading
+    the whole document. Only a read_size buffer plus the current element
+    are held in memory. Anything but one well-formed array, or an element
+    longer than max_element_size characters, raises ValueError.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    # 'open' before the '[', 'first' right after it, 'element' after a ',', 'separator' after an element
+    state = 'open'
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos < len(buffer):
+            char = buffer[pos]
+            if state == 'open':
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                state = 'first'
+                pos += 1
+                continue
+            if char == ']' and state in ('first', 'separator'):
+                return
+            if state == 'separator':
+                if char != ',':
+                    raise ValueError(f"Expected ',' or ']' after a JSON array element, got {char!r}")
+                state = 'element'
+                pos += 1
+                continue
+            if char in ',]':
+                raise ValueError(f"Expected a JSON array element, got {char!r}")
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number may be cut short by the buffer, so only accept an
+                # element once the character after it is visible
+                if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]'):
+                    yield record
+                    pos = end
+                    state = 'separator'
+                    continue
+            if len(buffer) - pos > max_element_size:
+                raise ValueError(f"JSON array element longer than {max_element_size} characters")
+        if eof:
+            if state != 'open':
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        if isinstance(chunk, bytes):
+            chunk = text_decoder.decode(chunk, final=eof)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_chunks(records, chunksize):
+    """Group an iterable of records into lists of at most chunksize."""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkResultWriter:
+    """
+    Writes the artifacts test_request.py expects for a bulk scoring run:
+    a predictions CSV written chunk by chunk, a confusion matrix image and a
+    metrics JSON. Only the confusion counts are kept in memory. Used as a
+    context manager, a run that fails before close() has returned leaves
+    no partial files behind (see abort).
+    """
+
+    def __init__(self, results_dir):
+        os.makedirs(results_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.results_path = os.path.join(results_dir, f'predictions_{stamp}.csv')
+        self.confusion_matrix_path = os.path.join(results_dir, f'confusion_matrix_{stamp}.png')
+        self.metrics_path = os.path.join(results_dir, f'metrics_{stamp}.json')
+        self.confusion = np.zeros((len(CATEGORIES), len(CATEGORIES)), dtype=np.int64)
+        self.rows = 0
+        self._closed = False
+        self._file = open(self.results_path, 'w', newline='')
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(['row', 'prediction', 'confidence', 'label'])
+
+    def add(self, records, labels, confidence):
+        index = {category: i for i, category in enumerate(CATEGORIES)}
+        for record, label, conf in zip(records, labels, confidence):
+            true_label = map_label(record['label']) if 'label' in record else ''
+            if true_label and label in index:
+                self.confusion[index[true_label], index[label]] += 1
+            self._csv.writerow([self.rows, label, f'{conf:.6f}', true_label])
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
+        labelled = int(self.confusion.sum())
+        accuracy = float(np.trace(self.confusion) / labelled) if labelled else None
+
+        per_class = {}
+        for i, category in enumerate(CATEGORIES):
+            true_positive = self.confusion[i, i]
+            predicted = self.confusion[:, i].sum()
+            support = self.confusion[i, :].sum()
+            precision = true_positive / predicted if predicted else 0.0
+            recall = true_positive / support if support else 0.0
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            per_class[category] = {'precision': float(precision), 'recall': float(recall),
+                                   'f1-score': float(f1), 'support': int(support)}
+
+        with open(self.metrics_path, 'w') as f:
+            json.dump({'rows': self.rows, 'labelled_rows': labelled, 'accuracy': accuracy,
+                       'per_class': per_class}, f, indent=2)
+
+        fig = Figure(figsize=(8, 6))
+        ax = fig.subplots()
+        sns.heatmap(self.confusion, annot=True, fmt='d', cmap='Blues',
+                    xticklabels=CATEGORIES, yticklabels=CATEGORIES, ax=ax)
+        ax.set_xlabel('Predicted')
+        ax.set_ylabel('Actual')
+        ax.set_title('Confusion Matrix')
+        fig.savefig(self.confusion_matrix_path, bbox_inches='tight')
+
+        summary = {
+            'results_path': self.results_path,
+            'confusion_matrix_path': self.confusion_matrix_path,
+            'metrics_path': self.metrics_path,
+            'accuracy': accuracy,
+            'rows': self.rows
+        }
+        self._closed = True
+        return summary
+
+    def abort(self):
+        """Close the predictions file and delete the outputs of a run that did not finish. No-op after close()."""
+        if self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        for path in (self.results_path, self.confusion_matrix_path, self.metrics_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.abort()
+
+
+def score_chunks(score_records, records, chunksize, writer=None):
+    """
+    Score an iterable of records chunk by chunk with score_records(records)
+    -> (labels, confidence). Yields one result dict per record.
+    """
+    for chunk in iter_chunks(records, chunksize):
+        labels, confidence = score_records(chunk)
+        if writer is not None:
+            writer.add(chunk, labels, confidence)
+        for label, conf in zip(labels, confidence):
+            yield {'prediction': str(label), 'confidence': float(conf)}
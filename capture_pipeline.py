@@ -0,0 +1,246 @@
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+
+import metrics
+from raw_packets import parse_frame, LINKTYPE_ETHERNET
+from rule_engine import RuleEngine
+
+DEFAULT_RING_SIZE = 65536
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_TASK_QUEUE_SIZE = 64
+DEFAULT_MAX_WAIT = 0.01
+
+
+def analyze_frames(engine, frames, linktype, timed=False):
+    """
+    Decode and classify a batch of (timestamp, frame) pairs. Returns one
+    (ts, src, dst, proto, length, attack_type) tuple per IPv4 frame. With
+    timed=True each frame's decode and rules time is recorded in
+    metrics.PACKET_SECONDS.
+    """
+    results = []
+    if timed:
+        # Durations are collected per batch and bucketed in one pass at the end
+        decode_times = []
+        rules_times = []
+        clock = time.perf_counter
+        for ts, frame in frames:
+            start = clock()
+            header = parse_frame(frame, ts, linktype)
+            decoded = clock()
+            decode_times.append(decoded - start)
+            if header.version == 4:
+                attack_type = engine.match(header)
+                rules_times.append(clock() - decoded)
+                results.append((ts, header.src, header.dst, header.proto, header.length, attack_type))
+        metrics.PACKET_SECONDS.labels('decode').observe_many(decode_times)
+        metrics.PACKET_SECONDS.labels('rules').observe_many(rules_times)
+        return results
+    for ts, frame in frames:
+        header = parse_frame(frame, ts, linktype)
+        if header.version == 4:
+            results.append((ts, header.src, header.dst, header.proto, header.length, engine.match(header)))
+    return results
+
+
+# Histograms a worker process fills and ships back with each batch, merged into the parent's
+_WORKER_TIMINGS = ((metrics.PACKET_SECONDS, 'decode'), (metrics.PACKET_SECONDS, 'rules'),
+                   (metrics.QUEUE_WAIT_SECONDS, 'task_queue'))
+
+
+def _worker_main(tasks, results, linktype, rules_file, timed=False):
+    engine = RuleEngine.from_file(rules_file) if rules_file else RuleEngine()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        batch, dispatched = task
+        timings = None
+        if timed:
+            # Wall clock, comparable across processes
+            metrics.QUEUE_WAIT_SECONDS.labels('task_queue').observe(max(time.time() - dispatched, 0.0))
+        analyzed = analyze_frames(engine, batch, linktype, timed)
+        if timed:
+            timings = [histogram.labels(stage).drain() for histogram, stage in _WORKER_TIMINGS]
+        results.put((len(batch), analyzed, timings))
+
+
+class CapturePipeline:
+    """
+    Staged capture pipeline: capture thread -> bounded ring buffer ->
+    dispatcher batching frames onto a bounded task queue -> pool of worker
+    processes decoding and matching rules -> result thread calling
+    on_result(ts, src, dst, proto, length, attack_type) for every IPv4
+    frame.
+
+    The capture side only appends raw frames to the ring, so a slow
+    analysis stage fills the task queue, then the ring, and shows up as
+    counted ring overflow drops instead of kernel drops. stats() reports
+    per-stage counts, rates and queue depths.
+    """
+
+    def __init__(self, on_result, workers=2, ring_size=DEFAULT_RING_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 task_queue_size=DEFAULT_TASK_QUEUE_SIZE, max_wait=DEFAULT_MAX_WAIT,
+                 linktype=LINKTYPE_ETHERNET, rules_file=None):
+        self.on_result = on_result
+        self.workers = workers
+        self.ring_size = ring_size
+        self.batch_size = batch_size
+        self.task_queue_size = task_queue_size
+        self.max_wait = max_wait
+        self.linktype = linktype
+        self.rules_file = rules_file
+
+        self._ring = deque()
+        # spawn works the same on Windows and Linux
+        context = multiprocessing.get_context('spawn')
+        self._tasks = context.Queue(task_queue_size)
+        self._results = context.Queue()
+        # Instrumentation is decided here: spawned workers do not see a later metrics.set_enabled()
+        self.timed = metrics.ENABLED
+        self._processes = [context.Process(target=_worker_main,
+                                           args=(self._tasks, self._results, linktype, rules_file, self.timed),
+                                           daemon=True) for _ in range(workers)]
+        self._threads = []
+        self._stopping = threading.Event()
+        self._started = None
+
+        # Each counter has a single writer thread
+        self.captured = 0
+        self.ring_dropped = 0
+        self.dispatched_batches = 0
+        self.dispatched_frames = 0
+        self.analyzed_frames = 0
+        self.results = 0
+        self.alerts = 0
+
+    def start(self):
+        self._started = time.time()
+        for process in self._processes:
+            process.start()
+        self._threads = [threading.Thread(target=self._dispatch, daemon=True),
+                         threading.Thread(target=self._collect, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def feed(self, ts, frame):
+        """Capture stage: queue one raw frame, or count it as dropped when the ring is full."""
+        self.captured += 1
+        if len(self._ring) >= self.ring_size:
+            self.ring_dropped += 1
+            if self.timed:
+                metrics.DROPS.labels('ring').inc()
+            return False
+        if self.timed:
+            # The enqueue time is stripped again by the dispatcher
+            self._ring.append((ts, frame, time.perf_counter()))
+        else:
+            self._ring.append((ts, frame))
+        return True
+
+    def run_capture(self, frames):
+        """Feed an iterable of (timestamp, frame) pairs, e.g. raw_packets.iter_af_packet_frames(), from a thread."""
+        thread = threading.Thread(target=self._capture, args=(frames,), daemon=True)
+        thread.start()
+        return thread
+
+    def _capture(self, frames):
+        try:
+            for ts, frame in frames:
+                if self._stopping.is_set():
+                    break
+                self.feed(ts, frame)
+        except Exception as e:
+            print(f"Error capturing packets: {str(e)}")
+
+    def _dispatch(self):
+        ring = self._ring
+        ring_wait = metrics.QUEUE_WAIT_SECONDS.labels('ring') if self.timed else None
+        batch = []
+        deadline = None
+        while True:
+            if ring_wait is not None:
+                now = time.perf_counter()
+                waits = []
+                while ring and len(batch) < self.batch_size:
+                    ts, frame, queued = ring.popleft()
+                    waits.append(now - queued)
+                    batch.append((ts, frame))
+                ring_wait.observe_many(waits)
+            else:
+                while ring and len(batch) < self.batch_size:
+                    batch.append(ring.popleft())
+            now = time.perf_counter()
+            if batch and deadline is None:
+                deadline = now + self.max_wait
+            if batch and (len(batch) >= self.batch_size or now >= deadline or self._stopping.is_set()):
+                # Block while the workers are busy: the ring absorbs the burst and counts overflow
+                self._tasks.put((batch, time.time() if self.timed else None))
+                self.dispatched_batches += 1
+                self.dispatched_frames += len(batch)
+                batch = []
+                deadline = None
+            elif not ring:
+                if self._stopping.is_set() and not batch:
+                    break
+                time.sleep(0.001)
+
+    def _collect(self):
+        while True:
+            try:
+                count, results, timings = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set() and self.analyzed_frames >= self.dispatched_frames \
+                        and not self._threads[0].is_alive():
+                    break
+                continue
+            self.analyzed_frames += count
+            if timings:
+                for (histogram, stage), state in zip(_WORKER_TIMINGS, timings):
+                    histogram.labels(stage).merge(state)
+            for result in results:
+                self.results += 1
+                if result[-1]:
+                    self.alerts += 1
+                try:
+                    self.on_result(*result)
+                except Exception as e:
+                    print(f"Error handling result: {str(e)}")
+
+    def stop(self):
+        """Drain everything already queued, then stop the threads and workers."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join()
+
+    def stats(self):
+        """Per-stage counters, rates since start and queue depths."""
+        elapsed = max(time.time() - self._started, 1e-9) if self._started else 0.0
+        try:
+            task_depth = self._tasks.qsize()
+        except NotImplementedError:
+            task_depth = None
+
+        def rate(count):
+            return round(count / elapsed, 1) if elapsed else 0.0
+
+        return {
+            'uptime_s': round(elapsed, 3),
+            'workers': self.workers,
+            'capture': {'frames': self.captured, 'per_s': rate(self.captured), 'dropped': self.ring_dropped},
+            'ring': {'depth': len(self._ring), 'size': self.ring_size},
+            'dispatch': {'batches': self.dispatched_batches, 'frames': self.dispatched_frames,
+                         'per_s': rate(self.dispatched_frames), 'queue_depth': task_depth,
+                         'queue_size': self.task_queue_size},
+            'analysis': {'frames': self.analyzed_frames, 'per_s': rate(self.analyzed_frames),
+                         'results': self.results, 'alerts': self.alerts},
+            'dropped_total': self.ring_dropped
+        }
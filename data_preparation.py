@@ -3,7 +3,35 @@ import numpy as np
 import requests
 import os
 import joblib
-from sklearn.preprocessing import LabelEncoder
+from feature_encoding import FeatureEncoder, FEATURE_COLUMNS
+from dataset_cache import DatasetCache, DEFAULT_CACHE_DIR
+from parallel_preparation import DEFAULT_CHUNK_BYTES, prepare_chunked
+
+# Map attack types to main categories
+ATTACK_MAPPING = {
+    'normal': 'Normal',
+    'neptune': 'DoS', 'back': 'DoS', 'land': 'DoS', 'pod': 'DoS', 'smurf': 'DoS', 'teardrop': 'DoS',
+    'satan': 'Probe', 'ipsweep': 'Probe', 'nmap': 'Probe', 'portsweep': 'Probe',
+    'guess_passwd': 'R2L', 'ftp_write': 'R2L', 'imap': 'R2L', 'phf': 'R2L', 'multihop': 'R2L', 
+    'warezmaster': 'R2L', 'warezclient': 'R2L', 'spy': 'R2L',
+    'buffer_overflow': 'U2R', 'loadmodule': 'U2R', 'perl': 'U2R', 'rootkit': 'U2R'
+}
+
+# Columns of the raw KDD files, which have no header row
+COLUMNS = FEATURE_COLUMNS + ['label', 'difficulty']
+
+RAW_TRAIN_PATH = os.path.join('data', 'KDDTrain+.txt')
+RAW_TEST_PATH = os.path.join('data', 'KDDTest+.txt')
+
+# Everything that changes the prepared data besides the raw files; part of the dataset cache key
+PREPROCESSING_CONFIG = {
+    'version': 2,
+    'columns': COLUMNS,
+    'dropped': ['difficulty'],
+    'attack_mapping': ATTACK_MAPPING,
+    'default_label': 'Normal',
+    'categorical_encoding': 'sorted vocabulary of the training set'
+}
 
 def download_dataset():
     # Download NSL-KDD training and testing datasets
@@ -26,22 +54,19 @@ def download_dataset():
     with open(test_file, 'wb') as f:
         f.write(response.content)
 
-def prepare_dataset():
-    # Column names for the dataset
-    columns = ['duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes', 
-              'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
-              'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-              'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
-              'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
-              'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-              'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
-              'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
-              'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
-              'dst_host_rerror_rate', 'dst_host_srv_rerror_rate', 'label', 'difficulty']
-    
+def map_attack_labels(labels):
+    """Attack names to main categories, unknown names to 'Normal', as one vectorized lookup."""
+    return labels.str.lower().map(ATTACK_MAPPING).fillna('Normal')
+
+def process_raw_dataset(train_path=RAW_TRAIN_PATH, test_path=RAW_TEST_PATH):
+    """
+    Parse the raw KDD files in memory, map labels to categories and encode
+    categoricals. Returns (train, test, encoder). load_prepared_dataset
+    produces the same data in bounded memory.
+    """
     print("Loading datasets...")
-    train_data = pd.read_csv('data/KDDTrain+.txt', names=columns)
-    test_data = pd.read_csv('data/KDDTest+.txt', names=columns)
+    train_data = pd.read_csv(train_path, names=COLUMNS)
+    test_data = pd.read_csv(test_path, names=COLUMNS)
     
     print("Processing datasets...")
     # Drop difficulty column
@@ -49,35 +74,51 @@ def prepare_dataset():
     test_data = test_data.drop('difficulty', axis=1)
     
     # Map attack types to main categories
-    attack_mapping = {
-        'normal': 'Normal',
-        'neptune': 'DoS', 'back': 'DoS', 'land': 'DoS', 'pod': 'DoS', 'smurf': 'DoS', 'teardrop': 'DoS',
-        'satan': 'Probe', 'ipsweep': 'Probe', 'nmap': 'Probe', 'portsweep': 'Probe',
-        'guess_passwd': 'R2L', 'ftp_write': 'R2L', 'imap': 'R2L', 'phf': 'R2L', 'multihop': 'R2L', 
-        'warezmaster': 'R2L', 'warezclient': 'R2L', 'spy': 'R2L',
-        'buffer_overflow': 'U2R', 'loadmodule': 'U2R', 'perl': 'U2R', 'rootkit': 'U2R'
-    }
+    train_data['label'] = map_attack_labels(train_data['label'])
+    test_data['label'] = map_attack_labels(test_data['label'])
     
-    train_data['label'] = train_data['label'].map(lambda x: attack_mapping.get(x.lower(), 'Normal'))
-    test_data['label'] = test_data['label'].map(lambda x: attack_mapping.get(x.lower(), 'Normal'))
-    
-    # Convert categorical features
-    categorical_columns = ['protocol_type', 'service', 'flag']
-    label_encoders = {}
-    
-    for column in categorical_columns:
-        label_encoders[column] = LabelEncoder()
-        train_data[column] = label_encoders[column].fit_transform(train_data[column])
-        test_data[column] = label_encoders[column].transform(test_data[column])
+    # Convert categorical features with the same lookup tables the API uses
+    feature_encoder = FeatureEncoder.fit(train_data)
+    train_data = feature_encoder.encode_categoricals(train_data)
+    test_data = feature_encoder.encode_categoricals(test_data)
+    return train_data, test_data, feature_encoder
+
+def load_prepared_dataset(train_path=RAW_TRAIN_PATH, test_path=RAW_TEST_PATH, cache_dir=DEFAULT_CACHE_DIR,
+                          mmap=True, rebuild=False, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Encoded train and test sets and their FeatureEncoder, loaded from the
+    binary dataset cache. The raw files are only prepared when there is no
+    entry for their current contents and PREPROCESSING_CONFIG, and then in
+    parallel chunks streamed straight into the cache (see
+    parallel_preparation.prepare_chunked).
+    """
+    def write(staging):
+        return prepare_chunked(staging, train_path, test_path, COLUMNS, ATTACK_MAPPING, 'Normal',
+                               workers=workers, chunk_bytes=chunk_bytes)
+
+    cache = DatasetCache(cache_dir)
+    tables, manifest = cache.load([train_path, test_path], PREPROCESSING_CONFIG, mmap=mmap, rebuild=rebuild, write=write)
+    load = cache.last_load
+    print(f"{'Loaded' if load['hit'] else 'Built'} dataset cache {load['key']} in {load['seconds'] * 1000:.1f} ms")
+    if not load['hit']:
+        preparation = manifest['metadata']['preparation']
+        print(f"Prepared {preparation['rows']:,} rows with {preparation['workers']} workers "
+              f"({preparation['rows_per_s']:,.0f} rows/s)")
+    return tables['train'], tables['test'], FeatureEncoder(manifest['metadata']['vocabularies'])
+
+def prepare_dataset(rebuild=False, workers=None, write_csv=True):
+    train_data, test_data, feature_encoder = load_prepared_dataset(rebuild=rebuild, workers=workers)
     
     # Save label encoders for future use
     if not os.path.exists('model'):
         os.makedirs('model')
-    joblib.dump(label_encoders, 'model/label_encoders.pkl')
+    joblib.dump(feature_encoder.to_label_encoders(), 'model/label_encoders.pkl')
     
-    print("Saving processed datasets...")
-    train_data.to_csv('data/processed_train.csv', index=False)
-    test_data.to_csv('data/processed_test.csv', index=False)
+    if write_csv:
+        # CSV copies for tools that read them directly, e.g. iter_training_chunks
+        print("Saving processed datasets...")
+        train_data.to_csv('data/processed_train.csv', index=False)
+        test_data.to_csv('data/processed_test.csv', index=False)
     
     return train_data, test_data
 
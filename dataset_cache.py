@@ -0,0 +1,233 @@
+import io
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+# 2: sources are keyed in order, so entries keyed by the sorted hashes of version 1 are rebuilt
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join('data', 'cache')
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def source_fingerprints(sources, known=None):
+    """
+    {path: {'size', 'mtime_ns', 'sha256'}} for each source file. The hash of
+    a file whose size and mtime match its entry in `known` is reused, so
+    checking a warm cache costs one stat() per file instead of a full read.
+    """
+    fingerprints = {}
+    for path in sources:
+        stat = _file_stat(path)
+        previous = (known or {}).get(path)
+        if previous and previous['size'] == stat['size'] and previous['mtime_ns'] == stat['mtime_ns']:
+            stat['sha256'] = previous['sha256']
+        else:
+            stat['sha256'] = file_fingerprint(path)
+        fingerprints[path] = stat
+    return fingerprints
+
+
+def dataset_key(fingerprints, config):
+    """Cache key: hash of the source file hashes, in source order, plus the preprocessing config."""
+    # Order matters: it is each file's role, e.g. swapping the train and test files must not hit the same entry
+    payload = {'format': CACHE_FORMAT_VERSION, 'config': config,
+               'sources': [entry['sha256'] for entry in fingerprints.values()]}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+class NpyColumnWriter:
+    """
+    Appends chunks of a 1-D column to a .npy file without knowing the final
+    length up front: a fixed-size header slot is reserved when the file is
+    opened and the real header is written into it by close().
+    """
+
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._file = open(path, 'wb')
+        self._file.write(b'\x00' * self.HEADER_SIZE)
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self._file.write(values.tobytes())
+        self.rows += len(values)
+
+    def close(self):
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {'descr': np.lib.format.dtype_to_descr(self.dtype),
+                                                      'fortran_order': False, 'shape': (self.rows,)})
+        if len(header.getvalue()) != self.HEADER_SIZE:
+            raise ValueError(f"Unexpected .npy header size for {self.path}")
+        self._file.seek(0)
+        self._file.write(header.getvalue())
+        self._file.close()
+
+
+def _publish(staging, directory, manifest):
+    # The manifest is written last and the directory renamed into place, so a half-written entry is never loaded
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    return manifest
+
+
+def _staging_directory(directory):
+    staging = directory + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return staging
+
+
+def _new_manifest(fingerprints, config, key, metadata):
+    return {'format': CACHE_FORMAT_VERSION, 'key': key, 'created': time.time(),
+            'sources': fingerprints, 'config': config, 'metadata': metadata or {}, 'tables': {}}
+
+
+def save_tables(directory, tables, fingerprints, config, key, metadata=None):
+    """
+    Write DataFrames as one .npy file per column plus a manifest. Numeric
+    columns keep their dtype; text columns are stored as int32 codes with
+    their categories in the manifest.
+    """
+    staging = _staging_directory(directory)
+    manifest = _new_manifest(fingerprints, config, key, metadata)
+    for name, frame in tables.items():
+        os.makedirs(os.path.join(staging, name))
+        columns = []
+        for position, column in enumerate(frame.columns):
+            values = frame[column]
+            entry = {'name': column, 'file': f'{position:03d}.npy'}
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                array = values.to_numpy()
+            else:
+                codes, categories = pd.factorize(values.astype(str), sort=True)
+                array = codes.astype(np.int32)
+                entry['categories'] = categories.tolist()
+            np.save(os.path.join(staging, name, entry['file']), np.ascontiguousarray(array))
+            entry['dtype'] = str(array.dtype)
+            columns.append(entry)
+        manifest['tables'][name] = {'rows': len(frame), 'columns': columns}
+    return _publish(staging, directory, manifest)
+
+
+def write_tables(directory, write, fingerprints, config, key):
+    """
+    Like save_tables, for builders that stream their output: write(staging)
+    writes the column files itself and returns (tables, metadata), where
+    tables maps each table name to {'rows', 'columns'} manifest entries.
+    """
+    staging = _staging_directory(directory)
+    try:
+        tables, metadata = write(staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    manifest = _new_manifest(fingerprints, config, key, metadata)
+    manifest['tables'] = tables
+    return _publish(staging, directory, manifest)
+
+
+def load_tables(directory, mmap=True):
+    """
+    Read the tables of a cache directory back as DataFrames, memory-mapping
+    the column files. Text columns come back as pandas Categoricals over
+    the stored codes.
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    tables = {}
+    for name, table in manifest['tables'].items():
+        columns = {}
+        for entry in table['columns']:
+            array = np.load(os.path.join(directory, name, entry['file']), mmap_mode='r' if mmap else None)
+            if 'categories' in entry:
+                # Categorical over the codes as stored, so they stay memory-mapped
+                array = pd.Categorical.from_codes(array, entry['categories'])
+            columns[entry['name']] = array
+        # copy=False keeps the memory-mapped columns as they are, no consolidation into one block
+        tables[name] = pd.DataFrame(columns, copy=False)
+    return tables, manifest
+
+
+class DatasetCache:
+    """
+    Binary columnar cache of prepared datasets under cache_dir, one
+    subdirectory per key. The key covers the content hash of every source
+    file and the preprocessing config, so changing either one builds a new
+    entry instead of loading stale data. A warm load stats the sources,
+    reads the manifest and memory-maps the column files.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.last_load = None
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._index_path(), 'w') as f:
+            json.dump(index, f, indent=2)
+
+    def load(self, sources, config, build=None, mmap=True, rebuild=False, write=None):
+        """
+        Return (tables, manifest) for the sources and config. When there is
+        no valid entry it is created by build() -> (dict of DataFrames,
+        metadata dict), or by write(staging_directory) for builders that
+        stream their columns to disk (see write_tables). self.last_load
+        records whether it was a hit and how long it took.
+        """
+        start = time.perf_counter()
+        index = self._read_index()
+        fingerprints = source_fingerprints(sources, index.get('sources'))
+        key = dataset_key(fingerprints, config)
+        directory = os.path.join(self.cache_dir, key)
+        hit = not rebuild and os.path.exists(os.path.join(directory, MANIFEST_NAME))
+        if hit:
+            tables, manifest = load_tables(directory, mmap=mmap)
+        else:
+            if write is not None:
+                write_tables(directory, write, fingerprints, config, key)
+            else:
+                tables, metadata = build()
+                save_tables(directory, tables, fingerprints, config, key, metadata)
+            tables, manifest = load_tables(directory, mmap=mmap)
+        if index.get('sources') != fingerprints:
+            index['sources'] = {**index.get('sources', {}), **fingerprints}
+            self._write_index(index)
+        self.last_load = {'key': key, 'hit': hit, 'seconds': time.perf_counter() - start}
+        return tables, manifest
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -1,70 +1,294 @@
 import pandas as pd
 import numpy as np
 from sklearn.naive_bayes import GaussianNB
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import make_pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import os
+import time
+import metrics
+from data_preparation import RAW_TEST_PATH, RAW_TRAIN_PATH, load_prepared_dataset
+
+# Classes handled by each layer
+LAYER1_CLASSES = ['DoS', 'Probe']
+LAYER2_CLASSES = ['Normal', 'R2L', 'U2R']
+
+# Layer 2 backends selectable from the DLHA constructor
+LAYER2_BACKENDS = ('svc', 'nystroem', 'linear_svm', 'rff')
+
+# Layer 2 backends that can be trained chunk by chunk with train_streaming
+STREAMING_LAYER2_BACKENDS = ('rff',)
+
+def make_layer2_classifier(backend='svc', n_components=300, random_state=0):
+    """
+    Build the Layer 2 classifier for rear attacks.
+    'svc' is the exact RBF SVM. 'nystroem' approximates the same RBF kernel
+    with n_components landmark features and fits a logistic regression on
+    them, so training is linear in the number of rows and inference cost
+    does not depend on the number of support vectors. 'linear_svm' is a
+    LinearSVC with sigmoid calibration for probabilities. 'rff' maps rows
+    through random Fourier features and fits an SGD logistic regression,
+    which can also be updated incrementally by train_streaming.
+    """
+    if backend == 'svc':
+        return SVC(kernel='rbf', probability=True)
+    if backend == 'nystroem':
+        return make_pipeline(
+            Nystroem(kernel='rbf', n_components=n_components, random_state=random_state),
+            LogisticRegression(max_iter=1000)
+        )
+    if backend == 'linear_svm':
+        return CalibratedClassifierCV(LinearSVC(), method='sigmoid', cv=3)
+    if backend == 'rff':
+        return make_pipeline(
+            RBFSampler(gamma='scale', n_components=n_components, random_state=random_state),
+            SGDClassifier(loss='log_loss', random_state=random_state)
+        )
+    raise ValueError(f"Unknown layer 2 backend '{backend}', expected one of {LAYER2_BACKENDS}")
+
+def combine_layers(X_processed, layer1_classifier, layer2_classifier, confidence_threshold):
+    """
+    Confidence-gated combination of the two layers on preprocessed rows.
+    Any classifier-like object with predict_proba and classes_ works, so the
+    sklearn models and the array-backed bundle layers share this path.
+    """
+    timing = metrics.ENABLED
+    if timing:
+        start = time.perf_counter()
+        layer2_seconds = 0.0
+    
+    # Layer 1 predictions
+    layer1_probs = layer1_classifier.predict_proba(X_processed)
+    if timing:
+        layer1_done = time.perf_counter()
+    layer1_max = layer1_probs.max(axis=1)
+    
+    # Rows where Layer 1 is confident are settled by it, the rest go to Layer 2
+    confident = layer1_max > confidence_threshold
+    final_predictions = np.empty(len(X_processed), dtype=object)
+    final_predictions[confident] = layer1_classifier.classes_[
+        layer1_probs[confident].argmax(axis=1)]
+    confidence = layer1_max.copy()
+    
+    # Layer 2 predictions, only for the rows Layer 1 did not settle
+    layer2_probs = np.full((len(X_processed), len(layer2_classifier.classes_)), np.nan)
+    undecided = ~confident
+    if undecided.any():
+        if timing:
+            layer2_start = time.perf_counter()
+        layer2_probs[undecided] = layer2_classifier.predict_proba(X_processed[undecided])
+        if timing:
+            layer2_seconds = time.perf_counter() - layer2_start
+            metrics.STAGE_SECONDS.labels('layer2').observe(layer2_seconds)
+        final_predictions[undecided] = layer2_classifier.classes_[
+            layer2_probs[undecided].argmax(axis=1)]
+        confidence[undecided] = np.maximum(layer1_max[undecided],
+                                           layer2_probs[undecided].max(axis=1))
+    
+    if timing:
+        # combine: the gating, argmax and confidence work around the two classifiers
+        metrics.STAGE_SECONDS.labels('layer1').observe(layer1_done - start)
+        metrics.STAGE_SECONDS.labels('combine').observe(time.perf_counter() - layer1_done - layer2_seconds)
+    
+    return {
+        'labels': final_predictions.astype(str),
+        'layer1_probs': layer1_probs,
+        'layer2_probs': layer2_probs,
+        'confidence': confidence
+    }
+
+class FusedProjection:
+    """
+    StandardScaler followed by PCA precomposed into one affine map,
+    X_pca = X @ weights + offset, applied with a single matmul. With
+    dtype=np.float32 the matrices and the output are single precision.
+    """
+
+    def __init__(self, scaler, pca, dtype=np.float64):
+        components = pca.components_
+        if getattr(pca, 'whiten', False):
+            components = components / np.sqrt(pca.explained_variance_)[:, np.newaxis]
+        # ((X - mean) / scale - pca_mean) @ components.T
+        self.weights = np.ascontiguousarray((components / scaler.scale_).T, dtype=dtype)
+        self.offset = (-(scaler.mean_ / scaler.scale_ + pca.mean_) @ components.T).astype(dtype)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_arrays(cls, weights, offset):
+        """Rebuild from precomposed arrays, e.g. memory-mapped from a model bundle."""
+        projection = cls.__new__(cls)
+        projection.weights = weights
+        projection.offset = offset
+        projection.dtype = np.dtype(weights.dtype)
+        return projection
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self.weights + self.offset
 
 class DLHA:
-    def __init__(self):
+    def __init__(self, confidence_threshold=0.8, layer2_backend='svc', projection_dtype=np.float64):
+        self.confidence_threshold = confidence_threshold  # Layer 1 probability needed to skip Layer 2
+        self.layer2_backend = layer2_backend
+        self.projection_dtype = projection_dtype
+        self.projection = None  # Fused scaler + PCA map, compiled once preprocessing is fitted
         self.layer1_classifier = GaussianNB()  # Naive Bayes for DoS and Probe
-        self.layer2_classifier = SVC(kernel='rbf', probability=True)  # SVM for rear attacks
+        self.layer2_classifier = make_layer2_classifier(layer2_backend)  # SVM for rear attacks
         self.pca = PCA(n_components=0.95)  # Preserve 95% variance
         self.scaler = StandardScaler()
     
+    def fit_preprocessing(self, X):
+        X_scaled = self.scaler.fit_transform(X)
+        X_pca = self.pca.fit_transform(X_scaled)
+        self.compile_projection()
+        return X_pca
+    
+    def compile_projection(self, dtype=None):
+        """Precompose the fitted scaler and PCA into the fused inference projection."""
+        if dtype is not None:
+            self.projection_dtype = dtype
+        self.projection = FusedProjection(self.scaler, self.pca, self.projection_dtype)
+    
     def preprocess_data(self, X):
+        # Inference only: preprocessing is fitted by train, never here
+        projection = getattr(self, 'projection', None)
+        if projection is not None:
+            return metrics.time_stage('projection', projection.transform, X)
         if not hasattr(self.scaler, 'mean_'):
-            X_scaled = self.scaler.fit_transform(X)
-            X_pca = self.pca.fit_transform(X_scaled)
-        else:
-            X_scaled = self.scaler.transform(X)
-            X_pca = self.pca.transform(X_scaled)
-        return X_pca
+            raise RuntimeError("DLHA preprocessing is not fitted, call train first")
+        X_scaled = metrics.time_stage('scale', self.scaler.transform, X)
+        return metrics.time_stage('pca', self.pca.transform, X_scaled)
     
     def train(self, X, y):
-        X_processed = self.preprocess_data(X)
+        X_processed = self.fit_preprocessing(X)
         
         # Layer 1: Train Naive Bayes for DoS and Probe
-        dos_probe_mask = y.isin(['DoS', 'Probe'])
+        dos_probe_mask = y.isin(LAYER1_CLASSES)
         if dos_probe_mask.any():
             self.layer1_classifier.fit(X_processed[dos_probe_mask], y[dos_probe_mask])
         
         # Layer 2: Train SVM for rear attacks
-        rear_normal_mask = y.isin(['R2L', 'U2R', 'Normal'])
+        rear_normal_mask = y.isin(LAYER2_CLASSES)
         if rear_normal_mask.any():
             self.layer2_classifier.fit(X_processed[rear_normal_mask], y[rear_normal_mask])
         
+        self.save_model()
+    
+    def train_streaming(self, make_chunks, variance=0.95):
+        """
+        Out-of-core training. make_chunks is a callable returning a fresh
+        iterator of (X, y) chunks, e.g. lambda: iter_training_chunks(path).
+        The data is read three times: once for the scaler, once for the
+        IncrementalPCA and once for the classifiers, so memory is bounded by
+        the chunk size rather than the dataset size.
+        """
+        if self.layer2_backend not in STREAMING_LAYER2_BACKENDS:
+            raise ValueError(f"Layer 2 backend '{self.layer2_backend}' cannot be trained incrementally, "
+                             f"use one of {STREAMING_LAYER2_BACKENDS}")
+        
+        # Pass 1: scaler statistics
+        self.scaler = StandardScaler()
+        for X, y in make_chunks():
+            self.scaler.partial_fit(X)
+        
+        # Pass 2: principal components on scaled chunks. IncrementalPCA needs at
+        # least n_features rows per call, so short chunks are carried over, and
+        # one full block is held back so a short tail can be merged into it.
+        n_features = self.scaler.n_features_in_
+        self.pca = IncrementalPCA(n_components=n_features)
+        pending = None
+        block = None
+        for X, y in make_chunks():
+            X_scaled = self.scaler.transform(X)
+            if pending is not None:
+                X_scaled = np.vstack([pending, X_scaled])
+                pending = None
+            if len(X_scaled) < n_features:
+                pending = X_scaled
+                continue
+            if block is not None:
+                self.pca.partial_fit(block)
+            block = X_scaled
+        if block is None:
+            rows = 0 if pending is None else len(pending)
+            raise ValueError(f"Streaming training needs at least {n_features} rows (one per feature), got {rows}")
+        self.pca.partial_fit(block if pending is None else np.vstack([block, pending]))
+        self._truncate_pca(variance)
+        self.compile_projection()
+        
+        # Pass 3: both layers
+        layer2_sampler, layer2_model = self.layer2_classifier[0], self.layer2_classifier[-1]
+        for X, y in make_chunks():
+            X_processed = self.preprocess_data(X)
+            
+            # Layer 1: Naive Bayes for DoS and Probe
+            dos_probe_mask = y.isin(LAYER1_CLASSES).to_numpy()
+            if dos_probe_mask.any():
+                self.layer1_classifier.partial_fit(X_processed[dos_probe_mask], y[dos_probe_mask],
+                                                   classes=LAYER1_CLASSES)
+            
+            # Layer 2: random Fourier features + SGD for rear attacks
+            rear_normal_mask = y.isin(LAYER2_CLASSES).to_numpy()
+            if rear_normal_mask.any():
+                X_rear = X_processed[rear_normal_mask]
+                if not hasattr(layer2_sampler, 'random_weights_'):
+                    layer2_sampler.fit(X_rear)
+                layer2_model.partial_fit(layer2_sampler.transform(X_rear), y[rear_normal_mask],
+                                         classes=LAYER2_CLASSES)
+        
+        self.save_model()
+    
+    def _truncate_pca(self, variance):
+        # Keep the leading components explaining `variance`, as PCA(n_components=0.95) does
+        ratio_cumsum = np.cumsum(self.pca.explained_variance_ratio_)
+        n_components = min(int(np.searchsorted(ratio_cumsum, variance, side='right')) + 1,
+                           len(ratio_cumsum))
+        self.pca.components_ = self.pca.components_[:n_components]
+        self.pca.explained_variance_ = self.pca.explained_variance_[:n_components]
+        self.pca.explained_variance_ratio_ = self.pca.explained_variance_ratio_[:n_components]
+        self.pca.singular_values_ = self.pca.singular_values_[:n_components]
+        self.pca.n_components_ = n_components
+        self.pca.n_components = n_components
+    
+    def save_model(self, path='model/dlha_model.pkl'):
         # Save the trained model
-        if not os.path.exists('model'):
-            os.makedirs('model')
-        joblib.dump(self, 'model/dlha_model.pkl')
+        model_dir = os.path.dirname(path)
+        if model_dir and not os.path.exists(model_dir):
+            os.makedirs(model_dir)
+        joblib.dump(self, path)
     
     def predict(self, X):
+        return self.predict_with_confidence(X)['labels']
+
+    def predict_with_confidence(self, X):
+        """
+        Score X with a single preprocessing and classifier pass.
+        Returns a dict with the final labels, the per-layer probabilities and
+        the combined confidence. Layer 2 only scores the rows Layer 1 does not
+        settle, so its probabilities are NaN for rows Layer 1 decided.
+        """
         X_processed = self.preprocess_data(X)
         
         try:
-            # Layer 1 predictions
-            layer1_pred = self.layer1_classifier.predict_proba(X_processed)
-            
-            # Layer 2 predictions
-            layer2_pred = self.layer2_classifier.predict_proba(X_processed)
-            
-            # Combine predictions based on confidence
-            final_predictions = []
-            for l1_prob, l2_prob in zip(layer1_pred, layer2_pred):
-                if max(l1_prob) > 0.8:  # High confidence in Layer 1
-                    final_predictions.append('DoS' if l1_prob[0] > l1_prob[1] else 'Probe')
-                else:
-                    final_predictions.append(self.layer2_classifier.classes_[np.argmax(l2_prob)])
-            
-            return np.array(final_predictions)
+            return combine_layers(X_processed, self.layer1_classifier, self.layer2_classifier,
+                                  self.confidence_threshold)
         except Exception as e:
             print(f"Prediction error: {str(e)}")
-            return np.array(['Unknown'] * len(X))
+            return {
+                'labels': np.array(['Unknown'] * len(X)),
+                'layer1_probs': None,
+                'layer2_probs': None,
+                'confidence': np.array([0.0] * len(X))
+            }
 
     def predict_proba(self, X):
         X_processed = self.preprocess_data(X)
@@ -82,9 +306,13 @@ class DLHA:
 
 def load_and_prepare_data():
     try:
-        # Load preprocessed data
-        train_data = pd.read_csv('data/processed_train.csv')
-        test_data = pd.read_csv('data/processed_test.csv')
+        if os.path.exists(RAW_TRAIN_PATH) and os.path.exists(RAW_TEST_PATH):
+            # Encoded data from the binary dataset cache, memory-mapped when warm
+            train_data, test_data, _ = load_prepared_dataset()
+        else:
+            # Load preprocessed data
+            train_data = pd.read_csv('data/processed_train.csv')
+            test_data = pd.read_csv('data/processed_test.csv')
         
         # Separate features and labels
         X_train = train_data.drop('label', axis=1)
@@ -97,7 +325,12 @@ def load_and_prepare_data():
         print(f"Error loading data: {str(e)}")
         return None, None, None, None
 
-def evaluate_model():
+def iter_training_chunks(path='data/processed_train.csv', chunksize=50000):
+    """Yield (X, y) chunks of a processed dataset CSV for DLHA.train_streaming."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield chunk.drop('label', axis=1), chunk['label']
+
+def evaluate_model(workers=1):
     # Load data
     X_train, X_test, y_train, y_test = load_and_prepare_data()
     if X_train is None:
@@ -108,12 +341,16 @@ def evaluate_model():
     model = DLHA()
     model.train(X_train, y_train)
     
-    # Make predictions
+    # Make predictions and confidence scores in one pass
     print("Making predictions...")
-    predictions = model.predict(X_test)
-    
-    # Calculate confidence scores
-    confidence_scores = model.predict_proba(X_test)
+    if workers > 1:
+        # Imported here, parallel_eval depends on this module through model_bundle
+        from parallel_eval import parallel_predict_with_confidence
+        predictions, confidence_scores = parallel_predict_with_confidence(model, X_test, workers=workers)
+    else:
+        scored = model.predict_with_confidence(X_test)
+        predictions = scored['labels']
+        confidence_scores = scored['confidence']
     
     # Print results
     print("\nClassification Report:")
@@ -125,4 +362,4 @@ def evaluate_model():
     print("\nAverage Confidence Score:", np.mean(confidence_scores))
 
 if __name__ == "__main__":
-    evaluate_model()
\ No newline at end of file
+    evaluate_model(workers=int(os.environ.get('DLHA_EVAL_WORKERS', 1)))
\ No newline at end of file
@@ -1,103 +1,134 @@
 import threading
 import logging
+import time
 from scapy.all import sniff
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request, jsonify
 from flask_socketio import SocketIO
-from datetime import datetime
+import os
+import metrics
+from raw_packets import iter_af_packet_frames, header_from_scapy, parse_frame
+from rule_engine import RuleEngine
+from event_stream import EventStream
+from capture_pipeline import CapturePipeline
 
 # Initialize Flask app and SocketIO
 app = Flask(__name__)
 socketio = SocketIO(app)
 
-# Attack detection logic (simple rule-based for demonstration)
+# Attack detection rules, from DLHA_RULES_FILE (JSON) when set
+RULES_FILE = os.environ.get('DLHA_RULES_FILE')
+rule_engine = RuleEngine.from_file(RULES_FILE) if RULES_FILE else RuleEngine()
+
+# Detection events are coalesced into one 'traffic_update' per tick instead of one emit per packet
+STREAM_TICK = float(os.environ.get('DLHA_STREAM_TICK', 0.5))
+STREAM_MAX_ALERTS = int(os.environ.get('DLHA_STREAM_MAX_ALERTS', 20))
+
+def emit_traffic_update(update, to=None, skip=None):
+    """ Send an update to the clients in `to`, or to all clients but those in `skip`. """
+    socketio.emit('traffic_update', update, to=to, skip_sid=skip)
+
+event_stream = EventStream(emit_traffic_update, tick=STREAM_TICK, max_alerts=STREAM_MAX_ALERTS)
+
 def detect_attack(packet):
     """
     Enhanced attack detection logic with DoS, Probe, R2L, and U2R attacks
     """
-    attack_type = None
-    if packet.haslayer('IP') and packet.haslayer('TCP'):
-        ip_src = packet['IP'].src
-        ip_dst = packet['IP'].dst
-        tcp_flags = packet['TCP'].flags
-        
-        # DoS Attacks
-        if tcp_flags == 2:  
-            attack_type = "DoS: SYN Flood Attack"
-        elif tcp_flags == 0x3F:  # All flags set
-            attack_type = "DoS: TCP Christmas Attack"
-        elif packet.haslayer('TCP') and len(packet) > 1000:
-            attack_type = "DoS: TCP Buffer Overflow"
-            
-        # Probe Attacks
-        elif tcp_flags == 0x14:
-            attack_type = "Probe: Port Scan"
-        elif tcp_flags == 0x01:
-            attack_type = "Probe: FIN Scan"
-        elif tcp_flags == 0x29:
-            attack_type = "Probe: XMAS Scan"
-        elif tcp_flags == 0x00:
-            attack_type = "Probe: NULL Scan"
-            
-        # R2L (Remote to Local) Attacks
-        elif tcp_flags == 0x02 and hasattr(packet, 'dport') and packet.dport == 23:
-            attack_type = "R2L: Telnet Brute Force"
-        elif tcp_flags == 0x02 and hasattr(packet, 'dport') and packet.dport == 22:
-            attack_type = "R2L: SSH Brute Force"
-        elif packet.haslayer('TCP') and hasattr(packet, 'dport') and packet.dport == 445:
-            attack_type = "R2L: SMB Attack"
-            
-        # U2R (User to Root) Attacks
-        elif packet.haslayer('Raw'):
-            try:
-                payload = packet['Raw'].load
-                payload_str = payload.decode('utf-8', errors='ignore').lower()
-                if 'sudo' in payload_str:
-                    attack_type = "U2R: Privilege Escalation Attempt"
-                elif 'buffer overflow' in payload_str:
-                    attack_type = "U2R: Buffer Overflow Attack"
-            except:
-                pass
-            
-    # Additional DoS Attacks
-    elif packet.haslayer('ICMP'):
-        if len(packet) > 1000:
-            attack_type = "DoS: ICMP Flood"
-    elif packet.haslayer('UDP'):
-        if len(packet) > 1000:
-            attack_type = "DoS: UDP Flood"
-    elif packet.haslayer('DNS'):
-        if packet.haslayer('DNSQR') and hasattr(packet, 'qr') and packet.qr == 0:
-            if packet.haslayer('UDP') and len(packet) > 512:
-                attack_type = "DoS: DNS Amplification"
-    
+    if not metrics.ENABLED:
+        return rule_engine.match(header_from_scapy(packet))
+    start = time.perf_counter()
+    header = header_from_scapy(packet)
+    decoded = time.perf_counter()
+    attack_type = rule_engine.match(header)
+    metrics.PACKET_SECONDS.labels('decode').observe(decoded - start)
+    metrics.PACKET_SECONDS.labels('rules').observe(time.perf_counter() - decoded)
+    return attack_type
+
+def detect_attack_header(header):
+    """
+    detect_attack for a raw_packets.PacketHeader decoded straight from the
+    frame bytes, without scapy dissection
+    """
+    if not metrics.ENABLED:
+        return rule_engine.match(header)
+    start = time.perf_counter()
+    attack_type = rule_engine.match(header)
+    metrics.PACKET_SECONDS.labels('rules').observe(time.perf_counter() - start)
     return attack_type
 
 def process_packet(packet):
     """ Process the packet and detect attacks. """
     try:
         attack_type = detect_attack(packet)
-        
-        packet_info = {
-            'status': "Attack" if attack_type else "Normal",
-            'packet_summary': str(packet.summary()),
-            'source_ip': packet['IP'].src if packet.haslayer('IP') else "Unknown",
-            'dest_ip': packet['IP'].dst if packet.haslayer('IP') else "Unknown",
-            'attack_type': attack_type,
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # Send result to the webpage via SocketIO
-        socketio.emit('packet_info', packet_info)
+        has_ip = packet.haslayer('IP')
+        if metrics.ENABLED:
+            metrics.count_packet(attack_type)
+
+        # Queue the result for the next webpage update; the summary is only built if it is shown
+        event_stream.add(attack_type,
+                         packet['IP'].src if has_ip else "Unknown",
+                         packet['IP'].dst if has_ip else "Unknown",
+                         lambda: {'packet_summary': str(packet.summary())})
     except Exception as e:
         logging.error(f"Error processing packet: {str(e)}")
         # Continue monitoring even if one packet fails
         pass
 
+def process_frame(ts, frame):
+    """ Decode one raw Ethernet frame and process it like process_packet. """
+    process_header(metrics.time_packet_stage('decode', parse_frame, frame, ts))
+
+def process_header(header):
+    """ process_packet for a raw_packets.PacketHeader, without scapy dissection. """
+    try:
+        if header.version != 4:
+            return
+        process_result(header.ts, header.src, header.dst, header.proto, header.length,
+                       detect_attack_header(header))
+    except Exception as e:
+        logging.error(f"Error processing packet: {str(e)}")
+
+def process_result(ts, src, dst, proto, length, attack_type):
+    """ Queue one analysed packet for the webpage, from process_header or the capture pipeline. """
+    if metrics.ENABLED:
+        metrics.count_packet(attack_type)
+    event_stream.add(attack_type, src, dst,
+                     lambda: {'packet_summary': f"IP / {src} > {dst} proto {proto} len {length}"})
+
+# "scapy" sniffs with full dissection, "raw" decodes frames from an AF_PACKET socket (Linux)
+CAPTURE_MODE = os.environ.get('DLHA_CAPTURE_MODE', 'scapy')
+CAPTURE_IFACE = os.environ.get('DLHA_IFACE', 'Wi-Fi')
+
+# With DLHA_WORKERS > 0 the capture thread only queues raw frames; worker processes analyse them
+CAPTURE_WORKERS = int(os.environ.get('DLHA_WORKERS', 0))
+RING_SIZE = int(os.environ.get('DLHA_RING_SIZE', 65536))
+TASK_QUEUE_SIZE = int(os.environ.get('DLHA_TASK_QUEUE_SIZE', 64))
+PIPELINE_BATCH_SIZE = int(os.environ.get('DLHA_PIPELINE_BATCH_SIZE', 256))
+pipeline = None
+
+def feed_pipeline(packet):
+    """Queue a sniffed packet for the worker processes. Returns None: sniff prints whatever prn returns."""
+    pipeline.feed(float(packet.time), bytes(packet))
+
 def capture_packets():
     """Capture packets from the network interface."""
+    global pipeline
     try:
+        if CAPTURE_WORKERS > 0:
+            pipeline = CapturePipeline(process_result, workers=CAPTURE_WORKERS, ring_size=RING_SIZE,
+                                       batch_size=PIPELINE_BATCH_SIZE, task_queue_size=TASK_QUEUE_SIZE,
+                                       rules_file=RULES_FILE).start()
+            if CAPTURE_MODE == 'raw':
+                for ts, frame in iter_af_packet_frames(CAPTURE_IFACE):
+                    pipeline.feed(ts, frame)
+            else:
+                sniff(iface=CAPTURE_IFACE, filter="ip", prn=feed_pipeline, store=0)
+            return
+        if CAPTURE_MODE == 'raw':
+            for ts, frame in iter_af_packet_frames(CAPTURE_IFACE):
+                process_frame(ts, frame)
+            return
         # Add filter to capture only IP packets
-        sniff(iface="Wi-Fi", filter="ip", prn=process_packet, store=0)
+        sniff(iface=CAPTURE_IFACE, filter="ip", prn=process_packet, store=0)
     except Exception as e:
         error_msg = f"Error capturing packets: {str(e)}"
         print(error_msg)
@@ -113,6 +144,36 @@ def index():
     """ Serve the main webpage. """ 
     return render_template('index.html')
 
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """ Per-stage throughput, queue depth and drop counts of the capture pipeline. """
+    if pipeline is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(pipeline.stats(), enabled=True))
+
+def pipeline_queue_depths():
+    if pipeline is None:
+        return {}
+    stats = pipeline.stats()
+    return {'ring': stats['ring']['depth'], 'task_queue': stats['dispatch']['queue_depth'] or 0}
+
+metrics.REGISTRY.callback('dlha_queue_depth', 'gauge', 'Items waiting in each capture pipeline queue',
+                          pipeline_queue_depths, ['queue'])
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """ Per-stage latency histograms and counters in the Prometheus text format (off with DLHA_METRICS=0). """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@socketio.on('traffic_ack')
+def traffic_ack(data):
+    """ The page has rendered an update; used for back-pressure. """
+    event_stream.ack(request.sid, int(data.get('seq', 0)))
+
+@socketio.on('disconnect')
+def client_disconnect(*args):
+    event_stream.forget(request.sid)
+
 if __name__ == '__main__':
     # Configure logging
     logging.basicConfig(
@@ -120,7 +181,9 @@ if __name__ == '__main__':
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     
-    # Start packet capture in a background thread
+    # Start the dashboard update ticker and packet capture in background threads
+    event_stream.start()
+
     packet_capture_thread = threading.Thread(target=start_packet_capture)
     packet_capture_thread.daemon = True
     packet_capture_thread.start()
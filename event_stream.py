@@ -0,0 +1,158 @@
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+class EventStream:
+    """
+    Coalesces per-packet detection events into one update per tick for the
+    dashboard. Each update carries the packet counts per attack type, the
+    top talkers, at most max_alerts individual alerts and a few samples of
+    normal traffic. Event details are built lazily (detail is a callable)
+    so packets that are only counted never pay for formatting.
+
+    Back-pressure is per client: clients ack each update by sequence
+    number, and a client's lag is the number of updates sent to it that it
+    has not acked. A client that is behind gets its updates without
+    normal-traffic samples, then without most individual alerts, and at
+    max_lag behind it is sent nothing (for at most max_lag ticks in a row).
+    Clients that keep up, and clients that never ack, still get every full
+    update. emit(update, to=None, skip=None) sends to the clients in `to`,
+    or to every client except those in `skip` when `to` is None.
+    """
+
+    def __init__(self, emit, tick=0.5, max_alerts=20, max_samples=5, top_talkers=5, max_lag=4):
+        self.emit = emit
+        self.tick = tick
+        self.max_alerts = max_alerts
+        self.max_samples = max_samples
+        self.top_talkers = top_talkers
+        self.max_lag = max_lag
+        self.seq = 0
+        self.updates_emitted = 0
+        self.updates_skipped = 0
+        # client -> [last seq sent, last seq acked, ticks skipped in a row]
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self._since = time.time()
+        self._packets = 0
+        self._counts = Counter()
+        self._talkers = Counter()
+        self._alerts = []
+        self._alerts_dropped = 0
+        self._samples = []
+
+    def add(self, attack_type, source_ip, dest_ip, detail=None):
+        """Record one analysed packet. detail() returns the dict shown for a kept alert or sample."""
+        with self._lock:
+            self._packets += 1
+            self._counts[attack_type or 'Normal'] += 1
+            self._talkers[source_ip] += 1
+            if attack_type:
+                if len(self._alerts) < self.max_alerts:
+                    self._alerts.append(self._detail(attack_type, source_ip, dest_ip, detail))
+                else:
+                    self._alerts_dropped += 1
+            elif len(self._samples) < self.max_samples:
+                self._samples.append(self._detail(attack_type, source_ip, dest_ip, detail))
+
+    def _detail(self, attack_type, source_ip, dest_ip, detail):
+        entry = detail() if detail is not None else {}
+        entry.setdefault('status', "Attack" if attack_type else "Normal")
+        entry.setdefault('attack_type', attack_type)
+        entry.setdefault('source_ip', source_ip)
+        entry.setdefault('dest_ip', dest_ip)
+        entry.setdefault('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        return entry
+
+    def ack(self, client, seq):
+        """A client has rendered update seq."""
+        with self._lock:
+            state = self._clients.setdefault(client, [seq, seq, 0])
+            state[1] = max(state[1], seq)
+
+    def forget(self, client):
+        with self._lock:
+            self._clients.pop(client, None)
+
+    def lag(self, client=None):
+        """How many updates a client, or the slowest client, is behind."""
+        if client is not None:
+            state = self._clients.get(client)
+            return state[0] - state[1] if state else 0
+        return max((sent - acked for sent, acked, _ in self._clients.values()), default=0)
+
+    def _level(self, lag):
+        return 0 if lag <= 1 else 1 if lag <= self.max_lag // 2 else 2 if lag < self.max_lag else 3
+
+    def _degraded(self, update, level):
+        """The update as sent to a client at back-pressure level 1 (no samples) or 2 (also fewer alerts)."""
+        alerts = update['alerts'] if level < 2 else update['alerts'][:max(1, self.max_alerts // 4)]
+        return dict(update, samples=[], alerts=alerts, level=level,
+                    alerts_dropped=update['alerts_dropped'] + len(update['alerts']) - len(alerts))
+
+    def flush(self):
+        """Emit the update for the current tick to every client that is not too far behind. Returns it or None."""
+        with self._lock:
+            if not self._packets:
+                return None
+            self.seq += 1
+            now = time.time()
+            update = {
+                'seq': self.seq,
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'interval_s': round(now - self._since, 3),
+                'packets': self._packets,
+                'counts': dict(self._counts),
+                'top_talkers': [{'ip': ip, 'packets': count} for ip, count in self._talkers.most_common(self.top_talkers)],
+                'alerts': self._alerts,
+                'alerts_dropped': self._alerts_dropped,
+                'samples': self._samples,
+                'level': 0
+            }
+            self._reset()
+            behind = {1: [], 2: [], 3: []}
+            for client, state in self._clients.items():
+                level = self._level(state[0] - state[1])
+                if level == 3 and state[2] < self.max_lag:
+                    state[2] += 1
+                    behind[3].append(client)
+                    continue
+                state[0] = self.seq
+                state[2] = 0
+                if level:
+                    behind[min(level, 2)].append(client)
+        skip = behind[1] + behind[2] + behind[3]
+        self.emit(update, None, skip or None)
+        for level in (1, 2):
+            if behind[level]:
+                self.emit(self._degraded(update, level), behind[level], None)
+        self.updates_emitted += 1
+        self.updates_skipped += len(behind[3])
+        return update
+
+    def run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error emitting traffic update: {str(e)}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
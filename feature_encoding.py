@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+# KDD connection features, in the order the model is trained on
+FEATURE_COLUMNS = [
+    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
+    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
+    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
+    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
+    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
+    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
+    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
+    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
+    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'
+]
+
+CATEGORICAL_FEATURES = ['protocol_type', 'service', 'flag']
+
+# Below this many records a plain dict lookup loop beats building a DataFrame
+SMALL_BATCH_SIZE = 32
+
+
+class FeatureEncoder:
+    """
+    Compiled categorical encoding shared by data preparation, training,
+    batch evaluation and the API. Each categorical feature has a sorted
+    vocabulary (the same codes LabelEncoder assigns) held as a dict for
+    per-record lookups and as a pandas Index for whole columns. Values
+    outside the vocabulary go to the feature's unknown bucket, code 0 by
+    default, which is what the API has always done for unseen categories.
+    """
+
+    def __init__(self, vocabularies, unknown_codes=None):
+        self.vocabularies = {feature: np.asarray(sorted(vocabularies[feature]), dtype=object)
+                             for feature in CATEGORICAL_FEATURES}
+        self.unknown_codes = {feature: 0 for feature in CATEGORICAL_FEATURES}
+        if unknown_codes:
+            self.unknown_codes.update(unknown_codes)
+        self.tables = {feature: {value: code for code, value in enumerate(vocabulary)}
+                       for feature, vocabulary in self.vocabularies.items()}
+        self._indexes = {feature: pd.Index(vocabulary) for feature, vocabulary in self.vocabularies.items()}
+        self._categorical_positions = [(FEATURE_COLUMNS.index(feature), feature)
+                                       for feature in CATEGORICAL_FEATURES]
+
+    @classmethod
+    def fit(cls, data):
+        """Build the vocabularies from the categorical columns of a DataFrame."""
+        return cls({feature: data[feature].dropna().unique() for feature in CATEGORICAL_FEATURES})
+
+    @classmethod
+    def from_label_encoders(cls, encoders):
+        """Build from the dict of fitted LabelEncoders saved in model/label_encoders.pkl."""
+        return cls({feature: encoders[feature].classes_ for feature in CATEGORICAL_FEATURES})
+
+    def to_label_encoders(self):
+        """Equivalent fitted LabelEncoders, the format saved in model/label_encoders.pkl."""
+        encoders = {}
+        for feature, vocabulary in self.vocabularies.items():
+            encoder = LabelEncoder()
+            encoder.classes_ = vocabulary
+            encoders[feature] = encoder
+        return encoders
+
+    def encode_column(self, feature, values):
+        """Encode one categorical column (array-like of strings) to integer codes."""
+        codes = self._indexes[feature].get_indexer(pd.Index(values))
+        codes[codes < 0] = self.unknown_codes[feature]
+        return codes
+
+    def encode_categoricals(self, data):
+        """Return a copy of a DataFrame with its categorical columns replaced by codes."""
+        data = data.copy()
+        for feature in CATEGORICAL_FEATURES:
+            data[feature] = self.encode_column(feature, data[feature])
+        return data
+
+    def encode_frame(self, data):
+        """Encode a DataFrame of raw records into a float feature matrix in FEATURE_COLUMNS order."""
+        X = np.empty((len(data), len(FEATURE_COLUMNS)), dtype=np.float64)
+        for position, column in enumerate(FEATURE_COLUMNS):
+            if column in self.tables:
+                X[:, position] = self.encode_column(column, data[column])
+            elif column in data:
+                X[:, position] = pd.to_numeric(data[column]).fillna(0).to_numpy()
+            else:
+                X[:, position] = 0.0
+        return X
+
+    def encode_record(self, record):
+        """Encode one record (dict of feature -> value) into a float feature vector."""
+        x = np.array([float(record.get(column, 0) or 0) if column not in self.tables else 0.0
+                      for column in FEATURE_COLUMNS])
+        # A NaN value is missing and counts as 0, as in encode_frame
+        x[np.isnan(x)] = 0.0
+        for position, feature in self._categorical_positions:
+            x[position] = self.tables[feature].get(record.get(feature), self.unknown_codes[feature])
+        return x
+
+    def encode_rows(self, rows):
+        """Encode rows of raw values in FEATURE_COLUMNS order (e.g. from FlowAggregator) into a float matrix."""
+        X = np.array(rows, dtype=object).reshape(-1, len(FEATURE_COLUMNS))
+        for position, feature in self._categorical_positions:
+            table, unknown = self.tables[feature], self.unknown_codes[feature]
+            X[:, position] = [table.get(value, unknown) for value in X[:, position]]
+        return X.astype(np.float64)
+
+    def encode_records(self, records):
+        """Encode a list of records into a float feature matrix in FEATURE_COLUMNS order."""
+        if len(records) <= SMALL_BATCH_SIZE:
+            return np.array([self.encode_record(record) for record in records]).reshape(-1, len(FEATURE_COLUMNS))
+        return self.encode_frame(pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS))
@@ -0,0 +1,362 @@
+from collections import OrderedDict, deque
+
+# IP protocol numbers
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTOCOL_NAMES = {PROTO_TCP: 'tcp', PROTO_UDP: 'udp', PROTO_ICMP: 'icmp'}
+
+# TCP flag bits
+FIN = 0x01
+SYN = 0x02
+RST = 0x04
+ACK = 0x10
+URG = 0x20
+
+# Destination port -> KDD service name. Unlisted ports map to 'private'.
+TCP_SERVICES = {
+    20: 'ftp_data', 21: 'ftp', 22: 'ssh', 23: 'telnet', 25: 'smtp', 37: 'time', 43: 'whois',
+    53: 'domain', 70: 'gopher', 79: 'finger', 80: 'http', 109: 'pop_2', 110: 'pop_3',
+    111: 'sunrpc', 113: 'auth', 119: 'nntp', 143: 'imap4', 179: 'bgp', 194: 'IRC',
+    389: 'ldap', 443: 'http_443', 512: 'exec', 513: 'login', 514: 'shell', 515: 'printer',
+    540: 'uucp', 6000: 'X11', 8001: 'http_8001', 2784: 'http_2784', 210: 'Z39_50',
+}
+UDP_SERVICES = {53: 'domain_u', 69: 'tftp_u', 123: 'ntp_u'}
+ICMP_SERVICES = {0: 'ecr_i', 3: 'urp_i', 5: 'red_i', 8: 'eco_i', 13: 'tim_i', 14: 'tim_i'}
+
+# Connection flags counted as SYN errors and REJ errors by the KDD rate features
+SERROR_FLAGS = frozenset(['S0', 'S1', 'S2', 'S3'])
+REJ_FLAGS = frozenset(['REJ'])
+
+TIME_WINDOW = 2.0         # seconds, for count/srv_count and their rates
+HOST_WINDOW = 100         # connections, for the dst_host_* features
+
+
+def service_name(proto, dport, icmp_type=None):
+    if proto == PROTO_TCP:
+        return TCP_SERVICES.get(dport, 'private')
+    if proto == PROTO_UDP:
+        return UDP_SERVICES.get(dport, 'private')
+    return ICMP_SERVICES.get(icmp_type, 'oth_i')
+
+
+class Flow:
+    """Per-connection state. Originator is the sender of the first packet seen."""
+    __slots__ = ('start', 'last', 'proto', 'service', 'src', 'dst', 'sport', 'dport',
+                 'src_bytes', 'dst_bytes', 'orig_flags', 'resp_flags', 'saw_syn',
+                 'urgent', 'wrong_fragment', 'packets')
+
+    def __init__(self, ts, proto, service, src, dst, sport, dport):
+        self.start = ts
+        self.last = ts
+        self.proto = proto
+        self.service = service
+        self.src = src
+        self.dst = dst
+        self.sport = sport
+        self.dport = dport
+        self.src_bytes = 0
+        self.dst_bytes = 0
+        self.orig_flags = 0
+        self.resp_flags = 0
+        self.saw_syn = False
+        self.urgent = 0
+        self.wrong_fragment = 0
+        self.packets = 0
+
+    def kdd_flag(self):
+        """Connection state summary in the KDD (Bro) flag vocabulary."""
+        if self.proto != PROTO_TCP:
+            return 'SF'
+        o, r = self.orig_flags, self.resp_flags
+        if not self.saw_syn:
+            return 'OTH'
+        if not (r & SYN and r & ACK):
+            if r & RST:
+                return 'REJ'
+            if o & RST:
+                return 'RSTOS0'
+            if o & FIN:
+                return 'SH'
+            return 'S0'
+        if o & RST:
+            return 'RSTO'
+        if r & RST:
+            return 'RSTR'
+        if o & FIN and r & FIN:
+            return 'SF'
+        if o & FIN:
+            return 'S2'
+        if r & FIN:
+            return 'S3'
+        return 'S1'
+
+    def is_closed(self):
+        if self.proto != PROTO_TCP:
+            return False
+        return bool((self.orig_flags | self.resp_flags) & RST or
+                    (self.orig_flags & FIN and self.resp_flags & FIN))
+
+
+def _increment(counter, key):
+    counter[key] = counter.get(key, 0) + 1
+
+
+def _decrement(counter, key):
+    value = counter[key] - 1
+    if value:
+        counter[key] = value
+    else:
+        del counter[key]
+
+
+class FlowAggregator:
+    """
+    Flow table that turns decoded packet headers into KDD connection
+    feature vectors. Connections are finished by FIN/RST or by going idle,
+    then their 2-second time-window and 100-connection host-window features
+    are computed from counters maintained incrementally, so every packet and
+    every finished connection costs O(1) amortized. Finished connections are
+    buffered until drain() hands them out as a batch.
+
+    Content features (hot, num_failed_logins, logged_in, ...) need payload
+    reassembly and are reported as 0.
+    """
+
+    def __init__(self, idle_timeout=10.0, closed_linger=1.0, expire_interval=1.0):
+        self.idle_timeout = idle_timeout
+        self.closed_linger = closed_linger
+        self.expire_interval = expire_interval
+        self.flows = OrderedDict()      # key -> Flow, least recently active first
+        self.closed = OrderedDict()     # key -> close time, absorbs trailing packets
+        self.completed = []             # (connection, feature row) pairs not yet drained
+        self.now = 0.0
+        self._next_expire = 0.0
+        self.packets = 0
+        self.flows_finished = 0
+
+        # 2-second window over finished connections
+        self._time_window = deque()
+        self._t_host = {}
+        self._t_srv = {}
+        self._t_host_srv = {}
+        self._t_host_serror = {}
+        self._t_host_rerror = {}
+        self._t_srv_serror = {}
+        self._t_srv_rerror = {}
+
+        # Last 100 finished connections
+        self._host_window = deque()
+        self._h_host = {}
+        self._h_srv = {}
+        self._h_host_srv = {}
+        self._h_host_sport = {}
+        self._h_host_serror = {}
+        self._h_host_rerror = {}
+        self._h_host_srv_serror = {}
+        self._h_host_srv_rerror = {}
+
+    def add_packet(self, ts, src, dst, proto, sport=0, dport=0, payload_len=0, tcp_flags=0,
+                   icmp_type=None, frag_error=False):
+        """Account one decoded IPv4 packet. Only TCP, UDP and ICMP are tracked."""
+        if proto not in PROTOCOL_NAMES:
+            return
+        self.packets += 1
+        if ts > self.now:
+            self.now = ts
+        if self.now >= self._next_expire:
+            self.expire(self.now)
+
+        key = (src, sport, dst, dport, proto)
+        flow = self.flows.get(key)
+        from_originator = True
+        if flow is None:
+            reverse = (dst, dport, src, sport, proto)
+            flow = self.flows.get(reverse)
+            if flow is not None:
+                key = reverse
+                from_originator = False
+            elif key in self.closed or reverse in self.closed:
+                return
+            else:
+                flow = Flow(ts, proto, service_name(proto, dport, icmp_type), src, dst, sport, dport)
+                self.flows[key] = flow
+                if proto == PROTO_TCP and tcp_flags & SYN and not tcp_flags & ACK:
+                    flow.saw_syn = True
+
+        flow.last = ts
+        flow.packets += 1
+        self.flows.move_to_end(key)
+        if from_originator:
+            flow.src_bytes += payload_len
+            flow.orig_flags |= tcp_flags
+        else:
+            flow.dst_bytes += payload_len
+            flow.resp_flags |= tcp_flags
+        if tcp_flags & URG:
+            flow.urgent += 1
+        if frag_error:
+            flow.wrong_fragment += 1
+
+        if flow.is_closed():
+            del self.flows[key]
+            self.closed[key] = ts
+            self._finish(flow)
+
+    def expire(self, now):
+        """Finish flows idle for longer than idle_timeout and forget closed ones past their linger."""
+        self._next_expire = now + self.expire_interval
+        idle_before = now - self.idle_timeout
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if flow.last > idle_before:
+                break
+            del self.flows[key]
+            self._finish(flow)
+        linger_before = now - self.closed_linger
+        while self.closed:
+            key, closed_at = next(iter(self.closed.items()))
+            if closed_at > linger_before:
+                break
+            del self.closed[key]
+
+    def flush(self):
+        """Finish every tracked flow, e.g. at the end of a capture file."""
+        while self.flows:
+            key, flow = self.flows.popitem(last=False)
+            self._finish(flow)
+        self.closed.clear()
+
+    def drain(self):
+        """
+        Return and clear the finished connections as (connections, rows).
+        Each row holds the 41 KDD features in FEATURE_COLUMNS order with
+        string categoricals, ready for FeatureEncoder.encode_rows.
+        """
+        completed, self.completed = self.completed, []
+        return [c for c, _ in completed], [row for _, row in completed]
+
+    def _finish(self, flow):
+        self.flows_finished += 1
+        flag = flow.kdd_flag()
+        host, srv, sport = flow.dst, flow.service, flow.sport
+        serror = flag in SERROR_FLAGS
+        rerror = flag in REJ_FLAGS
+        # Windows are keyed by finish time, which is monotonic across flows
+        self._add_to_time_window(self.now, host, srv, serror, rerror)
+        self._add_to_host_window(host, srv, sport, serror, rerror)
+
+        # 2-second window features
+        count = self._t_host[host]
+        srv_count = self._t_srv[srv]
+        host_srv = self._t_host_srv[(host, srv)]
+        same_srv_rate = host_srv / count
+        # Host window features
+        dst_host_count = self._h_host[host]
+        dst_host_srv_count = self._h_host_srv[(host, srv)]
+        dst_host_same_srv_rate = dst_host_srv_count / dst_host_count
+        srv_in_window = self._h_srv[srv]
+
+        row = [
+            int(flow.last - flow.start), PROTOCOL_NAMES[flow.proto], srv, flag,
+            flow.src_bytes, flow.dst_bytes,
+            int(flow.src == flow.dst and flow.sport == flow.dport), flow.wrong_fragment, flow.urgent,
+            0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+            count, srv_count,
+            self._t_host_serror.get(host, 0) / count,
+            self._t_srv_serror.get(srv, 0) / srv_count,
+            self._t_host_rerror.get(host, 0) / count,
+            self._t_srv_rerror.get(srv, 0) / srv_count,
+            same_srv_rate, 1.0 - same_srv_rate,
+            (srv_count - host_srv) / srv_count,
+            dst_host_count, dst_host_srv_count,
+            dst_host_same_srv_rate, 1.0 - dst_host_same_srv_rate,
+            self._h_host_sport[(host, sport)] / dst_host_count,
+            (srv_in_window - dst_host_srv_count) / srv_in_window,
+            self._h_host_serror.get(host, 0) / dst_host_count,
+            self._h_host_srv_serror.get((host, srv), 0) / dst_host_srv_count,
+            self._h_host_rerror.get(host, 0) / dst_host_count,
+            self._h_host_srv_rerror.get((host, srv), 0) / dst_host_srv_count,
+        ]
+        connection = (flow.src, flow.sport, flow.dst, flow.dport, PROTOCOL_NAMES[flow.proto],
+                      flow.start, flow.last)
+        self.completed.append((connection, row))
+
+    def _add_to_time_window(self, ts, host, srv, serror, rerror):
+        window = self._time_window
+        window.append((ts, host, srv, serror, rerror))
+        _increment(self._t_host, host)
+        _increment(self._t_srv, srv)
+        _increment(self._t_host_srv, (host, srv))
+        if serror:
+            _increment(self._t_host_serror, host)
+            _increment(self._t_srv_serror, srv)
+        if rerror:
+            _increment(self._t_host_rerror, host)
+            _increment(self._t_srv_rerror, srv)
+        oldest = ts - TIME_WINDOW
+        while window[0][0] < oldest:
+            _, old_host, old_srv, old_serror, old_rerror = window.popleft()
+            _decrement(self._t_host, old_host)
+            _decrement(self._t_srv, old_srv)
+            _decrement(self._t_host_srv, (old_host, old_srv))
+            if old_serror:
+                _decrement(self._t_host_serror, old_host)
+                _decrement(self._t_srv_serror, old_srv)
+            if old_rerror:
+                _decrement(self._t_host_rerror, old_host)
+                _decrement(self._t_srv_rerror, old_srv)
+
+    def _add_to_host_window(self, host, srv, sport, serror, rerror):
+        window = self._host_window
+        window.append((host, srv, sport, serror, rerror))
+        _increment(self._h_host, host)
+        _increment(self._h_srv, srv)
+        _increment(self._h_host_srv, (host, srv))
+        _increment(self._h_host_sport, (host, sport))
+        if serror:
+            _increment(self._h_host_serror, host)
+            _increment(self._h_host_srv_serror, (host, srv))
+        if rerror:
+            _increment(self._h_host_rerror, host)
+            _increment(self._h_host_srv_rerror, (host, srv))
+        if len(window) > HOST_WINDOW:
+            old_host, old_srv, old_sport, old_serror, old_rerror = window.popleft()
+            _decrement(self._h_host, old_host)
+            _decrement(self._h_srv, old_srv)
+            _decrement(self._h_host_srv, (old_host, old_srv))
+            _decrement(self._h_host_sport, (old_host, old_sport))
+            if old_serror:
+                _decrement(self._h_host_serror, old_host)
+                _decrement(self._h_host_srv_serror, (old_host, old_srv))
+            if old_rerror:
+                _decrement(self._h_host_rerror, old_host)
+                _decrement(self._h_host_srv_rerror, (old_host, old_srv))
+
+
+def headers_from_scapy(packet):
+    """
+    Decode the fields FlowAggregator.add_packet needs from a scapy packet,
+    as a tuple (ts, src, dst, proto, sport, dport, payload_len, tcp_flags,
+    icmp_type, frag_error), or None for non-IPv4 packets.
+    """
+    if not packet.haslayer('IP'):
+        return None
+    ip = packet['IP']
+    sport = dport = tcp_flags = 0
+    icmp_type = None
+    payload_len = len(ip.payload)
+    if packet.haslayer('TCP'):
+        tcp = packet['TCP']
+        sport, dport, tcp_flags = tcp.sport, tcp.dport, int(tcp.flags)
+        payload_len = len(tcp.payload)
+    elif packet.haslayer('UDP'):
+        udp = packet['UDP']
+        sport, dport = udp.sport, udp.dport
+        payload_len = len(udp.payload)
+    elif packet.haslayer('ICMP'):
+        icmp_type = packet['ICMP'].type
+    frag_error = bool(ip.frag) and not ip.flags.MF and ip.frag * 8 + len(ip.payload) > 65535
+    return (float(packet.time), ip.src, ip.dst, ip.proto, sport, dport, payload_len, tcp_flags,
+            icmp_type, frag_error)
+
@@ -0,0 +1,135 @@
+import time
+import threading
+from collections import Counter, deque
+
+RATE_WINDOWS = (1, 10, 60)
+
+
+class _Shard:
+    """Counters owned by one writer thread, with one bucket per second for the last `history` seconds."""
+
+    __slots__ = ('packets', 'alerts', 'by_type', 'buckets')
+
+    def __init__(self, history):
+        self.packets = 0
+        self.alerts = 0
+        self.by_type = Counter()
+        # [second, packets, alerts by type or None]; a new second gets a new list rather than
+        # resetting the old one, so a reader never pairs a second with another second's counts
+        self.buckets = [None] * history
+
+
+class LiveStats:
+    """
+    Live monitor statistics with lock-free counting and constant-cost reads.
+
+    Every writer thread counts into its own shard, so record() takes no
+    lock for normal traffic. Shards keep one bucket per second, from which
+    packets/sec and alerts/sec by type are computed over the last 1, 10
+    and 60 completed seconds. Recent alerts go to a fixed-size ring under
+    a short lock, numbered by a 'seq' that follows ring order so readers
+    can tell which alerts they have not seen yet. snapshot() sums the
+    shards (O(threads x 60), independent of traffic volume) and is cached
+    for snapshot_ttl seconds so polling readers cost almost nothing.
+    """
+
+    def __init__(self, alert_capacity=100, snapshot_ttl=0.1, windows=RATE_WINDOWS):
+        self.windows = windows
+        self.history = max(windows) + 1
+        self.snapshot_ttl = snapshot_ttl
+        self.started = time.time()
+        self._alerts = deque(maxlen=alert_capacity)
+        self._alert_seq = 0
+        self._alerts_lock = threading.Lock()
+        self._shards = []
+        self._local = threading.local()
+        self._shards_lock = threading.Lock()
+        self._last = ('Normal', 0.0, None, None)
+        self._snapshot = None
+        self._snapshot_at = 0.0
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(self.history)
+            with self._shards_lock:
+                self._shards = self._shards + [shard]
+        return shard
+
+    def record(self, src, dst, status='Normal', confidence=0.0, alert=None, ts=None):
+        """Count one analysed packet; alert is the alert type or message, None for normal traffic."""
+        now = ts if ts is not None else time.time()
+        second = int(now)
+        slot = second % self.history
+        shard = self._shard()
+        bucket = shard.buckets[slot]
+        if bucket is None or bucket[0] != second:
+            bucket = shard.buckets[slot] = [second, 0, None]
+        bucket[1] += 1
+        shard.packets += 1
+        if alert:
+            shard.alerts += 1
+            shard.by_type[alert] += 1
+            if bucket[2] is None:
+                bucket[2] = Counter()
+            bucket[2][alert] += 1
+            with self._alerts_lock:
+                self._alert_seq += 1
+                self._alerts.append({'seq': self._alert_seq, 'time': now, 'alert': alert, 'src': src, 'dst': dst,
+                                     'confidence': confidence})
+        # One tuple assignment, so readers never see a half-updated "last packet"
+        self._last = (status, confidence, src, dst)
+
+    def snapshot(self):
+        """Consistent point-in-time view: totals, last packet, rates per window and recent alerts."""
+        now = time.time()
+        cached = self._snapshot
+        if cached is not None and now - self._snapshot_at < self.snapshot_ttl:
+            return cached
+
+        current = int(now)
+        packets = alerts = 0
+        by_type = Counter()
+        packet_rates = dict.fromkeys(self.windows, 0)
+        alert_rates = {window: Counter() for window in self.windows}
+        for shard in self._shards:
+            packets += shard.packets
+            alerts += shard.alerts
+            # Writers keep adding keys to their Counters: dict() copies one in a single C call,
+            # where iterating it from here could fail with "dictionary changed size during iteration"
+            by_type.update(dict(shard.by_type))
+            for bucket in shard.buckets:
+                if bucket is None:
+                    continue
+                age = current - bucket[0]
+                bucket_packets = bucket[1]
+                bucket_alerts = dict(bucket[2]) if bucket[2] else None
+                for window in self.windows:
+                    # Completed seconds only: the current one is partial and would bias every rate low
+                    if 1 <= age <= window:
+                        packet_rates[window] += bucket_packets
+                        if bucket_alerts:
+                            alert_rates[window].update(bucket_alerts)
+
+        # Time the counted seconds actually cover: a window reaching back past start is not averaged over
+        # time before there was anything to count
+        covered = {window: min(window, max(current - self.started, 1)) for window in self.windows}
+        status, confidence, last_src, last_dst = self._last
+        snapshot = {
+            'status': status,
+            'confidence': confidence,
+            'packet_count': packets,
+            'alert_count': alerts,
+            'alerts_by_type': dict(by_type),
+            'last_src': last_src,
+            'last_dst': last_dst,
+            'packets_per_sec': {f'{window}s': packet_rates[window] / covered[window] for window in self.windows},
+            'alerts_per_sec': {f'{window}s': {alert: count / covered[window]
+                                              for alert, count in alert_rates[window].items()}
+                               for window in self.windows},
+            'recent_alerts': list(self._alerts),
+            'uptime_s': round(now - self.started, 3)
+        }
+        self._snapshot = snapshot
+        self._snapshot_at = now
+        return snapshot
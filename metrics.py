@@ -0,0 +1,263 @@
+import os
+import time
+import bisect
+import threading
+import numpy as np
+
+# DLHA_METRICS=0 switches instrumentation off: every timing and counting site checks ENABLED first
+ENABLED = os.environ.get('DLHA_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, from 5 us (one rule evaluation) to 2.5 s (a large bulk batch)
+LATENCY_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def set_enabled(value):
+    global ENABLED
+    ENABLED = bool(value)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def observe_many(self, values):
+        """observe() for a batch of values with one vectorized bucket count, for per-packet hot loops."""
+        if not len(values):
+            return
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.bincount(np.searchsorted(self.buckets, values), minlength=len(self.counts))
+        with self._lock:
+            for i, count in enumerate(counts.tolist()):
+                self.counts[i] += count
+            self.sum += float(values.sum())
+            self.count += len(values)
+
+    def drain(self):
+        """Return the state accumulated so far and reset it, for shipping to another process."""
+        with self._lock:
+            state = (self.counts, self.sum, self.count)
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum = 0.0
+            self.count = 0
+        return state
+
+    def merge(self, state):
+        counts, total, count = state
+        with self._lock:
+            for i, value in enumerate(counts):
+                self.counts[i] += value
+            self.sum += total
+            self.count += count
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics are exported (as 0) from the start
+            self.labels()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+            lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+class _Callback:
+    """A value read at scrape time, e.g. a queue depth or a counter kept by another object."""
+
+    def __init__(self, name, kind, help, function, labelnames=()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.function = function
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        value = self.function()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for values, sample in samples:
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(sample)}')
+        return lines
+
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, kind, help, function, labelnames=()):
+        """Register (or replace) a metric whose value is function() at scrape time."""
+        with self._lock:
+            self._metrics[name] = _Callback(name, kind, help, function, labelnames)
+
+    def render(self):
+        if not ENABLED:
+            return '# Instrumentation is off (DLHA_METRICS=0)\n'
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f'# Error collecting {metric.name}: {str(e)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'dlha_stage_seconds', 'Time per call in each DLHA scoring stage '
+    '(encode, scale, pca, projection = fused scale + PCA, layer1, layer2, combine)', ['stage'])
+PACKET_SECONDS = REGISTRY.histogram(
+    'dlha_packet_seconds', 'Time per packet in each capture analysis stage (decode, rules, analyze)', ['stage'])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'dlha_queue_wait_seconds', 'Time spent waiting in a queue before processing', ['queue'])
+PACKETS = REGISTRY.counter('dlha_packets_total', 'Packets analysed')
+FLOWS = REGISTRY.counter('dlha_flows_total', 'Finished connections scored by DLHA')
+PREDICTIONS = REGISTRY.counter('dlha_predictions_total', 'Records scored by DLHA')
+ALERTS = REGISTRY.counter('dlha_alerts_total', 'Alerts raised, by type', ['type'])
+DROPS = REGISTRY.counter('dlha_dropped_total', 'Packets or requests dropped, by where they were dropped', ['stage'])
+
+
+def _timed(histogram, stage, function, args):
+    if not ENABLED:
+        return function(*args)
+    start = time.perf_counter()
+    result = function(*args)
+    histogram.labels(stage).observe(time.perf_counter() - start)
+    return result
+
+
+def time_stage(stage, function, *args):
+    """function(*args), timed into dlha_stage_seconds{stage=...} when instrumentation is on."""
+    return _timed(STAGE_SECONDS, stage, function, args)
+
+
+def time_packet_stage(stage, function, *args):
+    """function(*args), timed into dlha_packet_seconds{stage=...} when instrumentation is on."""
+    return _timed(PACKET_SECONDS, stage, function, args)
+
+
+def count_packet(alert=None):
+    PACKETS.inc()
+    if alert:
+        ALERTS.labels(alert).inc()
+
+
+def render():
+    return REGISTRY.render()
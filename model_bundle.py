@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import time
+import datetime
+import numpy as np
+import joblib
+from scipy.special import expit, softmax, logsumexp
+
+from dlha_implementation import DLHA, FusedProjection, combine_layers
+from feature_encoding import FeatureEncoder
+import metrics
+
+# Bump when the manifest layout or array names change
+BUNDLE_FORMAT_VERSION = 2
+# Older versions still loaded; version 1 stored a two-class SVC's public, sign-flipped dual_coef_/intercept_
+SUPPORTED_BUNDLE_VERSIONS = (1, 2)
+
+DEFAULT_BUNDLE_DIR = os.path.join('model', 'dlha_bundle')
+
+# Rows scored at a time by the SVC kernel so the kernel matrix stays small
+KERNEL_BLOCK_ROWS = 1024
+
+
+def _rbf_kernel(X, components, component_norms, gamma):
+    distances = (X * X).sum(axis=1)[:, np.newaxis] + component_norms - 2.0 * (X @ components.T)
+    np.maximum(distances, 0, out=distances)
+    return np.exp(-gamma * distances)
+
+
+class GaussianNBLayer:
+    """GaussianNB.predict_proba from its fitted arrays."""
+
+    def __init__(self, classes, theta, var, class_prior):
+        self.classes_ = classes
+        self.theta = theta
+        self.var = var
+        self.log_prior = np.log(class_prior)
+        self.log_norm = -0.5 * np.log(2.0 * np.pi * var).sum(axis=1)
+
+    def predict_proba(self, X):
+        jll = np.empty((len(X), len(self.classes_)))
+        for i in range(len(self.classes_)):
+            jll[:, i] = self.log_prior[i] + self.log_norm[i] - 0.5 * (((X - self.theta[i]) ** 2) / self.var[i]).sum(axis=1)
+        return np.exp(jll - logsumexp(jll, axis=1)[:, np.newaxis])
+
+
+class SVCLayer:
+    """
+    RBF SVC with libsvm probability estimates from its fitted arrays:
+    one-vs-one decision values, Platt sigmoids per pair and libsvm's
+    pairwise coupling.
+    """
+
+    def __init__(self, classes, support_vectors, support_norms, dual_coef, intercept, n_support,
+                 prob_a, prob_b, gamma):
+        self.classes_ = classes
+        self.support_vectors = support_vectors
+        self.support_norms = support_norms
+        self.dual_coef = dual_coef
+        self.intercept = intercept
+        self.prob_a = prob_a
+        self.prob_b = prob_b
+        self.gamma = gamma
+        starts = np.concatenate([[0], np.cumsum(n_support)])
+        self.class_slices = [slice(starts[i], starts[i + 1]) for i in range(len(classes))]
+
+    def decision_values(self, X):
+        n_classes = len(self.classes_)
+        kernel = _rbf_kernel(X, self.support_vectors, self.support_norms, self.gamma)
+        decisions = np.empty((len(X), n_classes * (n_classes - 1) // 2))
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                si, sj = self.class_slices[i], self.class_slices[j]
+                decisions[:, pair] = (kernel[:, si] @ self.dual_coef[j - 1, si] +
+                                      kernel[:, sj] @ self.dual_coef[i, sj] + self.intercept[pair])
+                pair += 1
+        return decisions
+
+    def predict_proba(self, X):
+        return np.vstack([self._predict_proba_block(X[start:start + KERNEL_BLOCK_ROWS])
+                          for start in range(0, len(X), KERNEL_BLOCK_ROWS)])
+
+    def _predict_proba_block(self, X):
+        n_classes = len(self.classes_)
+        min_prob = 1e-7
+        pairwise = np.clip(expit(-(self.decision_values(X) * self.prob_a + self.prob_b)), min_prob, 1 - min_prob)
+        r = np.zeros((len(X), n_classes, n_classes))
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                r[:, i, j] = pairwise[:, pair]
+                r[:, j, i] = 1 - pairwise[:, pair]
+                pair += 1
+        return self._couple(r)
+
+    @staticmethod
+    def _couple(r):
+        # libsvm multiclass_probability, run for all rows at once
+        n, k = r.shape[0], r.shape[1]
+        Q = -r.transpose(0, 2, 1) * r
+        diagonal = (r.transpose(0, 2, 1) ** 2).sum(axis=2) - np.einsum('nii->ni', r) ** 2
+        Q[:, np.arange(k), np.arange(k)] = diagonal
+        p = np.full((n, k), 1.0 / k)
+        active = np.ones(n, dtype=bool)
+        eps = 0.005 / k
+        for _ in range(max(100, k)):
+            Qp = np.einsum('nij,nj->ni', Q, p)
+            pQp = (p * Qp).sum(axis=1)
+            active &= np.abs(Qp - pQp[:, np.newaxis]).max(axis=1) >= eps
+            if not active.any():
+                break
+            for t in range(k):
+                rows = active
+                diff = (-Qp[rows, t] + pQp[rows]) / Q[rows, t, t]
+                p[rows, t] += diff
+                pQp[rows] = (pQp[rows] + diff * (diff * Q[rows, t, t] + 2 * Qp[rows, t])) / (1 + diff) ** 2
+                Qp[rows] = (Qp[rows] + diff[:, np.newaxis] * Q[rows, t, :]) / (1 + diff)[:, np.newaxis]
+                p[rows] /= (1 + diff)[:, np.newaxis]
+        return p
+
+
+class NystroemLogisticLayer:
+    """Nystroem RBF features followed by multinomial logistic regression."""
+
+    def __init__(self, classes, components, component_norms, normalization, gamma, coef, intercept):
+        self.classes_ = classes
+        self.components = components
+        self.component_norms = component_norms
+        self.normalization = normalization
+        self.gamma = gamma
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict_proba(self, X):
+        features = _rbf_kernel(X, self.components, self.component_norms, self.gamma) @ self.normalization.T
+        decision = features @ self.coef.T + self.intercept
+        if len(self.classes_) == 2:
+            positive = expit(decision[:, 0])
+            return np.column_stack([1 - positive, positive])
+        return softmax(decision, axis=1)
+
+
+class RFFSGDLayer:
+    """Random Fourier features followed by one-vs-rest SGD logistic regression."""
+
+    def __init__(self, classes, random_weights, random_offset, coef, intercept):
+        self.classes_ = classes
+        self.random_weights = random_weights
+        self.random_offset = random_offset
+        self.coef = coef
+        self.intercept = intercept
+
+    def predict_proba(self, X):
+        features = np.cos(X @ self.random_weights + self.random_offset) * np.sqrt(2.0 / self.random_weights.shape[1])
+        probs = expit(features @ self.coef.T + self.intercept)
+        if len(self.classes_) == 2:
+            return np.column_stack([1 - probs[:, 0], probs[:, 0]])
+        return probs / probs.sum(axis=1)[:, np.newaxis]
+
+
+class CalibratedLinearLayer:
+    """Average of sigmoid-calibrated LinearSVC folds, as CalibratedClassifierCV does."""
+
+    def __init__(self, classes, coef, intercept, calibration_a, calibration_b):
+        self.classes_ = classes
+        self.coef = coef                    # (folds, classes, features)
+        self.intercept = intercept          # (folds, classes)
+        self.calibration_a = calibration_a  # (folds, classes)
+        self.calibration_b = calibration_b  # (folds, classes)
+
+    def predict_proba(self, X):
+        n_classes = len(self.classes_)
+        mean_proba = np.zeros((len(X), n_classes))
+        for fold in range(len(self.coef)):
+            decision = X @ self.coef[fold].T + self.intercept[fold]
+            proba = expit(-(self.calibration_a[fold] * decision + self.calibration_b[fold]))
+            if n_classes == 2:
+                proba = np.column_stack([1 - proba[:, -1], proba[:, -1]])
+            else:
+                denominator = proba.sum(axis=1)[:, np.newaxis]
+                proba = np.divide(proba, denominator, out=np.full_like(proba, 1 / n_classes),
+                                  where=denominator != 0)
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            mean_proba += proba
+        return mean_proba / len(self.coef)
+
+
+def _layer2_arrays(model):
+    """Arrays and parameters that describe the fitted layer 2 classifier."""
+    backend = model.layer2_backend
+    layer2 = model.layer2_classifier
+    if backend == 'svc':
+        support_vectors = layer2.support_vectors_
+        return {
+            'layer2_support_vectors': support_vectors,
+            'layer2_support_norms': (support_vectors ** 2).sum(axis=1),
+            # libsvm's own coefficients: for two classes sklearn negates the public dual_coef_ and intercept_
+            'layer2_dual_coef': layer2._dual_coef_,
+            'layer2_intercept': layer2._intercept_,
+            'layer2_n_support': layer2.n_support_,
+            'layer2_prob_a': layer2.probA_,
+            'layer2_prob_b': layer2.probB_,
+        }, {'gamma': float(layer2._gamma)}
+    if backend == 'nystroem':
+        nystroem, logistic = layer2[0], layer2[-1]
+        gamma = nystroem.gamma if nystroem.gamma is not None else 1.0 / nystroem.components_.shape[1]
+        return {
+            'layer2_components': nystroem.components_,
+            'layer2_component_norms': (nystroem.components_ ** 2).sum(axis=1),
+            'layer2_normalization': nystroem.normalization_,
+            'layer2_coef': logistic.coef_,
+            'layer2_intercept': logistic.intercept_,
+        }, {'gamma': float(gamma)}
+    if backend == 'rff':
+        sampler, sgd = layer2[0], layer2[-1]
+        return {
+            'layer2_random_weights': sampler.random_weights_,
+            'layer2_random_offset': sampler.random_offset_,
+            'layer2_coef': sgd.coef_,
+            'layer2_intercept': sgd.intercept_,
+        }, {}
+    if backend == 'linear_svm':
+        folds = layer2.calibrated_classifiers_
+        estimators = [getattr(fold, 'estimator', None) or fold.base_estimator for fold in folds]
+        calibrators = [getattr(fold, 'calibrators', None) or fold.calibrators_ for fold in folds]
+        return {
+            'layer2_coef': np.stack([estimator.coef_ for estimator in estimators]),
+            'layer2_intercept': np.stack([estimator.intercept_ for estimator in estimators]),
+            'layer2_calibration_a': np.array([[c.a_ for c in fold] for fold in calibrators]),
+            'layer2_calibration_b': np.array([[c.b_ for c in fold] for fold in calibrators]),
+        }, {}
+    raise ValueError(f"Unknown layer 2 backend '{backend}'")
+
+
+def _build_layer2(backend, classes, arrays, params):
+    if backend == 'svc':
+        return SVCLayer(classes, arrays['layer2_support_vectors'], arrays['layer2_support_norms'],
+                        arrays['layer2_dual_coef'], arrays['layer2_intercept'], arrays['layer2_n_support'],
+                        arrays['layer2_prob_a'], arrays['layer2_prob_b'], params['gamma'])
+    if backend == 'nystroem':
+        return NystroemLogisticLayer(classes, arrays['layer2_components'], arrays['layer2_component_norms'],
+                                     arrays['layer2_normalization'], params['gamma'],
+                                     arrays['layer2_coef'], arrays['layer2_intercept'])
+    if backend == 'rff':
+        return RFFSGDLayer(classes, arrays['layer2_random_weights'], arrays['layer2_random_offset'],
+                           arrays['layer2_coef'], arrays['layer2_intercept'])
+    if backend == 'linear_svm':
+        return CalibratedLinearLayer(classes, arrays['layer2_coef'], arrays['layer2_intercept'],
+                                     arrays['layer2_calibration_a'], arrays['layer2_calibration_b'])
+    raise ValueError(f"Unknown layer 2 backend '{backend}'")
+
+
+def save_bundle(model, feature_encoder, path=DEFAULT_BUNDLE_DIR):
+    """
+    Write a trained DLHA and its feature encoder as a model bundle: one .npy
+    file per named array plus manifest.json with the format version, the
+    layer classes, the categorical vocabularies and array shapes.
+    feature_encoder may be None for bundles that only score encoded rows.
+    """
+    if getattr(model, 'projection', None) is None:
+        model.compile_projection()
+    nb = model.layer1_classifier
+    arrays = {
+        'scaler_mean': model.scaler.mean_,
+        'scaler_scale': model.scaler.scale_,
+        'pca_mean': model.pca.mean_,
+        'pca_components': model.pca.components_,
+        'projection_weights': model.projection.weights,
+        'projection_offset': model.projection.offset,
+        'layer1_theta': nb.theta_,
+        'layer1_var': nb.var_ if hasattr(nb, 'var_') else nb.sigma_,
+        'layer1_class_prior': nb.class_prior_,
+    }
+    layer2_arrays, layer2_params = _layer2_arrays(model)
+    arrays.update(layer2_arrays)
+
+    os.makedirs(path, exist_ok=True)
+    array_manifest = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(path, f'{name}.npy'), array)
+        array_manifest[name] = {'file': f'{name}.npy', 'dtype': str(array.dtype), 'shape': list(array.shape)}
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created': datetime.datetime.now().isoformat(),
+        'confidence_threshold': model.confidence_threshold,
+        'layer2_backend': model.layer2_backend,
+        'layer2_params': layer2_params,
+        'layer1_classes': [str(c) for c in nb.classes_],
+        'layer2_classes': [str(c) for c in model.layer2_classifier.classes_],
+        'vocabularies': {feature: [str(v) for v in vocabulary]
+                         for feature, vocabulary in feature_encoder.vocabularies.items()} if feature_encoder else None,
+        'unknown_codes': feature_encoder.unknown_codes if feature_encoder else None,
+        'arrays': array_manifest,
+    }
+    # Manifest last, so a bundle is only visible once all arrays are written
+    manifest_path = os.path.join(path, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest_path
+
+
+class BundleModel:
+    """
+    Inference-only DLHA loaded from a model bundle. Arrays are memory-mapped
+    read-only by default, so worker processes loading the same bundle share
+    one copy of the support vectors and matrices through the page cache.
+    """
+
+    def __init__(self, path=DEFAULT_BUNDLE_DIR, mmap=True):
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        version = self.manifest.get('format_version')
+        if version not in SUPPORTED_BUNDLE_VERSIONS:
+            raise ValueError(f"Unsupported model bundle format version {version}, "
+                             f"expected {BUNDLE_FORMAT_VERSION}")
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, spec['file']), mmap_mode=mmap_mode)
+                  for name, spec in self.manifest['arrays'].items()}
+        if version == 1 and self.manifest['layer2_backend'] == 'svc' and len(self.manifest['layer2_classes']) == 2:
+            arrays['layer2_dual_coef'] = -arrays['layer2_dual_coef']
+            arrays['layer2_intercept'] = -arrays['layer2_intercept']
+        self.arrays = arrays
+
+        self.confidence_threshold = self.manifest['confidence_threshold']
+        self.layer2_backend = self.manifest['layer2_backend']
+        self.projection = FusedProjection.from_arrays(arrays['projection_weights'], arrays['projection_offset'])
+        self.layer1_classifier = GaussianNBLayer(np.array(self.manifest['layer1_classes'], dtype=object),
+                                                 arrays['layer1_theta'], arrays['layer1_var'],
+                                                 arrays['layer1_class_prior'])
+        self.layer2_classifier = _build_layer2(self.layer2_backend,
+                                               np.array(self.manifest['layer2_classes'], dtype=object),
+                                               arrays, self.manifest['layer2_params'])
+        self.feature_encoder = None
+        if self.manifest['vocabularies'] is not None:
+            self.feature_encoder = FeatureEncoder(self.manifest['vocabularies'], self.manifest['unknown_codes'])
+
+    def preprocess_data(self, X):
+        return metrics.time_stage('projection', self.projection.transform, X)
+
+    def predict_with_confidence(self, X):
+        X_processed = self.preprocess_data(X)
+        try:
+            return combine_layers(X_processed, self.layer1_classifier, self.layer2_classifier,
+                                  self.confidence_threshold)
+        except Exception as e:
+            print(f"Prediction error: {str(e)}")
+            return {
+                'labels': np.array(['Unknown'] * len(X)),
+                'layer1_probs': None,
+                'layer2_probs': None,
+                'confidence': np.array([0.0] * len(X))
+            }
+
+    def predict(self, X):
+        return self.predict_with_confidence(X)['labels']
+
+
+def load_bundle(path=DEFAULT_BUNDLE_DIR, mmap=True):
+    return BundleModel(path, mmap=mmap)
+
+
+def load_pickled_model(path):
+    # Models pickled from a script run as __main__ reference __main__.DLHA
+    main_module = sys.modules['__main__']
+    if not hasattr(main_module, 'DLHA'):
+        main_module.DLHA = DLHA
+    return joblib.load(path)
+
+
+def load_model_and_encoder(model_dir='model'):
+    """
+    Load the model for scoring, from the memory-mapped bundle when one has
+    been built and from the pickle otherwise. Returns (model, feature_encoder).
+    """
+    bundle_dir = os.path.join(model_dir, 'dlha_bundle')
+    if os.path.exists(os.path.join(bundle_dir, 'manifest.json')):
+        model = load_bundle(bundle_dir)
+        if model.feature_encoder is not None:
+            return model, model.feature_encoder
+    else:
+        model = load_pickled_model(os.path.join(model_dir, 'dlha_model.pkl'))
+    encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+    return model, FeatureEncoder.from_label_encoders(encoders)
+
+
+if __name__ == "__main__":
+    # Convert the pickled model and encoders into a bundle
+    model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+    start = time.perf_counter()
+    model = load_pickled_model(os.path.join(model_dir, 'dlha_model.pkl'))
+    encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+    manifest_path = save_bundle(model, FeatureEncoder.from_label_encoders(encoders),
+                                os.path.join(model_dir, 'dlha_bundle'))
+    print(f"Model bundle written to {os.path.dirname(manifest_path)} in {time.perf_counter() - start:.2f}s")
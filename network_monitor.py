@@ -1,7 +1,7 @@
 from scapy.all import sniff, conf, IP, rdpcap
 from scapy.arch.windows import get_windows_if_list
 from scapy.layers import inet
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 import json
 import os
 import threading
@@ -12,17 +12,19 @@ import socket
 import ctypes
 import sys
 import pyshark
+import metrics
+from live_stats import LiveStats
+from status_stream import StatusStream
 
 app = Flask(__name__)
 CORS(app)
 
-# Global variable to store latest results
-current_results = {
-    'status': 'Normal',
-    'confidence': 0.0,
-    'packet_count': 0,
-    'packets_analyzed': []
-}
+# Live counters, alert ring and rates; the capture thread records, /get_status reads snapshots
+stats = LiveStats(alert_capacity=int(os.environ.get('MONITOR_ALERT_HISTORY', 100)))
+
+# Status changes are pushed to the page over Server-Sent Events from an asyncio server
+STREAM_PORT = int(os.environ.get('MONITOR_STREAM_PORT', 5001))
+status_stream = StatusStream(stats.snapshot, interval=float(os.environ.get('MONITOR_STREAM_INTERVAL', 0.25)))
 
 def extract_features(packet):
     if IP in packet:
@@ -40,34 +42,29 @@ def extract_features(packet):
     return None
 
 def analyze_packet(features):
-    if features:
-        try:
-            # Enhanced traffic analysis
-            current_count = current_results['packet_count'] + 1
-            
-            # Check for potential suspicious patterns
-            if features['proto'] == 6:  # TCP
-                if features['len'] < 60:  # Potential scan
-                    return {
-                        'status': 'Alert',
-                        'confidence': 0.90,
-                        'packet_count': current_count,
-                        'last_src': features['src'],
-                        'last_dst': features['dst'],
-                        'alert': 'Potential port scan detected'
-                    }
-            
-            # Normal traffic
-            return {
-                'status': 'Normal',
-                'confidence': 0.95,
-                'packet_count': current_count,
-                'last_src': features['src'],
-                'last_dst': features['dst']
-            }
-        except Exception as e:
-            print(f"Analysis error: {str(e)}")
-    return current_results
+    """Classify one packet as (status, confidence, alert); alert is None for normal traffic."""
+    try:
+        # Check for potential suspicious patterns
+        if features['proto'] == 6:  # TCP
+            if features['len'] < 60:  # Potential scan
+                return 'Alert', 0.90, 'Potential port scan detected'
+
+        # Normal traffic
+        return 'Normal', 0.95, None
+    except Exception as e:
+        print(f"Analysis error: {str(e)}")
+    return 'Normal', 0.0, None
+
+def record_packet(features):
+    """Analyse one packet and count it in the live stats."""
+    if metrics.ENABLED:
+        start = time.perf_counter()
+        status, confidence, alert = analyze_packet(features)
+        metrics.PACKET_SECONDS.labels('analyze').observe(time.perf_counter() - start)
+        metrics.count_packet(alert)
+    else:
+        status, confidence, alert = analyze_packet(features)
+    stats.record(features['src'], features['dst'], status, confidence, alert, features['timestamp'])
 
 def is_admin():
     try:
@@ -109,15 +106,7 @@ def start_capture():
                             'ttl': int(packet.ip.ttl),
                             'timestamp': time.time()
                         }
-                        result = analyze_packet(features)
-                        global current_results
-                        current_results.update({
-                            'status': result.get('status', 'Normal'),
-                            'confidence': result.get('confidence', 0.0),
-                            'packet_count': result.get('packet_count', current_results['packet_count'] + 1),
-                            'last_src': features['src'],
-                            'last_dst': features['dst']
-                        })
+                        record_packet(features)
                         print(f"Packet captured: {features['src']} -> {features['dst']}")
             except Exception as e:
                 print(f"Failed to capture on interface {interface}: {str(e)}")
@@ -131,17 +120,9 @@ def start_capture():
 def process_packet(packet):
     try:
         if IP in packet:
-            features = extract_features(packet)
+            features = metrics.time_packet_stage('decode', extract_features, packet)
             if features:
-                result = analyze_packet(features)
-                global current_results
-                current_results.update({
-                    'status': result.get('status', 'Normal'),
-                    'confidence': result.get('confidence', 0.0),
-                    'packet_count': result.get('packet_count', current_results['packet_count'] + 1),
-                    'last_src': features['src'],
-                    'last_dst': features['dst']
-                })
+                record_packet(features)
                 print(f"Packet captured: {features['src']} -> {features['dst']}")
     except Exception as e:
         print(f"Error in process_packet: {str(e)}")
@@ -149,11 +130,12 @@ def process_packet(packet):
 # Update the index page to show more information
 @app.route('/')
 def index():
-    return """
+    return INDEX_HTML.replace('__STREAM_PORT__', str(STREAM_PORT))
+
+INDEX_HTML = """
     <html>
         <head>
             <title>Network Monitor</title>
-            <meta http-equiv="refresh" content="1">
             <style>
                 body { font-family: Arial, sans-serif; margin: 20px; }
                 .status { padding: 10px; margin: 10px 0; border-radius: 5px; }
@@ -168,30 +150,43 @@ def index():
                 <p>Status: <span id="status">Loading...</span></p>
                 <p>Confidence: <span id="confidence">0</span>%</p>
                 <p>Packets Analyzed: <span id="packets">0</span></p>
+                <p>Packets/sec (1s / 10s / 60s): <span id="rates">-</span></p>
+                <p>Alerts: <span id="alerts">0</span></p>
                 <div class="details">
                     <p>Last Source: <span id="last-src">-</span></p>
                     <p>Last Destination: <span id="last-dst">-</span></p>
                 </div>
             </div>
             <script>
-                function updateStatus() {
-                    fetch('/get_status')
-                        .then(response => response.json())
-                        .then(data => {
-                            document.getElementById('status').textContent = data.status;
-                            document.getElementById('confidence').textContent = 
-                                (data.confidence * 100).toFixed(2);
-                            document.getElementById('packets').textContent = data.packet_count;
-                            document.getElementById('last-src').textContent = data.last_src || '-';
-                            document.getElementById('last-dst').textContent = data.last_dst || '-';
-                            
-                            const statusDiv = document.getElementById('status-div');
-                            statusDiv.className = 'status ' + 
-                                (data.status === 'Normal' ? 'normal' : 'alert');
-                        });
+                var state = {};
+
+                function render(data) {
+                    document.getElementById('status').textContent = data.status;
+                    document.getElementById('confidence').textContent = 
+                        (data.confidence * 100).toFixed(2);
+                    document.getElementById('packets').textContent = data.packet_count;
+                    document.getElementById('rates').textContent =
+                        Object.values(data.packets_per_sec).map(r => r.toFixed(1)).join(' / ');
+                    document.getElementById('alerts').textContent = data.alert_count;
+                    document.getElementById('last-src').textContent = data.last_src || '-';
+                    document.getElementById('last-dst').textContent = data.last_dst || '-';
+                    
+                    const statusDiv = document.getElementById('status-div');
+                    statusDiv.className = 'status ' + 
+                        (data.status === 'Normal' ? 'normal' : 'alert');
                 }
-                setInterval(updateStatus, 1000);
-                updateStatus();
+
+                // Full snapshot on connect, then only the fields that changed
+                var source = new EventSource(
+                    location.protocol + '//' + location.hostname + ':__STREAM_PORT__/status/stream');
+                source.addEventListener('snapshot', function(event) {
+                    state = JSON.parse(event.data);
+                    render(state);
+                });
+                source.addEventListener('delta', function(event) {
+                    Object.assign(state, JSON.parse(event.data));
+                    render(state);
+                });
             </script>
         </body>
     </html>
@@ -199,9 +194,14 @@ def index():
 @app.route('/get_status')
 def get_status():
     try:
-        return jsonify(current_results)
+        return jsonify(stats.snapshot())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     # Remove Suricata startup
     
@@ -209,6 +209,9 @@ if __name__ == '__main__':
     capture_thread = threading.Thread(target=start_capture)
     capture_thread.daemon = True
     capture_thread.start()
+
+    # Start the status stream server
+    status_stream.start(port=STREAM_PORT)
     
     # Run Flask app
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
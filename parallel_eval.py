@@ -0,0 +1,52 @@
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from model_bundle import load_bundle, save_bundle
+
+# Set in each worker by _init_worker
+_worker_model = None
+_worker_X = None
+
+
+def _init_worker(bundle_path, X_path):
+    # Each worker maps the model and the input once; tasks only carry row ranges
+    global _worker_model, _worker_X
+    _worker_model = load_bundle(bundle_path)
+    _worker_X = np.load(X_path, mmap_mode='r')
+
+
+def _score_shard(bounds):
+    start, end = bounds
+    scored = _worker_model.predict_with_confidence(_worker_X[start:end])
+    return start, scored['labels'], scored['confidence']
+
+
+def parallel_predict_with_confidence(model, X, workers=None, shard_size=10000):
+    """
+    Score X across a process pool and merge the shards back in row order.
+    model is a trained DLHA or the path of a model bundle. The model and X
+    are written once to memory-mappable files that every worker maps,
+    instead of being pickled into each task. Returns (labels, confidence).
+    """
+    workers = workers or os.cpu_count()
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    with tempfile.TemporaryDirectory(prefix='dlha_eval_') as tmp_dir:
+        if isinstance(model, str):
+            bundle_path = model
+        else:
+            bundle_path = os.path.join(tmp_dir, 'bundle')
+            save_bundle(model, None, bundle_path)
+        X_path = os.path.join(tmp_dir, 'X.npy')
+        np.save(X_path, X)
+
+        labels = np.empty(len(X), dtype=object)
+        confidence = np.empty(len(X))
+        shards = [(start, min(start + shard_size, len(X))) for start in range(0, len(X), shard_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(bundle_path, X_path)) as pool:
+            for start, shard_labels, shard_confidence in pool.map(_score_shard, shards):
+                labels[start:start + len(shard_labels)] = shard_labels
+                confidence[start:start + len(shard_labels)] = shard_confidence
+    return labels.astype(str), confidence
@@ -0,0 +1,187 @@
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from dataset_cache import NpyColumnWriter
+from feature_encoding import CATEGORICAL_FEATURES, FeatureEncoder
+
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+# Set in each worker by _init_worker
+_worker_settings = None
+
+
+def chunk_ranges(path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """(start, end) byte ranges covering a text file, each ending on a line boundary."""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def map_label_codes(labels, attack_mapping, label_categories, default_label):
+    """
+    Attack names to category codes (indexes into label_categories). Each
+    distinct name in the chunk is looked up once; rows are mapped with one
+    array take.
+    """
+    codes, names = pd.factorize(labels)
+    positions = {category: code for code, category in enumerate(label_categories)}
+    default = positions[default_label]
+    # The extra last entry catches missing labels (factorize code -1)
+    lookup = np.array([positions[attack_mapping.get(str(name).lower(), default_label)] for name in names] + [default],
+                      dtype=np.int8)
+    return lookup[codes]
+
+
+def _init_worker(settings):
+    global _worker_settings
+    _worker_settings = settings
+
+
+def _prepare_chunk(task):
+    path, start, end = task
+    settings = _worker_settings
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = pd.read_csv(io.BytesIO(data), names=settings['columns'], usecols=settings['output_columns'],
+                        dtype={column: str for column in CATEGORICAL_FEATURES + ['label']})
+    result = {'rows': len(chunk), 'columns': {}, 'vocabularies': {}}
+    encoder = settings['encoder']
+    for column in settings['output_columns']:
+        if column == 'label':
+            result['columns'][column] = map_label_codes(chunk[column], settings['attack_mapping'],
+                                                        settings['label_categories'], settings['default_label'])
+        elif column in CATEGORICAL_FEATURES:
+            if encoder is not None:
+                result['columns'][column] = encoder.encode_column(column, chunk[column]).astype(np.int32)
+            else:
+                # Codes into this chunk's own vocabulary, merged into the global one by the parent
+                codes, uniques = pd.factorize(chunk[column])
+                result['columns'][column] = codes.astype(np.int32)
+                result['vocabularies'][column] = uniques.tolist()
+        else:
+            result['columns'][column] = chunk[column].to_numpy(dtype=np.float64)
+    return result
+
+
+def _map_in_order(pool, tasks, window):
+    # At most `window` chunks in flight or waiting to be written, so memory stays bounded by the chunk size
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(_prepare_chunk, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _prepared_chunks(path, settings, workers, chunk_bytes):
+    tasks = [(path, start, end) for start, end in chunk_ranges(path, chunk_bytes)]
+    if workers <= 1:
+        _init_worker(settings)
+        for task in tasks:
+            yield _prepare_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        yield from _map_in_order(pool, tasks, workers * 2)
+
+
+def _write_table(directory, path, settings, label_categories, workers, chunk_bytes, vocabularies=None):
+    """Stream one raw file into column files. Returns (manifest entry, merged vocabularies in first-seen order)."""
+    os.makedirs(directory)
+    columns = settings['output_columns']
+    writers = {}
+    entries = []
+    for position, column in enumerate(columns):
+        dtype = np.int8 if column == 'label' else np.int32 if column in CATEGORICAL_FEATURES else np.float64
+        entry = {'name': column, 'file': f'{position:03d}.npy', 'dtype': np.dtype(dtype).name}
+        if column == 'label':
+            entry['categories'] = label_categories
+        writers[column] = NpyColumnWriter(os.path.join(directory, entry['file']), dtype)
+        entries.append(entry)
+
+    merged = {feature: {} for feature in CATEGORICAL_FEATURES}
+    rows = 0
+    try:
+        for result in _prepared_chunks(path, settings, workers, chunk_bytes):
+            rows += result['rows']
+            for column, values in result['columns'].items():
+                if column in result['vocabularies']:
+                    # Chunk codes -> provisional global ids (first-seen order); -1 (missing) stays -1
+                    table = merged[column]
+                    ids = np.array([table.setdefault(value, len(table)) for value in result['vocabularies'][column]]
+                                   + [-1], dtype=np.int32)
+                    values = ids[values]
+                writers[column].append(values)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {'rows': rows, 'columns': entries}, {feature: list(table) for feature, table in merged.items()}
+
+
+def _remap_codes(path, remap, block_rows=1 << 20):
+    codes = np.load(path, mmap_mode='r+')
+    for start in range(0, len(codes), block_rows):
+        codes[start:start + block_rows] = remap[codes[start:start + block_rows]]
+    codes.flush()
+    del codes
+
+
+def prepare_chunked(directory, train_path, test_path, columns, attack_mapping, default_label='Normal',
+                    workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Prepare the raw train and test files into dataset cache column files
+    under directory (see dataset_cache.write_tables), in chunks of about
+    chunk_bytes parsed by a pool of worker processes.
+
+    Labels are mapped to categories with one lookup per distinct name per
+    chunk. Train chunks encode categoricals against their own small
+    vocabularies, which are merged in file order; once the whole file is
+    seen the merged vocabularies are sorted (the order LabelEncoder and
+    FeatureEncoder.fit use) and the train codes are rewritten in place.
+    The test file is then encoded with the train vocabularies. Output is
+    written chunk by chunk, so memory does not grow with the file.
+
+    Returns (tables, metadata) with the vocabularies and throughput in
+    metadata['vocabularies'] and metadata['preparation'].
+    """
+    workers = workers or os.cpu_count()
+    started = time.perf_counter()
+    output_columns = [column for column in columns if column != 'difficulty']
+    label_categories = sorted(set(attack_mapping.values()) | {default_label})
+    settings = {'columns': columns, 'output_columns': output_columns, 'attack_mapping': attack_mapping,
+                'label_categories': label_categories, 'default_label': default_label, 'encoder': None}
+
+    train_table, first_seen = _write_table(os.path.join(directory, 'train'), train_path, settings,
+                                           label_categories, workers, chunk_bytes)
+    feature_encoder = FeatureEncoder(first_seen)
+    for feature in CATEGORICAL_FEATURES:
+        # Provisional id -> sorted vocabulary code; the extra last entry sends missing values to the unknown code
+        remap = np.array([feature_encoder.tables[feature][value] for value in first_seen[feature]]
+                         + [feature_encoder.unknown_codes[feature]], dtype=np.int32)
+        _remap_codes(os.path.join(directory, 'train', f'{output_columns.index(feature):03d}.npy'), remap)
+
+    settings['encoder'] = feature_encoder
+    test_table, _ = _write_table(os.path.join(directory, 'test'), test_path, settings,
+                                 label_categories, workers, chunk_bytes)
+
+    elapsed = time.perf_counter() - started
+    rows = train_table['rows'] + test_table['rows']
+    vocabularies = {feature: vocabulary.tolist() for feature, vocabulary in feature_encoder.vocabularies.items()}
+    metadata = {'vocabularies': vocabularies,
+                'preparation': {'workers': workers, 'chunk_bytes': chunk_bytes, 'rows': rows,
+                                'seconds': round(elapsed, 3), 'rows_per_s': round(rows / max(elapsed, 1e-9), 1)}}
+    return {'train': train_table, 'test': test_table}, metadata
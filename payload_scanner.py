@@ -0,0 +1,93 @@
+import re
+
+
+class PayloadScanner:
+    """
+    Case-insensitive multi-pattern substring matcher over raw payload
+    bytes. The signatures are merged into a trie when the scanner is built
+    and the trie is compiled into one regular expression, so a scan is a
+    single left-to-right pass over the bytes inside the regex engine with
+    shared prefixes tested once, like an Aho-Corasick automaton run in C.
+
+    Case is folded with one ASCII lower() pass over the payload bytes
+    before the scan; there is no UTF-8 decode. That is several times
+    faster than re.IGNORECASE, which turns off the regex engine's
+    first-byte skip. Accepts bytes, bytearray or memoryview (e.g.
+    raw_packets.PacketHeader.payload).
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self._ids = {}
+        for pattern in patterns:
+            pattern = pattern.encode() if isinstance(pattern, str) else bytes(pattern)
+            pattern = pattern.lower()
+            if pattern and pattern not in self._ids:
+                self._ids[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+
+        trie = {}
+        for pattern in self.patterns:
+            node = trie
+            for byte in pattern:
+                node = node.setdefault(byte, {})
+            node[None] = True
+        expression = _trie_expression(trie) if self.patterns else b'(?!)'
+        flags = re.DOTALL
+        self._search = re.compile(expression, flags).search
+        # Zero-width lookahead finds the longest signature starting at every offset
+        self._finditer = re.compile(b'(?=(' + expression + b'))', flags).finditer
+
+        # A match also covers every signature that is a prefix of it
+        self._prefix_ids = {}
+        for pattern in self.patterns:
+            self._prefix_ids[pattern] = frozenset(self._ids[pattern[:end]] for end in range(1, len(pattern) + 1)
+                                                  if pattern[:end] in self._ids)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def search(self, payload):
+        """Whether any signature occurs in the payload."""
+        return self._search(_fold(payload)) is not None
+
+    def scan(self, payload):
+        """Set of ids (indexes into self.patterns) of every signature occurring in the payload."""
+        found = set()
+        prefix_ids = self._prefix_ids
+        for match in self._finditer(_fold(payload)):
+            found |= prefix_ids[match.group(1)]
+        return found
+
+    def pattern_id(self, pattern):
+        pattern = pattern.encode() if isinstance(pattern, str) else bytes(pattern)
+        return self._ids[pattern.lower()]
+
+
+def _fold(payload):
+    if type(payload) is not bytes:
+        payload = bytes(payload)
+    return payload.lower()
+
+
+def _trie_expression(node):
+    # Regex for the subtree below node: one alternative per distinct next byte
+    terminal = None in node
+    branches = []
+    leaves = []
+    for byte in sorted(key for key in node if key is not None):
+        child = node[byte]
+        if len(child) == 1 and None in child:
+            leaves.append(byte)
+        else:
+            branches.append(re.escape(bytes([byte])) + _trie_expression(child))
+    if leaves:
+        if len(leaves) == 1:
+            branches.append(re.escape(bytes(leaves)))
+        else:
+            branches.append(b'[' + b''.join(re.escape(bytes([byte])) for byte in leaves) + b']')
+    expression = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+    if terminal:
+        # Greedy optional tail: the longest signature wins at each offset
+        expression = b'(?:' + expression + b')?'
+    return expression
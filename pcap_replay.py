@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from scapy.all import PcapReader
+
+import metrics
+from flow_aggregator import FlowAggregator, headers_from_scapy
+from model_bundle import load_model_and_encoder
+from prediction_cache import CachedModel, PredictionCache
+from raw_packets import PacketHeader, iter_pcap_headers
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT = 0.05
+
+
+def iter_pcap_packets(path):
+    """Yield the scapy packets of a pcap or pcapng file one at a time, without loading the file."""
+    with PcapReader(path) as reader:
+        for packet in reader:
+            yield packet
+
+
+class PcapReplay:
+    """
+    Streams packets through the FlowAggregator and scores finished
+    connections with DLHA in batches. A batch is scored when it reaches
+    batch_size connections or when its oldest connection has waited
+    max_wait seconds of wall time, so detection latency stays bounded in
+    real-time mode. With realtime=True packets are paced by their capture
+    timestamps (scaled by speed); otherwise they are replayed as fast as
+    possible.
+
+    analyze, if given, is called with every packet (e.g. dlha_main.detect_attack)
+    and a non-empty return counts as a rule alert. on_result, if given, is
+    called with (connection, label, confidence) for every scored connection.
+    """
+
+    def __init__(self, model, feature_encoder, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT,
+                 realtime=False, speed=1.0, analyze=None, on_result=None, aggregator=None):
+        self.model = model
+        self.feature_encoder = feature_encoder
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.realtime = realtime
+        self.speed = speed
+        self.analyze = analyze
+        self.on_result = on_result
+        self.aggregator = aggregator or FlowAggregator()
+        self._pending = []           # (finished wall time, connection, row)
+        self._latencies = []
+        self.label_counts = Counter()
+        self.rule_alerts = 0
+
+    def run(self, packets, decode=headers_from_scapy):
+        """
+        Replay an iterable of packets and return the run statistics. decode
+        turns a packet into the FlowAggregator.add_packet arguments (or None);
+        the default takes scapy packets, PacketHeader.flow_header takes
+        raw_packets headers.
+        """
+        aggregator = self.aggregator
+        packet_count = 0
+        first_ts = None
+        start = time.perf_counter()
+        for packet in packets:
+            packet_count += 1
+            header = decode(packet)
+            if self.realtime and header is not None:
+                if first_ts is None:
+                    first_ts = header[0]
+                self._wait_until(start + (header[0] - first_ts) / self.speed)
+            if self.analyze is not None and self.analyze(packet):
+                self.rule_alerts += 1
+            if header is not None:
+                aggregator.add_packet(*header)
+                if aggregator.completed:
+                    self._collect()
+            if self._pending and (len(self._pending) >= self.batch_size or
+                                  time.perf_counter() - self._pending[0][0] >= self.max_wait):
+                self._score_pending()
+
+        aggregator.flush()
+        self._collect()
+        while self._pending:
+            self._score_pending()
+        elapsed = time.perf_counter() - start
+        return self._stats(packet_count, elapsed)
+
+    def _wait_until(self, target):
+        # Sleep towards the packet's due time, scoring pending connections whose wait runs out
+        while True:
+            now = time.perf_counter()
+            if now >= target:
+                return
+            if self._pending:
+                deadline = self._pending[0][0] + self.max_wait
+                if deadline <= now:
+                    self._score_pending()
+                    continue
+                time.sleep(min(target, deadline) - now)
+            else:
+                time.sleep(target - now)
+
+    def _collect(self):
+        finished = time.perf_counter()
+        connections, rows = self.aggregator.drain()
+        self._pending.extend((finished, connection, row) for connection, row in zip(connections, rows))
+
+    def _score_pending(self):
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        X = metrics.time_stage('encode', self.feature_encoder.encode_rows, [row for _, _, row in batch])
+        scored = self.model.predict_with_confidence(X)
+        done = time.perf_counter()
+        if metrics.ENABLED:
+            metrics.FLOWS.inc(len(batch))
+        for (finished, connection, _), label, confidence in zip(batch, scored['labels'], scored['confidence']):
+            self._latencies.append(done - finished)
+            self.label_counts[str(label)] += 1
+            if self.on_result is not None:
+                self.on_result(connection, label, confidence)
+
+    def _stats(self, packet_count, elapsed):
+        latencies = np.array(self._latencies) * 1000
+        connections = len(latencies)
+        stats = {
+            'packets': packet_count,
+            'connections': connections,
+            'elapsed_s': elapsed,
+            'packets_per_s': packet_count / elapsed if elapsed else 0.0,
+            'flows_per_s': connections / elapsed if elapsed else 0.0,
+            'labels': dict(self.label_counts),
+            'rule_alerts': self.rule_alerts
+        }
+        if connections:
+            stats.update({
+                'latency_mean_ms': float(latencies.mean()),
+                'latency_p50_ms': float(np.percentile(latencies, 50)),
+                'latency_p99_ms': float(np.percentile(latencies, 99)),
+                'latency_max_ms': float(latencies.max())
+            })
+        return stats
+
+
+def replay_pcap(path, model=None, feature_encoder=None, model_dir='model', raw=False, cache=None, **kwargs):
+    """
+    Replay a pcap file through the flow aggregator and DLHA. With raw=True
+    headers are decoded straight from the frame bytes (raw_packets) instead
+    of by scapy. With a PredictionCache, repeated flows are not rescored.
+    Returns the run statistics.
+    """
+    if model is None:
+        model, feature_encoder = load_model_and_encoder(model_dir)
+    if cache is not None:
+        model = CachedModel(model, cache)
+    replay = PcapReplay(model, feature_encoder, **kwargs)
+    if raw:
+        stats = replay.run(iter_pcap_headers(path), decode=PacketHeader.flow_header)
+    else:
+        stats = replay.run(iter_pcap_packets(path))
+    if cache is not None:
+        stats['prediction_cache'] = cache.stats()
+    return stats
+
+
+def print_stats(stats):
+    print(f"Packets:      {stats['packets']:,}")
+    print(f"Connections:  {stats['connections']:,}")
+    print(f"Elapsed:      {stats['elapsed_s']:.2f}s")
+    print(f"Packets/sec:  {stats['packets_per_s']:,.0f}")
+    print(f"Flows/sec:    {stats['flows_per_s']:,.0f}")
+    if stats['connections']:
+        print(f"Detection latency: mean {stats['latency_mean_ms']:.2f} ms, p50 {stats['latency_p50_ms']:.2f} ms, "
+              f"p99 {stats['latency_p99_ms']:.2f} ms, max {stats['latency_max_ms']:.2f} ms")
+    print(f"Predictions:  {stats['labels']}")
+    if stats['rule_alerts']:
+        print(f"Rule alerts:  {stats['rule_alerts']:,}")
+    if 'prediction_cache' in stats:
+        cache = stats['prediction_cache']
+        print(f"Prediction cache: {cache['hits']:,} hits, {cache['misses']:,} misses ({cache['hit_rate']:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a pcap file through DLHA without capture privileges")
+    parser.add_argument('pcap')
+    parser.add_argument('--realtime', action='store_true', help="Pace packets by their capture timestamps")
+    parser.add_argument('--speed', type=float, default=1.0, help="Real-time pacing multiplier")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-wait', type=float, default=DEFAULT_MAX_WAIT,
+                        help="Longest a finished connection waits for its batch, in seconds")
+    parser.add_argument('--rules', action='store_true', help="Also run dlha_main.detect_attack on every packet")
+    parser.add_argument('--raw', action='store_true', help="Decode headers from raw bytes instead of with scapy")
+    parser.add_argument('--model-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model'))
+    parser.add_argument('--cache-size', type=int, default=0, help="Prediction cache entries (0 = no cache)")
+    parser.add_argument('--cache-decimals', type=int, default=None, help="Round features to this many decimals for cache keys")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pcap):
+        print(f"Error: {args.pcap} not found")
+        sys.exit(1)
+
+    analyze = None
+    if args.rules:
+        from dlha_main import detect_attack, detect_attack_header
+        analyze = detect_attack_header if args.raw else detect_attack
+
+    cache = PredictionCache(args.cache_size, decimals=args.cache_decimals) if args.cache_size else None
+    stats = replay_pcap(args.pcap, model_dir=args.model_dir, batch_size=args.batch_size,
+                        max_wait=args.max_wait, realtime=args.realtime, speed=args.speed, analyze=analyze, raw=args.raw,
+                        cache=cache)
+    print_stats(stats)
@@ -0,0 +1,187 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_TTL = 300.0
+
+
+def model_token(model):
+    """
+    What a cached result depends on: the model object, its fitted
+    projection and classifiers (replaced on every train or reload) and its
+    confidence threshold. Compared by identity, so any retrain, reload or
+    threshold change invalidates the cache.
+    """
+    return (model, getattr(model, 'projection', None), getattr(model, 'layer1_classifier', None),
+            getattr(model, 'layer2_classifier', None), getattr(model, 'confidence_threshold', None))
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of (label, confidence) results keyed by the encoded
+    feature vector. With decimals set, vectors are rounded before hashing
+    so near-identical flows share an entry. Entries expire ttl seconds
+    after they were scored (ttl=None keeps them until evicted), and the
+    least recently used entry is evicted beyond max_entries. The cache is
+    cleared whenever it is used with a different model (see model_token).
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, decimals=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.decimals = decimals
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._token = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self, X):
+        """One hashable key per row of a float feature matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if self.decimals is not None:
+            X = np.round(X, self.decimals)
+            # -0.0 and 0.0 must share a key
+            X += 0.0
+        X = X.reshape(len(X), -1)
+        # Each row viewed as one fixed-size bytes value
+        return X.view(np.dtype((np.void, X.shape[1] * X.itemsize))).ravel().tolist()
+
+    def bind(self, model):
+        """Clear the cache if model is not the model it was filled by."""
+        token = model_token(model)
+        current = self._token
+        if current is None or len(current) != len(token) or any(a is not b for a, b in zip(current, token)):
+            with self._lock:
+                if self._token is not None:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._token = token
+
+    def lookup(self, keys):
+        """Cached (label, confidence) per key, None for misses. Updates recency and the counters."""
+        now = self.clock()
+        results = []
+        with self._lock:
+            entries = self._entries
+            for key in keys:
+                entry = entries.get(key)
+                if entry is not None and entry[2] is not None and entry[2] <= now:
+                    del entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry)
+        return results
+
+    def store(self, keys, labels, confidence):
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            entries = self._entries
+            for key, label, conf in zip(keys, labels, confidence):
+                entries[key] = (label, float(conf), expires)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def count_repeats(self, count):
+        """Misses that repeated another miss in the same batch, served without being scored again."""
+        with self._lock:
+            self.misses -= count
+            self.hits += count
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_s': self.ttl,
+            'decimals': self.decimals,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+
+class CachedModel:
+    """
+    A DLHA (or BundleModel) with a PredictionCache in front of it, usable
+    wherever the model is. predict_with_confidence looks every row up,
+    scores only the misses (each distinct vector once) in one call to the
+    model and stores their results. The per-layer probabilities are not
+    cached, so they are None in the result.
+    """
+
+    def __init__(self, model, cache=None):
+        self.model = model
+        self.cache = cache if cache is not None else PredictionCache()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def predict_with_confidence(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        cache = self.cache
+        cache.bind(self.model)
+        keys = cache.keys(X)
+        cached = cache.lookup(keys)
+
+        labels = np.empty(len(X), dtype=object)
+        confidence = np.empty(len(X))
+        # Rows to score, one per distinct missing key; duplicates copy the result afterwards
+        first_row = {}
+        duplicates = []
+        for i, (key, entry) in enumerate(zip(keys, cached)):
+            if entry is not None:
+                labels[i], confidence[i] = entry[0], entry[1]
+            elif key in first_row:
+                duplicates.append((i, first_row[key]))
+            else:
+                first_row[key] = i
+
+        if first_row:
+            rows = np.fromiter(first_row.values(), dtype=np.intp, count=len(first_row))
+            scored = self.model.predict_with_confidence(X[rows])
+            labels[rows] = scored['labels']
+            confidence[rows] = scored['confidence']
+            # A failed prediction comes back without layer probabilities and is not cached
+            if scored.get('layer1_probs') is not None:
+                cache.store(first_row.keys(), scored['labels'], scored['confidence'])
+            if duplicates:
+                repeats, sources = np.array(duplicates, dtype=np.intp).T
+                labels[repeats] = labels[sources]
+                confidence[repeats] = confidence[sources]
+                cache.count_repeats(len(duplicates))
+
+        return {
+            'labels': labels.astype(str),
+            'layer1_probs': None,
+            'layer2_probs': None,
+            'confidence': confidence
+        }
+
+    def predict(self, X):
+        return self.predict_with_confidence(X)['labels']
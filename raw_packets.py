@@ -0,0 +1,236 @@
+import time
+import socket
+import struct
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_MAGIC = b'\x0a\x0d\x0d\x0a'
+
+_unpack_from = struct.unpack_from
+_inet_ntoa = socket.inet_ntoa
+
+
+class PacketHeader:
+    """
+    Decoded link/network/transport header fields of one frame: the fields
+    dlha_main.detect_attack reads through scapy accessors, plus what the
+    FlowAggregator needs. payload is a memoryview of the transport payload
+    (TCP/UDP data, ICMP body). version is 4 or 6 for IP packets and 0 for
+    anything else.
+    """
+
+    __slots__ = ('ts', 'length', 'version', 'src', 'dst', 'proto', 'ttl', 'sport', 'dport',
+                 'tcp_flags', 'icmp_type', 'payload', 'payload_len', 'frag_error', 'dns_qr',
+                 'frame', 'linktype')
+
+    def __init__(self, ts, frame, linktype):
+        self.ts = ts
+        self.frame = frame
+        self.linktype = linktype
+        self.length = len(frame)
+        self.version = 0
+        self.src = self.dst = None
+        self.proto = self.ttl = None
+        self.sport = self.dport = None
+        self.tcp_flags = None
+        self.icmp_type = None
+        self.payload = b''
+        self.payload_len = 0
+        self.frag_error = False
+        self.dns_qr = None
+
+    def flow_header(self):
+        """The FlowAggregator.add_packet argument tuple, or None for non-IPv4 packets."""
+        if self.version != 4:
+            return None
+        return (self.ts, self.src, self.dst, self.proto, self.sport or 0, self.dport or 0, self.payload_len,
+                self.tcp_flags or 0, self.icmp_type, self.frag_error)
+
+    def scapy_packet(self):
+        """Full scapy dissection of the frame, for the rare cases that need deep payload inspection."""
+        from scapy.all import conf, Raw
+        cls = conf.l2types.get(self.linktype, Raw)
+        packet = cls(bytes(self.frame))
+        packet.time = self.ts
+        return packet
+
+
+def header_from_scapy(packet):
+    """PacketHeader for a scapy packet (e.g. from sniff), decoded from its raw bytes."""
+    from scapy.all import conf
+    linktype = conf.l2types.layer2num.get(type(packet), LINKTYPE_ETHERNET)
+    return parse_frame(bytes(packet), float(packet.time), linktype)
+
+
+def parse_frame(frame, ts=0.0, linktype=LINKTYPE_ETHERNET):
+    """Decode the Ethernet/IPv4/IPv6/TCP/UDP/ICMP headers of a raw frame into a PacketHeader."""
+    header = PacketHeader(ts, frame, linktype)
+    buf = memoryview(frame)
+    size = len(buf)
+
+    if linktype == LINKTYPE_ETHERNET:
+        if size < 14:
+            return header
+        ethertype = buf[12] << 8 | buf[13]
+        offset = 14
+        while ethertype in VLAN_ETHERTYPES and size >= offset + 4:
+            ethertype = buf[offset + 2] << 8 | buf[offset + 3]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if size < 16:
+            return header
+        ethertype = buf[14] << 8 | buf[15]
+        offset = 16
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_NULL, LINKTYPE_LOOP):
+        # Bare IP, or behind the 4-byte address family of loopback captures
+        offset = 0 if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4) else 4
+        if size <= offset:
+            return header
+        ethertype = ETH_P_IPV6 if buf[offset] >> 4 == 6 else ETH_P_IP
+    else:
+        return header
+
+    if ethertype == ETH_P_IP:
+        if size < offset + 20:
+            return header
+        ihl = (buf[offset] & 0x0F) * 4
+        total_length, _, frag, ttl, proto = _unpack_from('!HHHBB', buf, offset + 2)
+        ip_end = min(offset + total_length, size)
+        transport = offset + ihl
+        header.version = 4
+        header.src = _inet_ntoa(buf[offset + 12:offset + 16])
+        header.dst = _inet_ntoa(buf[offset + 16:offset + 20])
+        header.proto = proto
+        header.ttl = ttl
+        header.payload_len = max(ip_end - transport, 0)
+        fragment_offset = frag & 0x1FFF
+        if fragment_offset:
+            # Only the first fragment carries the transport header
+            header.frag_error = not frag & 0x2000 and fragment_offset * 8 + header.payload_len > 65535
+            return header
+    elif ethertype == ETH_P_IPV6:
+        if size < offset + 40:
+            return header
+        payload_length, proto, ttl = _unpack_from('!HBB', buf, offset + 4)
+        transport = offset + 40
+        ip_end = min(transport + payload_length, size)
+        header.version = 6
+        header.src = socket.inet_ntop(socket.AF_INET6, buf[offset + 8:offset + 24])
+        header.dst = socket.inet_ntop(socket.AF_INET6, buf[offset + 24:offset + 40])
+        header.proto = proto
+        header.ttl = ttl
+        header.payload_len = max(ip_end - transport, 0)
+    else:
+        return header
+
+    if proto == 6 and ip_end - transport >= 20:
+        sport, dport, _, _, offset_flags = _unpack_from('!HHIIH', buf, transport)
+        data = transport + (offset_flags >> 12) * 4
+        header.sport, header.dport = sport, dport
+        header.tcp_flags = offset_flags & 0x1FF
+        header.payload = buf[data:ip_end]
+        header.payload_len = max(ip_end - data, 0)
+    elif proto == 17 and ip_end - transport >= 8:
+        sport, dport = _unpack_from('!HH', buf, transport)
+        header.sport, header.dport = sport, dport
+        header.payload = buf[transport + 8:ip_end]
+        header.payload_len = max(ip_end - transport - 8, 0)
+        if (sport == 53 or dport == 53) and len(header.payload) >= 3:
+            header.dns_qr = header.payload[2] >> 7
+    elif proto == 1 and header.version == 4 and ip_end - transport >= 1:
+        header.icmp_type = buf[transport]
+        header.payload = buf[transport + 8:ip_end]
+    return header
+
+
+class PcapFileReader:
+    """
+    Minimal streaming reader for classic pcap files (micro- and
+    nanosecond, either byte order). Iterating yields (timestamp, frame
+    bytes) one record at a time.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        magic = self._file.read(4)
+        if magic == PCAPNG_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is pcapng; convert it with 'editcap -F pcap' or use the scapy reader")
+        if magic not in PCAP_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a pcap file")
+        self._endian, self._resolution = PCAP_MAGIC[magic]
+        _, _, _, _, self.snaplen, network = struct.unpack(self._endian + 'HHiIII', self._file.read(20))
+        self.linktype = network & 0x0FFFFFFF
+        self._record = struct.Struct(self._endian + 'IIII')
+
+    def __iter__(self):
+        read = self._file.read
+        unpack = self._record.unpack
+        resolution = self._resolution
+        while True:
+            record = read(16)
+            if len(record) < 16:
+                return
+            seconds, fraction, captured, _ = unpack(record)
+            frame = read(captured)
+            if len(frame) < captured:
+                return
+            yield seconds + fraction * resolution, frame
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_pcap_headers(path):
+    """Yield a PacketHeader for every frame of a pcap file."""
+    with PcapFileReader(path) as reader:
+        linktype = reader.linktype
+        for ts, frame in reader:
+            yield parse_frame(frame, ts, linktype)
+
+
+def iter_af_packet_frames(interface=None, snaplen=65535):
+    """
+    Capture frames from a Linux AF_PACKET socket, yielding (timestamp,
+    frame bytes). Needs CAP_NET_RAW (or root).
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
+    try:
+        if interface:
+            sock.bind((interface, 0))
+        buffer = bytearray(snaplen)
+        view = memoryview(buffer)
+        while True:
+            size = sock.recv_into(buffer)
+            yield time.time(), bytes(view[:size])
+    finally:
+        sock.close()
+
+
+def iter_af_packet_headers(interface=None, snaplen=65535):
+    """Capture from a Linux AF_PACKET socket and yield a PacketHeader for each frame."""
+    for ts, frame in iter_af_packet_frames(interface, snaplen):
+        yield parse_frame(frame, ts)
@@ -0,0 +1,258 @@
+import json
+import numpy as np
+
+from payload_scanner import PayloadScanner
+
+PROTOCOLS = ('tcp', 'udp', 'icmp')
+TCP_FLAG_LETTERS = {'F': 0x01, 'S': 0x02, 'R': 0x04, 'P': 0x08, 'A': 0x10,
+                    'U': 0x20, 'E': 0x40, 'C': 0x80, 'N': 0x100}
+
+# The detect_attack signatures, in priority order: the first matching rule
+# wins. The port-specific SYN rules come before the generic SYN flood and the
+# DNS rule before the UDP flood, so every rule is reachable. Lengths are whole
+# frame lengths in bytes.
+DEFAULT_RULES = [
+    {'attack_type': "R2L: Telnet Brute Force", 'protocol': 'tcp', 'tcp_flags': 'S', 'dport': [23]},
+    {'attack_type': "R2L: SSH Brute Force", 'protocol': 'tcp', 'tcp_flags': 'S', 'dport': [22]},
+    {'attack_type': "DoS: SYN Flood Attack", 'protocol': 'tcp', 'tcp_flags': 'S'},
+    {'attack_type': "DoS: TCP Christmas Attack", 'protocol': 'tcp', 'tcp_flags': 0x3F},
+    {'attack_type': "DoS: TCP Buffer Overflow", 'protocol': 'tcp', 'min_length': 1001},
+    {'attack_type': "Probe: Port Scan", 'protocol': 'tcp', 'tcp_flags': 'RA'},
+    {'attack_type': "Probe: FIN Scan", 'protocol': 'tcp', 'tcp_flags': 'F'},
+    {'attack_type': "Probe: XMAS Scan", 'protocol': 'tcp', 'tcp_flags': 'FPU'},
+    {'attack_type': "Probe: NULL Scan", 'protocol': 'tcp', 'tcp_flags': 0},
+    {'attack_type': "R2L: SMB Attack", 'protocol': 'tcp', 'dport': [445]},
+    {'attack_type': "U2R: Privilege Escalation Attempt", 'protocol': 'tcp', 'payload': ['sudo']},
+    {'attack_type': "U2R: Buffer Overflow Attack", 'protocol': 'tcp', 'payload': ['buffer overflow']},
+    {'attack_type': "DoS: ICMP Flood", 'protocol': 'icmp', 'min_length': 1001},
+    {'attack_type': "DoS: DNS Amplification", 'protocol': 'udp', 'dns_query': True, 'min_length': 513},
+    {'attack_type': "DoS: UDP Flood", 'protocol': 'udp', 'min_length': 1001},
+]
+
+
+def parse_tcp_flags(value):
+    """TCP flags from an int, a hex/decimal string ("0x14") or scapy-style letters ("RA")."""
+    if value is None or isinstance(value, int):
+        return value
+    value = str(value).strip()
+    if value.lower().startswith('0x') or value.isdigit():
+        return int(value, 0)
+    flags = 0
+    for letter in value.upper():
+        if letter not in TCP_FLAG_LETTERS:
+            raise ValueError(f"Unknown TCP flag {letter!r} in {value!r}")
+        flags |= TCP_FLAG_LETTERS[letter]
+    return flags
+
+
+def packet_protocol(header):
+    """
+    Rule protocol of a raw_packets.PacketHeader: 'tcp' for TCP over IPv4,
+    'icmp', 'udp', or None, checked in the order detect_attack always has.
+    """
+    if header.version == 4 and header.tcp_flags is not None:
+        return 'tcp'
+    if header.icmp_type is not None:
+        return 'icmp'
+    if header.proto == 17 and header.sport is not None:
+        return 'udp'
+    return None
+
+
+class Rule:
+    """One signature: every condition that is set must hold."""
+
+    FIELDS = ('attack_type', 'protocol', 'tcp_flags', 'sport', 'dport', 'min_length', 'max_length',
+              'dns_query', 'payload')
+    __slots__ = FIELDS + ('scanner',)
+
+    def __init__(self, attack_type, protocol=None, tcp_flags=None, sport=None, dport=None,
+                 min_length=None, max_length=None, dns_query=None, payload=None):
+        if protocol is not None and protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol {protocol!r}, expected one of {PROTOCOLS}")
+        self.attack_type = attack_type
+        self.protocol = protocol
+        self.tcp_flags = parse_tcp_flags(tcp_flags)
+        self.sport = frozenset(sport) if sport is not None else None
+        self.dport = frozenset(dport) if dport is not None else None
+        self.min_length = min_length
+        self.max_length = max_length
+        self.dns_query = dns_query
+        # Payload substrings match case-insensitively
+        self.payload = tuple(p.lower().encode() if isinstance(p, str) else bytes(p).lower()
+                             for p in payload) if payload else ()
+        self.scanner = PayloadScanner(self.payload) if self.payload else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        data = {'attack_type': self.attack_type}
+        for field in self.FIELDS[1:]:
+            value = getattr(self, field)
+            if value is None or value == ():
+                continue
+            if isinstance(value, frozenset):
+                value = sorted(value)
+            elif field == 'payload':
+                value = [p.decode() for p in value]
+            data[field] = value
+        return data
+
+    def matches(self, header, protocol=None):
+        """Whether the rule matches a PacketHeader whose rule protocol is given (computed if None)."""
+        if not self.matches_header(header, protocol):
+            return False
+        return not self.payload or self.payload_matches(header.payload)
+
+    def matches_header(self, header, protocol=None):
+        """matches() without the payload condition."""
+        if self.protocol is not None and (protocol or packet_protocol(header)) != self.protocol:
+            return False
+        if self.tcp_flags is not None and header.tcp_flags != self.tcp_flags:
+            return False
+        if self.dport is not None and header.dport not in self.dport:
+            return False
+        if self.sport is not None and header.sport not in self.sport:
+            return False
+        if self.min_length is not None and header.length < self.min_length:
+            return False
+        if self.max_length is not None and header.length > self.max_length:
+            return False
+        if self.dns_query is not None and (header.dns_qr == 0) != self.dns_query:
+            return False
+        return True
+
+    def payload_matches(self, payload):
+        return self.scanner.search(payload)
+
+    def header_mask(self, columns):
+        """Boolean mask of the rows of header_columns() output that satisfy every non-payload condition."""
+        mask = np.ones(len(columns['length']), dtype=bool)
+        if self.protocol is not None:
+            mask &= columns['protocol'] == PROTOCOLS.index(self.protocol) + 1
+        if self.tcp_flags is not None:
+            mask &= columns['tcp_flags'] == self.tcp_flags
+        if self.dport is not None:
+            mask &= np.isin(columns['dport'], list(self.dport))
+        if self.sport is not None:
+            mask &= np.isin(columns['sport'], list(self.sport))
+        if self.min_length is not None:
+            mask &= columns['length'] >= self.min_length
+        if self.max_length is not None:
+            mask &= columns['length'] <= self.max_length
+        if self.dns_query is not None:
+            mask &= (columns['dns_qr'] == 0) == self.dns_query
+        return mask
+
+
+def header_columns(headers):
+    """Columns of a batch of PacketHeaders as NumPy arrays (-1 where a field is absent)."""
+    protocol_codes = {None: 0, 'tcp': 1, 'udp': 2, 'icmp': 3}
+    n = len(headers)
+    columns = {
+        'protocol': np.fromiter((protocol_codes[packet_protocol(h)] for h in headers), np.int8, n),
+        'tcp_flags': np.fromiter((-1 if h.tcp_flags is None else h.tcp_flags for h in headers), np.int32, n),
+        'sport': np.fromiter((-1 if h.sport is None else h.sport for h in headers), np.int32, n),
+        'dport': np.fromiter((-1 if h.dport is None else h.dport for h in headers), np.int32, n),
+        'length': np.fromiter((h.length for h in headers), np.int32, n),
+        'dns_qr': np.fromiter((-1 if h.dns_qr is None else h.dns_qr for h in headers), np.int8, n),
+    }
+    return columns
+
+
+class RuleEngine:
+    """
+    Compiled rule set. Rules are indexed by (protocol, TCP flags): each
+    index entry holds, in priority order, only the rules that can match
+    that key. Those lists are narrowed further by destination port on
+    first use and memoized, so a packet costs one dict lookup plus the few
+    rules left to check. The payload substrings of all rules share one
+    PayloadScanner, so a payload is scanned at most once per packet however
+    many signatures there are. match_batch applies the rules to a whole
+    batch as NumPy masks.
+    """
+
+    # Bound on memoized (protocol, flags, dport) candidate lists
+    MAX_CACHED_KEYS = 65536
+
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = DEFAULT_RULES
+        self.rules = [rule if isinstance(rule, Rule) else Rule.from_dict(rule) for rule in rules]
+        self._index = {}
+        self._fallback = {}
+        for protocol in PROTOCOLS + (None,):
+            candidates = [rule for rule in self.rules if rule.protocol in (protocol, None)]
+            self._fallback[protocol] = [rule for rule in candidates if rule.tcp_flags is None]
+            for flags in {rule.tcp_flags for rule in candidates if rule.tcp_flags is not None}:
+                self._index[protocol, flags] = [rule for rule in candidates if rule.tcp_flags in (flags, None)]
+        self._labels = np.array([rule.attack_type for rule in self.rules] + [None], dtype=object)
+        self._cache = {}
+        self.scanner = PayloadScanner(pattern for rule in self.rules for pattern in rule.payload)
+        self._payload_ids = {rule: frozenset(self.scanner.pattern_id(pattern) for pattern in rule.payload)
+                             for rule in self.rules if rule.payload}
+
+    @classmethod
+    def from_file(cls, path):
+        """Load rules from a JSON file: a list of rule objects, or {"rules": [...]}."""
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data['rules']
+        return cls(data)
+
+    def to_file(self, path):
+        with open(path, 'w') as f:
+            json.dump({'rules': [rule.to_dict() for rule in self.rules]}, f, indent=2)
+
+    def candidates(self, protocol, tcp_flags, dport):
+        """Rules that can match a packet with this protocol, TCP flags and destination port, in priority order."""
+        key = (protocol, tcp_flags, dport)
+        rules = self._cache.get(key)
+        if rules is None:
+            rules = self._index.get((protocol, tcp_flags)) or self._fallback[protocol]
+            rules = [rule for rule in rules if rule.dport is None or dport in rule.dport]
+            if len(self._cache) >= self.MAX_CACHED_KEYS:
+                self._cache.clear()
+            self._cache[key] = rules
+        return rules
+
+    def match(self, header):
+        """Attack type of the first rule matching a PacketHeader, or None."""
+        protocol = packet_protocol(header)
+        found = None
+        for rule in self.candidates(protocol, header.tcp_flags, header.dport):
+            if not rule.matches_header(header, protocol):
+                continue
+            if rule.payload:
+                if found is None:
+                    found = self.scanner.scan(header.payload)
+                if found.isdisjoint(self._payload_ids[rule]):
+                    continue
+            return rule.attack_type
+        return None
+
+    def match_batch(self, headers, columns=None):
+        """Attack types (None where no rule matches) for a list of PacketHeaders, as an object array."""
+        if columns is None:
+            columns = header_columns(headers)
+        result = np.full(len(headers), -1, dtype=np.int32)
+        remaining = np.ones(len(headers), dtype=bool)
+        found = {}
+        for i, rule in enumerate(self.rules):
+            mask = remaining & rule.header_mask(columns)
+            if rule.payload:
+                rows = np.flatnonzero(mask)
+                for row in rows:
+                    if row not in found:
+                        found[row] = self.scanner.scan(headers[row].payload)
+                ids = self._payload_ids[rule]
+                hits = np.fromiter((not found[row].isdisjoint(ids) for row in rows), bool, len(rows))
+                mask[rows[~hits]] = False
+            result[mask] = i
+            remaining &= ~mask
+            if not remaining.any():
+                break
+        return self._labels[result]
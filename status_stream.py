@@ -0,0 +1,165 @@
+import json
+import asyncio
+import threading
+
+SSE_HEADERS = (b'HTTP/1.1 200 OK\r\n'
+               b'Content-Type: text/event-stream\r\n'
+               b'Cache-Control: no-cache\r\n'
+               b'Connection: keep-alive\r\n'
+               b'Access-Control-Allow-Origin: *\r\n\r\n')
+
+# Keys that change on every snapshot without the state having changed
+VOLATILE_KEYS = ('uptime_s', 'recent_alerts')
+
+
+def sse_message(event, data, event_id=None):
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message = f'id: {event_id}\n' + message
+    return (message + f'data: {json.dumps(data, separators=(",", ":"))}\n\n').encode()
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'resync')
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(queue_size)
+        self.resync = False
+
+
+class StatusStream:
+    """
+    Push-based status stream over Server-Sent Events on a small asyncio
+    HTTP server. A single producer polls snapshot() every interval and
+    publishes only the keys that changed (plus alerts new since the last
+    event); each event is encoded once and the same bytes are queued to
+    every subscriber. A subscriber whose queue fills up is skipped ahead:
+    its backlog is dropped and it gets a full snapshot instead.
+
+    GET /status/stream is the event stream (a full "snapshot" event, then
+    "delta" events); GET /status returns the current snapshot as JSON.
+    """
+
+    def __init__(self, snapshot, interval=0.25, queue_size=16, heartbeat=15.0):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.subscribers = set()
+        self.events_published = 0
+        self.resyncs = 0
+        self._event_id = 0
+        self._state = {}
+        self._last_alert_seq = 0
+        self._full_message = None
+        self._server = None
+        self._loop = None
+
+    def _full_snapshot(self):
+        if self._full_message is None:
+            self._full_message = sse_message('snapshot', self._state, self._event_id)
+        return self._full_message
+
+    def _delta(self, snapshot):
+        delta = {key: value for key, value in snapshot.items()
+                 if key not in VOLATILE_KEYS and self._state.get(key) != value}
+        # By sequence number, not time: several writers can record alerts with the same or out-of-order times
+        new_alerts = [alert for alert in snapshot.get('recent_alerts', ()) if alert['seq'] > self._last_alert_seq]
+        if new_alerts:
+            delta['new_alerts'] = new_alerts
+            self._last_alert_seq = new_alerts[-1]['seq']
+        return delta
+
+    def publish(self, snapshot):
+        """Publish the changes since the last event to every subscriber. Returns the delta."""
+        delta = self._delta(snapshot)
+        self._state = dict(snapshot)
+        if not delta:
+            return delta
+        self._event_id += 1
+        self._full_message = None
+        message = sse_message('delta', delta, self._event_id)
+        self.events_published += 1
+        for subscriber in self.subscribers:
+            if subscriber.resync:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind: drop the backlog and send a fresh snapshot instead
+                subscriber.resync = True
+                self.resyncs += 1
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+        return delta
+
+    async def _produce(self):
+        while True:
+            try:
+                self.publish(self.snapshot())
+            except Exception as e:
+                print(f"Error publishing status: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            parts = request.split(b' ', 2)
+            path = parts[1].split(b'?', 1)[0] if len(parts) > 1 else b''
+            if path == b'/status/stream':
+                await self._stream(writer)
+            elif path == b'/status':
+                body = json.dumps(self.snapshot()).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Access-Control-Allow-Origin: *\r\n'
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+                await writer.drain()
+            else:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer):
+        subscriber = _Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        try:
+            writer.write(SSE_HEADERS + self._full_snapshot())
+            await writer.drain()
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    message = b': keep-alive\n\n'
+                if message is None:
+                    subscriber.resync = False
+                    message = self._full_snapshot()
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def serve(self, host='0.0.0.0', port=5001):
+        self._loop = asyncio.get_running_loop()
+        # State for the first subscribers' "snapshot" event, before the producer has run
+        self.publish(self.snapshot())
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=1024)
+        producer = asyncio.create_task(self._produce())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            producer.cancel()
+
+    def start(self, host='0.0.0.0', port=5001):
+        """Run the stream server on its own event loop in a daemon thread."""
+        thread = threading.Thread(target=asyncio.run, args=(self.serve(host, port),), daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self._server is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
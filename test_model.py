@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 import numpy as np
 import joblib
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
@@ -7,9 +6,19 @@ from sklearn.preprocessing import LabelEncoder
 import warnings
 import seaborn as sns
 import matplotlib.pyplot as plt
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, request, jsonify, send_file, render_template_string, Response, stream_with_context
 from flask_cors import CORS
 import datetime
+import json
+import sys
+from contextlib import nullcontext
+import metrics
+from batch_scorer import MicroBatchScorer
+from async_server import AsyncBatchScorer, AsyncHTTPServer, html_response, json_response
+from feature_encoding import FeatureEncoder, FEATURE_COLUMNS
+from model_bundle import load_bundle, load_pickled_model
+from prediction_cache import CachedModel, PredictionCache
+from bulk_scoring import BulkResultWriter, iter_json_array_records, iter_ndjson_records, score_chunks
 
 # Filter warnings
 warnings.filterwarnings('ignore')
@@ -17,24 +26,52 @@ warnings.filterwarnings('ignore')
 app = Flask(__name__)
 CORS(app)
 
-# Load model and encoders
+# Load model and encoders, from the memory-mapped bundle when one has been built
 model_dir = os.path.join(os.path.dirname(__file__), 'model')
-model = joblib.load(os.path.join(model_dir, 'dlha_model.pkl'))
-encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
-
-# Define columns
-columns = [
-    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
-    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
-    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
-    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
-    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
-    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
-    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
-    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'
-]
+bundle_dir = os.path.join(model_dir, 'dlha_bundle')
+if os.path.exists(os.path.join(bundle_dir, 'manifest.json')):
+    model = load_bundle(bundle_dir)
+    feature_encoder = model.feature_encoder
+    encoders = feature_encoder.to_label_encoders()
+else:
+    model = load_pickled_model(os.path.join(model_dir, 'dlha_model.pkl'))
+    encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+    # Compiled categorical lookup tables, built once at load
+    feature_encoder = FeatureEncoder.from_label_encoders(encoders)
+columns = FEATURE_COLUMNS
+
+# Micro-batching scorer shared by all /predict requests
+MAX_BATCH_SIZE = int(os.environ.get('DLHA_MAX_BATCH_SIZE', 64))
+MAX_WAIT_MS = float(os.environ.get('DLHA_MAX_WAIT_MS', 5))
+SCORE_TIMEOUT = 30
+
+# Optional cache of results for repeated feature vectors, off unless DLHA_PREDICTION_CACHE > 0
+PREDICTION_CACHE_SIZE = int(os.environ.get('DLHA_PREDICTION_CACHE', 0))
+CACHE_TTL = float(os.environ.get('DLHA_CACHE_TTL', 300))
+CACHE_DECIMALS = os.environ.get('DLHA_CACHE_DECIMALS')
+prediction_cache = None
+scoring_model = model
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, ttl=CACHE_TTL,
+                                       decimals=int(CACHE_DECIMALS) if CACHE_DECIMALS else None)
+    scoring_model = CachedModel(model, prediction_cache)
+    metrics.REGISTRY.callback('dlha_prediction_cache_lookups_total', 'counter', 'Prediction cache lookups by result',
+                              lambda: {'hit': prediction_cache.hits, 'miss': prediction_cache.misses}, ['result'])
+    metrics.REGISTRY.callback('dlha_prediction_cache_entries', 'gauge', 'Entries in the prediction cache',
+                              lambda: len(prediction_cache))
+scorer = MicroBatchScorer(scoring_model, feature_encoder, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+
+# Bulk scoring settings
+BULK_CHUNK_SIZE = int(os.environ.get('DLHA_BULK_CHUNK_SIZE', 5000))
+results_dir = os.path.join(os.path.dirname(__file__), 'results')
+
+# Serving: the Flask dev server by default, the asyncio server with --async or DLHA_SERVER=async
+SERVER_MODE = 'async' if '--async' in sys.argv else os.environ.get('DLHA_SERVER', 'flask')
+PORT = int(os.environ.get('DLHA_PORT', 8080))
+ASYNC_WORKERS = int(os.environ.get('DLHA_ASYNC_WORKERS', 4))
+MAX_PENDING = int(os.environ.get('DLHA_MAX_PENDING', 512))
+REQUEST_TIMEOUT = float(os.environ.get('DLHA_REQUEST_TIMEOUT', 10))
+SHUTDOWN_TIMEOUT = float(os.environ.get('DLHA_SHUTDOWN_TIMEOUT', 10))
 
 @app.route('/')
 def home():
@@ -137,8 +174,8 @@ def home():
     '''
     return html
 
-@app.route('/health')
-def health_check():
+def health_status():
+    """Health check payload and HTTP status, shared by the Flask and async servers."""
     try:
         start_time = datetime.datetime.now()
         model_status = model is not None
@@ -148,7 +185,7 @@ def health_check():
         response_time = (datetime.datetime.now() - start_time).total_seconds()
         status = "healthy" if all([model_status, encoders_status, results_status]) else "unhealthy"
         
-        return jsonify({
+        return {
             "status": status,
             "timestamp": datetime.datetime.now().isoformat(),
             "response_time": response_time,
@@ -158,13 +195,71 @@ def health_check():
                 "results_directory": results_status
             },
             "version": "1.0.0"
-        }), 200 if status == "healthy" else 503
+        }, 200 if status == "healthy" else 503
     except Exception as e:
-        return jsonify({
+        return {
             "status": "error",
             "message": str(e),
             "timestamp": datetime.datetime.now().isoformat()
-        }), 500
+        }, 500
+
+@app.route('/health')
+def health_check():
+    payload, status = health_status()
+    return jsonify(payload), status
+
+RESULT_TEMPLATE = '''
+    <html>
+        <head>
+            <title>Prediction Result</title>
+            <style>
+                body { font-family: Arial; margin: 40px; background-color: #f5f5f5; }
+                .container { max-width: 800px; margin: auto; background-color: white; padding: 20px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
+                h1 { color: #2c3e50; text-align: center; }
+                .result { margin-top: 20px; padding: 20px; background-color: #f8f9fa; border-radius: 5px; text-align: center; }
+                .prediction { font-size: 24px; font-weight: bold; }
+                .normal { color: #27ae60; }
+                .attack { color: #c0392b; }
+                .back-btn { display: inline-block; margin-top: 20px; padding: 10px 20px; background-color: #3498db; color: white; text-decoration: none; border-radius: 5px; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>Prediction Result</h1>
+                <div class="result">
+                    <div class="prediction {% if prediction[0] == 'normal' %}normal{% else %}attack{% endif %}">
+                        {{ prediction[0] }}
+                    </div>
+                    <div>Confidence: {{ "%.2f"|format(confidence * 100) }}%</div>
+                </div>
+                <div style="text-align: center;">
+                    <a href="/" class="back-btn">Back to Input Form</a>
+                </div>
+            </div>
+        </body>
+    </html>
+'''
+
+def form_record(form):
+    """Feature record from the input form: known columns as floats where possible, the rest 0."""
+    input_data = {col: 0 for col in columns}
+    for key in form:
+        if key in columns:
+            try:
+                input_data[key] = float(form[key])
+            except ValueError:
+                input_data[key] = form[key]
+    return input_data
+
+def score_bulk(payload):
+    """Score a {"data": [...records...]} post in chunks and write the result files. Returns the summary."""
+    records = payload.get('data', []) if isinstance(payload, dict) else payload
+    with BulkResultWriter(results_dir) as writer:
+        for _ in score_chunks(scorer.score_records, records, BULK_CHUNK_SIZE, writer):
+            pass
+        summary = writer.close()
+    summary['status'] = "success"
+    return summary
 
 @app.route('/predict', methods=['GET', 'POST'])
 def predict():
@@ -177,56 +272,17 @@ def predict():
 
     try:
         if request.form:
-            input_data = {col: 0 for col in columns}
-            for key in request.form:
-                if key in columns:
-                    try:
-                        input_data[key] = float(request.form[key])
-                    except ValueError:
-                        input_data[key] = request.form[key]
-
-            test_data = pd.DataFrame([input_data])
-            categorical_features = ['protocol_type', 'service', 'flag']
-            
-            for feature in categorical_features:
-                known_labels = set(encoders[feature].classes_)
-                if test_data[feature].iloc[0] not in known_labels:
-                    test_data[feature] = encoders[feature].classes_[0]
-                test_data[feature] = encoders[feature].transform(test_data[feature])
-
-            test_data = test_data.astype(float)
-            prediction = model.predict(test_data)
-
-            return render_template_string('''
-                <html>
-                    <head>
-                        <title>Prediction Result</title>
-                        <style>
-                            body { font-family: Arial; margin: 40px; background-color: #f5f5f5; }
-                            .container { max-width: 800px; margin: auto; background-color: white; padding: 20px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
-                            h1 { color: #2c3e50; text-align: center; }
-                            .result { margin-top: 20px; padding: 20px; background-color: #f8f9fa; border-radius: 5px; text-align: center; }
-                            .prediction { font-size: 24px; font-weight: bold; }
-                            .normal { color: #27ae60; }
-                            .attack { color: #c0392b; }
-                            .back-btn { display: inline-block; margin-top: 20px; padding: 10px 20px; background-color: #3498db; color: white; text-decoration: none; border-radius: 5px; }
-                        </style>
-                    </head>
-                    <body>
-                        <div class="container">
-                            <h1>Prediction Result</h1>
-                            <div class="result">
-                                <div class="prediction {% if prediction[0] == 'normal' %}normal{% else %}attack{% endif %}">
-                                    {{ prediction[0] }}
-                                </div>
-                            </div>
-                            <div style="text-align: center;">
-                                <a href="/" class="back-btn">Back to Input Form</a>
-                            </div>
-                        </div>
-                    </body>
-                </html>
-            ''', prediction=prediction)
+            input_data = form_record(request.form)
+
+            # Concurrent requests are encoded and scored together in micro-batches
+            label, confidence = scorer.score(input_data, timeout=SCORE_TIMEOUT)
+            prediction = [label]
+
+            return render_template_string(RESULT_TEMPLATE, prediction=prediction, confidence=confidence)
+        elif request.is_json:
+            # Bulk JSON post of {"data": [...records...]}, as sent by test_request.py
+            payload = request.get_json()
+            return jsonify(score_bulk(payload)), 200
         else:
             return jsonify({
                 "message": "No form data received",
@@ -240,7 +296,111 @@ def predict():
             "status": "error"
         }), 500
 
+@app.route('/status')
+def status():
+    return jsonify({'prediction_cache': prediction_cache.stats() if prediction_cache else None})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """ Per-stage latency histograms and counters in the Prometheus text format (off with DLHA_METRICS=0). """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/predict/bulk', methods=['POST'])
+def predict_bulk():
+    """
+    Score a JSON array or NDJSON body of KDD records in chunks and stream
+    NDJSON predictions back. With ?artifacts=1 the metrics files are also
+    written and their paths are sent as a final summary line.
+    """
+    chunksize = request.args.get('chunksize', BULK_CHUNK_SIZE, type=int)
+    write_artifacts = request.args.get('artifacts', '0').lower() in ('1', 'true', 'yes')
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        records = iter_ndjson_records(request.stream)
+    else:
+        records = iter_json_array_records(request.stream)
+
+    def generate():
+        try:
+            # A failed or disconnected stream leaves no partial artifacts
+            with BulkResultWriter(results_dir) if write_artifacts else nullcontext() as writer:
+                for result in score_chunks(scorer.score_records, records, chunksize, writer):
+                    yield json.dumps(result) + '\n'
+                if writer is not None:
+                    yield json.dumps({'summary': writer.close()}) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e), 'status': 'error'}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def create_async_server():
+    """
+    The /, /health, /predict, /status and /metrics endpoints on the asyncio server.
+    Form posts are micro-batched on the event loop and scored on the
+    server's bounded worker pool; bulk JSON posts run on the pool too.
+    """
+    server = AsyncHTTPServer(workers=ASYNC_WORKERS, max_pending=MAX_PENDING,
+                             request_timeout=REQUEST_TIMEOUT, shutdown_timeout=SHUTDOWN_TIMEOUT)
+    batcher = AsyncBatchScorer(scorer.score_records, server.executor,
+                               max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+    result_template = app.jinja_env.from_string(RESULT_TEMPLATE)
+
+    async def async_home(request):
+        return html_response(home())
+
+    async def async_health(request):
+        payload, status = health_status()
+        return json_response(payload, status)
+
+    def parse_and_score_bulk(request):
+        try:
+            payload = request.json()
+        except ValueError as e:
+            # Not JSON (or not UTF-8): the client's fault, like a malformed request head
+            return json_response({"message": "Malformed JSON body", "error": str(e), "status": "error"}, 400)
+        return json_response(score_bulk(payload))
+
+    async def async_predict(request):
+        if request.method == 'GET':
+            return json_response({
+                "message": "Please use POST method to make predictions",
+                "status": "error",
+                "code": 405
+            }, 405)
+        form = request.form()
+        if form:
+            label, confidence = await batcher.score(form_record(form))
+            return html_response(result_template.render(prediction=[label], confidence=confidence))
+        elif request.mimetype == 'application/json':
+            # Parsed on the pool too: a large body would otherwise block the event loop
+            return await server.run_blocking(parse_and_score_bulk, request)
+        return json_response({
+            "message": "No form data received",
+            "status": "error"
+        }, 400)
+
+    async def async_status(request):
+        status = server.stats()
+        status['batches'] = batcher.batches
+        status['prediction_cache'] = prediction_cache.stats() if prediction_cache else None
+        return json_response(status)
+
+    async def async_metrics(request):
+        return 200, metrics.CONTENT_TYPE, metrics.render().encode()
+
+    metrics.REGISTRY.callback('dlha_requests_in_flight', 'gauge', 'Requests being handled by the async server',
+                              lambda: server.in_flight)
+
+    server.route('GET', '/', async_home)
+    server.route('GET', '/health', async_health)
+    server.route('GET', '/predict', async_predict)
+    server.route('POST', '/predict', async_predict)
+    server.route('GET', '/status', async_status)
+    server.route('GET', '/metrics', async_metrics)
+    return server
+
 if __name__ == '__main__':
-    results_dir = os.path.join(os.path.dirname(__file__), 'results')
     os.makedirs(results_dir, exist_ok=True)
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    if SERVER_MODE == 'async':
+        create_async_server().run(host='0.0.0.0', port=PORT)
+    else:
+        app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
@@ -1,12 +1,28 @@
 import requests
 import pandas as pd
-import sys
+import numpy as np
+import argparse
+import asyncio
 import time
+import json
+from urllib.parse import urlencode, urlsplit
+
+# Column names for the raw KDD files, which have no header row
+columns = ['duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
+           'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
+           'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+           'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
+           'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
+           'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
+           'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
+           'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
+           'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
+           'dst_host_rerror_rate', 'dst_host_srv_rerror_rate', 'label', 'difficulty']
 
 def make_prediction_request(max_retries=3, retry_delay=2):
     # Load test data
     try:
-        test_data = pd.read_csv('data/KDDTest+.txt')
+        test_data = pd.read_csv('data/KDDTest+.txt', names=columns)
     except FileNotFoundError:
         print("Error: Test data file not found in data/KDDTest+.txt")
         return
@@ -50,5 +66,145 @@ def make_prediction_request(max_retries=3, retry_delay=2):
                 print("3. No firewall is blocking the connection")
                 return
 
+def make_bulk_request(path='data/KDDTest+.txt', chunksize=5000):
+    """Stream the test file to /predict/bulk as NDJSON and read predictions back as they arrive."""
+    def ndjson_lines():
+        for chunk in pd.read_csv(path, names=columns, chunksize=chunksize):
+            for record in chunk.to_dict(orient='records'):
+                yield (json.dumps(record) + '\n').encode('utf-8')
+
+    url = 'http://localhost:8080/predict/bulk?artifacts=1'
+    try:
+        response = requests.post(url, data=ndjson_lines(), stream=True,
+                                 headers={'Content-Type': 'application/x-ndjson'})
+    except requests.exceptions.ConnectionError:
+        print("\nError: Could not connect to the server. Please ensure test_model.py is running on port 8080")
+        return
+
+    predictions = 0
+    for line in response.iter_lines():
+        if not line:
+            continue
+        result = json.loads(line)
+        if 'summary' in result:
+            summary = result['summary']
+            print("\nResults saved to:")
+            print(f"Predictions: {summary['results_path']}")
+            print(f"Confusion Matrix: {summary['confusion_matrix_path']}")
+            print(f"Performance Metrics: {summary['metrics_path']}")
+            print(f"\nModel Accuracy: {summary['accuracy']:.4f}")
+        elif 'error' in result:
+            print(f"\nServer error: {result['error']}")
+        else:
+            predictions += 1
+    print(f"\nReceived {predictions} predictions")
+
+async def _form_post(connection, host, port, path, body):
+    # One request on a kept-alive connection; connection is a [reader, writer] pair, reopened when the server closes it
+    if connection[0] is None:
+        connection[:] = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    writer.write((f'POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                  'Content-Type: application/x-www-form-urlencoded\r\n'
+                  f'Content-Length: {len(body)}\r\n\r\n').encode() + body)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').lower()
+    status = int(head.split(' ', 2)[1])
+    length = None
+    for line in head.split('\r\n'):
+        if line.startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    if length is None:
+        await reader.read()
+    else:
+        await reader.readexactly(length)
+    if length is None or 'connection: close' in head or head.startswith('http/1.0'):
+        writer.close()
+        connection[:] = [None, None]
+    return status
+
+async def _load_clients(url, bodies, clients, duration):
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or 80, parts.path or '/'
+    latencies = []
+    statuses = {}
+    stop_at = time.perf_counter() + duration
+
+    async def client(i):
+        connection = [None, None]
+        n = i
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                status = await _form_post(connection, host, port, path, bodies[n % len(bodies)])
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                status = 'error'
+                if connection[1] is not None:
+                    connection[1].close()
+                connection[:] = [None, None]
+                await asyncio.sleep(0.05)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            n += clients
+        if connection[1] is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return np.array(latencies) * 1000, statuses, time.perf_counter() - start
+
+def run_load_test(url='http://localhost:8080/predict', clients=100, duration=10.0, path='data/KDDTest+.txt', limit=5000):
+    """
+    Closed-loop load test: `clients` concurrent connections post single KDD
+    records to /predict as form data, each sending its next request as
+    soon as the last one is answered. Returns throughput, latency
+    percentiles and the count of each response status.
+    """
+    try:
+        test_data = pd.read_csv(path, names=columns, nrows=limit)
+    except FileNotFoundError:
+        print(f"Error: Test data file not found in {path}")
+        return None
+    records = test_data.drop(columns=['label', 'difficulty']).to_dict(orient='records')
+    bodies = [urlencode(record).encode() for record in records]
+
+    latencies, statuses, elapsed = asyncio.run(_load_clients(url, bodies, clients, duration))
+    ok = statuses.get(200, 0)
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'ok': ok,
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(ok / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+            'p99': round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+            'max': round(float(latencies.max()), 2) if len(latencies) else None
+        }
+    }
+
+def print_load_test(result, label=''):
+    latency = result['latency_ms']
+    print(f"{label}{result['clients']} clients: {result['requests']} requests, {result['throughput_per_s']:,.1f} ok/s, "
+          f"p50 {latency['p50']} ms, p99 {latency['p99']} ms, max {latency['max']} ms, statuses {result['statuses']}")
+
 if __name__ == "__main__":
-    make_prediction_request()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Client for the prediction API")
+    parser.add_argument('--bulk', action='store_true', help="Stream the test file to /predict/bulk")
+    parser.add_argument('--load', action='store_true', help="Load test /predict with concurrent single-record posts")
+    parser.add_argument('--url', default='http://localhost:8080/predict')
+    parser.add_argument('--clients', type=int, nargs='+', default=[100])
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.bulk:
+        make_bulk_request()
+    elif args.load:
+        for clients in args.clients:
+            result = run_load_test(args.url, clients, args.duration)
+            if result is None:
+                break
+            print_load_test(result)
+    else:
+        make_prediction_request()
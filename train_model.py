@@ -2,7 +2,6 @@ import os
 import pandas as pd
 import numpy as np
 import joblib
-from sklearn.preprocessing import LabelEncoder
 from sklearn.impute import SimpleImputer
 import sys
 import warnings
@@ -13,54 +12,38 @@ sys.path.append(current_dir)
 
 # Import DLHA after adding project root to path
 from api.app import DLHA
+from feature_encoding import CATEGORICAL_FEATURES
+from data_preparation import load_prepared_dataset
+from model_bundle import save_bundle
 
 # Create model directory if it doesn't exist
 model_dir = os.path.join(current_dir, 'model')
 os.makedirs(model_dir, exist_ok=True)
 
-# Load and preprocess your data
-data_path = os.path.join(current_dir, 'data', 'KDDTrain+.txt')
+# Load the encoded training set through the dataset cache; the raw file is only parsed when it has changed
+data_dir = os.path.join(current_dir, 'data')
+data_path = os.path.join(data_dir, 'KDDTrain+.txt')
 print(f"Loading data from: {data_path}")
-
-# Define column names for KDD Cup dataset
-columns = [
-    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
-    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
-    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
-    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
-    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
-    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
-    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
-    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate', 'class'
-]
-
-# Read the data with column names
-data = pd.read_csv(data_path, names=columns)
+data, _, feature_encoder = load_prepared_dataset(data_path, os.path.join(data_dir, 'KDDTest+.txt'),
+                                                 cache_dir=os.path.join(data_dir, 'cache'))
 print("Data loaded successfully")
 print(f"Dataset shape: {data.shape}")
 
 # Prepare features and target
-X = data.drop('class', axis=1)
-y = data['class']
+X = data.drop('label', axis=1)
+y = data['label']
 
 print(f"Features shape: {X.shape}")
 print(f"Target shape: {y.shape}")
 print("\nSample of target values:", y.value_counts().head())
 
-# Initialize and fit label encoders
-label_encoders = {}
-categorical_features = ['protocol_type', 'service', 'flag']
-
-# First encode categorical features
+# Categorical features are already encoded with the lookup tables shared with the API
+categorical_features = CATEGORICAL_FEATURES
 for feature in categorical_features:
-    print(f"\nEncoding {feature}...")
-    le = LabelEncoder()
-    X[feature] = le.fit_transform(X[feature])
-    label_encoders[feature] = le
-    print(f"Unique values in {feature}: {len(le.classes_)}")
-    print(f"Classes: {le.classes_}")
+    print(f"\nEncoded {feature}...")
+    print(f"Unique values in {feature}: {len(feature_encoder.vocabularies[feature])}")
+    print(f"Classes: {feature_encoder.vocabularies[feature]}")
+label_encoders = feature_encoder.to_label_encoders()
 
 # Now handle numeric columns
 numeric_columns = [col for col in X.columns if col not in categorical_features]
@@ -100,6 +83,10 @@ joblib.dump(label_encoders, encoders_path)
 print(f"Model saved to: {model_path}")
 print(f"Encoders saved to: {encoders_path}")
 
+# Memory-mappable bundle used by the API
+bundle_path = os.path.dirname(save_bundle(model, feature_encoder, os.path.join(model_dir, 'dlha_bundle')))
+print(f"Model bundle saved to: {bundle_path}")
+
 # Validate saved files
 print("\nValidating saved files...")
 if os.path.exists(model_path) and os.path.exists(encoders_path):